@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Benchmark the latency of the debate flows against a stub LLM that only sleeps.
+
+Compares propose and oppose one after the other with running them at the same
+time, and a multi-round debate run task by task with the pipelined runner:
+    python -m debate.bench_latency --latency 1.0 --rounds 3
+"""
+import argparse
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from crewai import Crew, Process
+from crewai.llms.base_llm import BaseLLM
+
+from debate.crew import Debate
+from debate.pipeline import run_pipelined
+
+INPUTS = {'motion': 'There needs to be strict laws to regulate LLMs', 'current_year': '2025'}
+
+
+class StubLLM(BaseLLM):
+    """ An LLM that waits latency seconds (give or take jitter) and returns a canned final answer """
+
+    def __init__(self, latency: float = 1.0, jitter: float = 0.0, seed: int = 0):
+        super().__init__(model="stub")
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+    ) -> Union[str, Any]:
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        return "Thought: I now can give a great answer\nFinal Answer: A concise and convincing argument."
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 128_000
+
+
+def _timed(flow) -> float:
+    start = time.perf_counter()
+    flow()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=1.0, help="seconds per LLM call")
+    parser.add_argument('--jitter', type=float, default=0.5, help="calls take latency plus or minus up to this")
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    def debate(parallel: bool) -> Debate:
+        return Debate(parallel=parallel, llm=StubLLM(args.latency, args.jitter), verbose=False)
+
+    sequential = _timed(lambda: debate(False).crew().kickoff(inputs=INPUTS))
+    parallel = _timed(lambda: debate(True).crew().kickoff(inputs=INPUTS))
+    print(f"1 round, sequential: {sequential:.2f}s")
+    print(f"1 round, parallel:   {parallel:.2f}s ({1 - parallel / sequential:.0%} less)")
+
+    def rounds_sequential():
+        tasks = debate(False).round_tasks(args.rounds)
+        agents = list({id(task.agent): task.agent for task in tasks}.values())
+        Crew(agents=agents, tasks=tasks, process=Process.sequential, verbose=False).kickoff(inputs=INPUTS)
+
+    sequential = _timed(rounds_sequential)
+    pipelined = _timed(lambda: run_pipelined(debate(True).round_tasks(args.rounds), inputs=INPUTS, verbose=False))
+    print(f"{args.rounds} rounds, sequential: {sequential:.2f}s")
+    print(f"{args.rounds} rounds, pipelined:  {pipelined:.2f}s ({1 - pipelined / sequential:.0%} less)")
+
+
+if __name__ == "__main__":
+    main()
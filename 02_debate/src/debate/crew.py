@@ -1,5 +1,12 @@
+from typing import List, Optional
+
 from crewai import Agent, Crew, Process, Task
+from crewai.llms.base_llm import BaseLLM
 from crewai.project import CrewBase, agent, crew, task
+from crewai.tasks.task_output import TaskOutput
+
+from debate.summary import summarize
+from debate.transcripts import TranscriptStore
 
 @CrewBase
 class Debate():
@@ -8,25 +15,89 @@ class Debate():
     agents_config = 'config/agents.yaml'
     tasks_config = 'config/tasks.yaml'
 
+    def __init__(self, parallel: bool = True, llm: Optional[BaseLLM] = None, verbose: bool = True,
+                 transcripts: Optional[TranscriptStore] = None, debate_id: str = 'debate',
+                 summary_tokens: Optional[int] = 300, judge_llm: Optional[BaseLLM] = None):
+        """
+        Args:
+            parallel: Run propose and oppose at the same time; the judge waits for both.
+            llm: Use this LLM for every agent instead of the configured models.
+            verbose: Whether the agents and crew log their steps.
+            transcripts: Store every task's output here, under debate_id, instead of the
+                tasks' output files, which concurrent debates would overwrite.
+            debate_id: Name of this debate in the transcript store.
+            summary_tokens: The judge sees arguments longer than this as extractive
+                summaries of this many tokens; None gives the judge the full text.
+            judge_llm: Use this LLM for the judge, instead of llm or its configured model.
+        """
+        self.parallel = parallel
+        self.llm = llm
+        self.verbose = verbose
+        self.transcripts = transcripts
+        self.debate_id = debate_id
+        self.summary_tokens = summary_tokens
+        self.judge_llm = judge_llm
+
+    def _agent(self, name: str) -> Agent:
+        llm = self.judge_llm if name == 'judge' and self.judge_llm is not None else self.llm
+        if llm is not None:
+            return Agent(config=self.agents_config[name], verbose=self.verbose, llm=llm)
+        return Agent(config=self.agents_config[name], verbose=self.verbose)
+
+    def _track(self, task: Task) -> Task:
+        if self.transcripts is not None:
+            task.output_file = None
+            task.callback = lambda output: self.transcripts.record(self.debate_id, task.name, output.raw)
+        return task
+
+    def _for_judge(self, tasks: List[Task]) -> List[Task]:
+        """
+        Context for the judge: each task's output, or a carrier task holding its summary.
+        A carrier is never run; its output is filled in when its task finishes.
+        """
+        if self.summary_tokens is None:
+            return tasks
+        carriers = []
+        for source in tasks:
+            carrier = Task(name=f'{source.name}_summary', description=f'Summary of {source.name}',
+                           expected_output=f'The argument of {source.name}, summarized', context=[source])
+
+            def carry(output: TaskOutput, source=source, carrier=carrier, record=source.callback):
+                if record is not None:
+                    record(output)
+                carrier.output = TaskOutput(name=carrier.name, description=carrier.description,
+                                            expected_output=carrier.expected_output, agent=output.agent,
+                                            raw=summarize(output.raw, self.summary_tokens))
+
+            source.callback = carry
+            carriers.append(carrier)
+        return carriers
+
     @agent
     def debater(self) -> Agent:
-        return Agent(config=self.agents_config['debater'], verbose=True)
+        return self._agent('debater')
+
+    @agent
+    def opposing_debater(self) -> Agent:
+        # a second instance of the debater, as an agent works on one task at a time
+        return self._agent('debater')
 
     @agent
     def judge(self) -> Agent:
-        return Agent(config=self.agents_config['judge'], verbose=True)
+        return self._agent('judge')
 
     @task
     def propose(self) -> Task:
-        return Task(config=self.tasks_config['propose'])
+        return self._track(Task(config=self.tasks_config['propose'], async_execution=self.parallel))
 
     @task
     def oppose(self) -> Task:
-        return Task(config=self.tasks_config['oppose'])
+        return self._track(Task(config=self.tasks_config['oppose'], async_execution=self.parallel))
 
     @task
     def decide(self) -> Task:
-        return Task(config=self.tasks_config['decide'])
+        return self._track(Task(config=self.tasks_config['decide'],
+                                context=self._for_judge([self.propose(), self.oppose()])))
 
     @crew
     def crew(self) -> Crew:
@@ -35,5 +106,44 @@ class Debate():
             agents=self.agents,
             tasks=self.tasks,
             process=Process.sequential,
-            verbose=True
+            verbose=self.verbose
         )
+
+    def round_tasks(self, rounds: int) -> List[Task]:
+        """
+        Tasks for a debate of several rounds: opening arguments, then rounds of rebuttals
+        in which each side answers the other's previous argument. The judge notes each
+        round as soon as both sides have spoken, while the debaters go on to the next
+        round, and decides from those notes at the end.
+
+        Every task's context names the tasks it needs, so they can run with run_pipelined.
+        """
+        proposer, opposer, judge = self.debater(), self.opposing_debater(), self.judge()
+        tasks = []
+        notes = []
+        previous: List[Task] = []
+        for number in range(1, rounds + 1):
+            if number == 1:
+                speeches = [
+                    Task(config=self.tasks_config['propose'], name='propose_1', agent=proposer, context=[]),
+                    Task(config=self.tasks_config['oppose'], name='oppose_1', agent=opposer, context=[]),
+                ]
+            else:
+                speeches = [
+                    Task(config=self.tasks_config['propose_rebuttal'], name=f'propose_{number}', agent=proposer,
+                         context=previous),
+                    Task(config=self.tasks_config['oppose_rebuttal'], name=f'oppose_{number}', agent=opposer,
+                         context=previous),
+                ]
+            for speech in speeches:
+                self._track(speech)
+                # round files would overwrite each other; only a transcript store keeps every round
+                speech.output_file = None
+            note = self._track(Task(config=self.tasks_config['judge_round'], name=f'judge_round_{number}',
+                                    agent=judge, context=self._for_judge(speeches) + notes[-1:]))
+            tasks += speeches + [note]
+            notes.append(note)
+            previous = speeches
+        tasks.append(self._track(Task(config=self.tasks_config['decide'], name='decide', agent=judge,
+                                      context=self._for_judge(notes))))
+        return tasks
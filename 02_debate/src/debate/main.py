@@ -5,6 +5,8 @@ import warnings
 from datetime import datetime
 
 from debate.crew import Debate
+from debate.pipeline import run_pipelined
+from debate.transcripts import TranscriptStore
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
@@ -22,3 +24,26 @@ def run():
         print(result.raw);
     except Exception as e:
         raise Exception(f"An error occurred while running the crew: {e}")
+
+
+def run_rounds():
+    """
+    Run a debate with rebuttal rounds: debate_rounds <rounds>
+    """
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    inputs = {
+        'motion': 'There needs to be strict laws to regulate LLMs',
+        'current_year': str(datetime.now().year)
+    }
+
+    transcripts = TranscriptStore()
+    debate_id = datetime.now().strftime('%Y%m%d-%H%M%S')
+    try:
+        result = run_pipelined(Debate(transcripts=transcripts, debate_id=debate_id).round_tasks(rounds), inputs=inputs)
+        print(result.raw)
+        print(result.report())
+    except Exception as e:
+        raise Exception(f"An error occurred while running the crew: {e}")
+    finally:
+        transcripts.close()
+    print(f"Transcript written to {transcripts.directory}/{debate_id}")
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from crewai import Crew, Process, Task
+from crewai.tasks.task_output import TaskOutput
+
+
+class PipelineRun:
+    """ Outputs and timings of a pipelined run; raw is the last task's output """
+
+    def __init__(self, tasks: List[Task], durations: Dict[str, float], finished: Dict[str, float],
+                 wall_time: float):
+        self.tasks = tasks
+        self.durations = durations
+        self.finished = finished
+        self.wall_time = wall_time
+
+    @property
+    def outputs(self) -> Dict[str, TaskOutput]:
+        return {task.name: task.output for task in self.tasks}
+
+    @property
+    def raw(self) -> str:
+        return self.tasks[-1].output.raw
+
+    @property
+    def sequential_time(self) -> float:
+        return sum(self.durations.values())
+
+    def report(self) -> str:
+        lines = [f"{name}: {self.durations[name]:.1f}s, done at {self.finished[name]:.1f}s"
+                 for name in sorted(self.finished, key=self.finished.get)]
+        lines.append(f"Wall time {self.wall_time:.1f}s versus {self.sequential_time:.1f}s one task at a time")
+        return "\n".join(lines)
+
+
+def run_pipelined(tasks: List[Task], inputs: Optional[Dict[str, Any]] = None, verbose: bool = True) -> PipelineRun:
+    """
+    Runs each task as soon as the tasks in its context have finished, rather than
+    round by round, so a slow task only holds up the tasks that need its output.
+
+    Tasks must be listed after the tasks in their context, and tasks for the same
+    agent must depend on each other, since an agent works on one task at a time.
+    A context task that isn't in the list, such as a summary carrier, is not run;
+    waiting for it means waiting for the tasks in its own context.
+    """
+    inputs = inputs or {}
+    durations: Dict[str, float] = {}
+    finished: Dict[str, float] = {}
+
+    async def run_all(start: float) -> None:
+        running: Dict[int, asyncio.Task] = {}
+
+        async def run(task: Task, needs: List[asyncio.Task]) -> None:
+            await asyncio.gather(*needs)
+            # a one-task crew per task; context outputs are read from the finished tasks
+            crew = Crew(agents=[task.agent], tasks=[task], process=Process.sequential, verbose=verbose)
+            began = time.perf_counter()
+            await crew.kickoff_async(inputs=inputs)
+            durations[task.name] = time.perf_counter() - began
+            finished[task.name] = time.perf_counter() - start
+
+        def needs(task: Task) -> List[asyncio.Task]:
+            found = []
+            for needed in task.context or []:
+                found += [running[id(needed)]] if id(needed) in running else needs(needed)
+            return found
+
+        for task in tasks:
+            running[id(task)] = asyncio.ensure_future(run(task, needs(task)))
+        await asyncio.gather(*running.values())
+
+    start = time.perf_counter()
+    asyncio.run(run_all(start))
+    return PipelineRun(tasks, durations, finished, time.perf_counter() - start)
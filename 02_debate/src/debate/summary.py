@@ -0,0 +1,52 @@
+import re
+from collections import Counter
+from typing import List
+
+SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD = re.compile(r"[a-z][a-z'-]+")
+STOPWORDS = {
+    "the", "and", "that", "this", "with", "for", "are", "was", "were", "but", "not", "have", "has", "had",
+    "from", "they", "their", "them", "which", "will", "would", "could", "should", "there", "these", "those",
+    "been", "being", "into", "than", "then", "also", "more", "most", "such", "its", "our", "your", "can",
+    "all", "any", "what", "when", "who", "how", "why", "about", "only", "other", "some", "very",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def summarize(text: str, budget_tokens: int) -> str:
+    """
+    Extractive summary of text within budget_tokens: the sentences that carry the
+    argument's most frequent content words, in their original order. The first
+    sentence of each paragraph, usually its claim, counts for more. Text within
+    the budget is returned unchanged.
+    """
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    sentences: List[str] = []
+    leads = set()
+    for paragraph in re.split(r"\n\s*\n", text):
+        parts = [part.strip() for part in SENTENCE.split(paragraph) if part.strip()]
+        if parts:
+            leads.add(len(sentences))
+            sentences += parts
+    words = [WORD.findall(sentence.lower()) for sentence in sentences]
+    frequency = Counter(word for sentence in words for word in sentence if word not in STOPWORDS)
+
+    def score(index: int) -> float:
+        content = [frequency[word] for word in words[index] if word not in STOPWORDS]
+        value = sum(content) / (len(content) ** 0.5) if content else 0.0
+        return value * (1.5 if index in leads else 1.0)
+
+    chosen, used, seen = [], 0, set()
+    for index in sorted(range(len(sentences)), key=score, reverse=True):
+        cost = estimate_tokens(sentences[index]) + 1
+        if used + cost <= budget_tokens and sentences[index] not in seen:
+            chosen.append(index)
+            seen.add(sentences[index])
+            used += cost
+    if not chosen:  # no single sentence fits
+        return text[:budget_tokens * 4]
+    return " ".join(sentences[index] for index in sorted(chosen))
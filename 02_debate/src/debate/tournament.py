@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+"""
+Debate many motions concurrently under one global rate limit.
+
+Motions are read from a text file (one per line) or a JSONL file with "motion" and
+optional "id" fields. Each finished debate is appended to the results file as one
+JSON line as soon as it is done, so a killed run picks up where it left off:
+    python -m debate.tournament motions.txt --concurrency 8 --rpm 500 --tpm 200000
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from crewai import LLM
+from crewai.llms.base_llm import BaseLLM
+
+from debate.crew import Debate
+from debate.pipeline import run_pipelined
+from debate.summary import estimate_tokens
+from debate.transcripts import TranscriptStore
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window of requests and tokens shared by every debate.
+
+    acquire() blocks until a request of the given token count fits under both limits.
+    Tokens are reserved before the call, when the completion size isn't known yet, and
+    settled to the actual count afterwards.
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None, window: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            rpm: Requests per minute, at least 1; None for no limit.
+            tpm: Tokens per minute, at least 1; None for no limit.
+            window: Length of the window in seconds.
+            clock: Monotonic time source.
+        """
+        for name, limit in (("rpm", rpm), ("tpm", tpm)):
+            if limit is not None and limit < 1:
+                raise ValueError(f"{name} must be at least 1, or None for no limit; got {limit}")
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.clock = clock
+        self.waits = 0
+        self.waited = 0.0
+        self._requests: deque = deque()  # [time, tokens, in window] per request in the window
+        self._tokens = 0
+        self._condition = threading.Condition()
+
+    def _expire(self, now: float) -> None:
+        while self._requests and self._requests[0][0] <= now - self.window:
+            expired = self._requests.popleft()
+            expired[2] = False
+            self._tokens -= expired[1]
+
+    def _fits(self, tokens: int) -> bool:
+        if self.rpm is not None and len(self._requests) >= self.rpm:
+            return False
+        # a request larger than the whole budget still runs, alone in the window
+        return self.tpm is None or not self._requests or self._tokens + tokens <= self.tpm
+
+    def acquire(self, tokens: int) -> list:
+        """ Waits for room for a request; returns its reservation for settle() """
+        start = self.clock()
+        waited = False
+        with self._condition:
+            while True:
+                now = self.clock()
+                self._expire(now)
+                if self._fits(tokens):
+                    reservation = [now, tokens, True]
+                    self._requests.append(reservation)
+                    self._tokens += tokens
+                    if waited:
+                        self.waits += 1
+                        self.waited += now - start
+                    return reservation
+                waited = True
+                self._condition.wait(max(self._requests[0][0] + self.window - now, 0.01))
+
+    def settle(self, reservation: list, tokens: int) -> None:
+        """ Replaces a reservation's estimated tokens with the actual count """
+        with self._condition:
+            if reservation[2]:
+                self._tokens += tokens - reservation[1]
+            reservation[1] = tokens
+            self._condition.notify_all()
+
+
+class RateLimitedLLM(BaseLLM):
+    """
+    Wraps an LLM so every call first waits for the shared RateLimiter, and counts the
+    calls and tokens of one debate.
+    """
+
+    def __init__(self, limiter: RateLimiter, llm: Union[str, BaseLLM] = "openai/gpt-4o-mini",
+                 completion_reserve: int = 600):
+        """
+        Args:
+            limiter: Limiter shared by all debates.
+            llm: Model name or LLM to call.
+            completion_reserve: Tokens reserved for a completion until its size is known.
+        """
+        llm = LLM(model=llm) if isinstance(llm, str) else llm
+        super().__init__(model=llm.model)
+        self.limiter = limiter
+        self.llm = llm
+        self.completion_reserve = completion_reserve
+        self.calls = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+    ) -> Union[str, Any]:
+        text = messages if isinstance(messages, str) else "".join(str(m.get("content", "")) for m in messages)
+        prompt_tokens = estimate_tokens(text)
+        reservation = self.limiter.acquire(prompt_tokens + self.completion_reserve)
+        self.llm.stop = self.stop
+        response = ""
+        try:
+            response = self.llm.call(messages, tools=tools, callbacks=callbacks,
+                                     available_functions=available_functions)
+            return response
+        finally:
+            used = prompt_tokens + estimate_tokens(str(response or ""))
+            self.limiter.settle(reservation, used)
+            with self._lock:
+                self.calls += 1
+                self.tokens += used
+
+    def supports_function_calling(self) -> bool:
+        return self.llm.supports_function_calling()
+
+    def get_context_window_size(self) -> int:
+        return self.llm.get_context_window_size()
+
+
+def load_motions(path: str) -> List[Dict[str, str]]:
+    """
+    Returns:
+        List of {'id': ..., 'motion': ...}; ids default to the line number.
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    motions = []
+    for number, line in enumerate(lines, 1):
+        if not line or line.startswith("#"):
+            continue
+        record = json.loads(line) if path.endswith(".jsonl") else {"motion": line}
+        motions.append({"id": str(record.get("id") or number), "motion": record["motion"]})
+    return motions
+
+
+def load_results(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Finished debates by id. A line torn by a killed run is cut off, so new results
+    start on a line of their own.
+    """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, "rb") as f:
+        data = f.read()
+    complete = data[:data.rfind(b"\n") + 1]
+    for line in complete.decode("utf-8").splitlines():
+        record = json.loads(line)
+        results[record["id"]] = record
+    if len(complete) < len(data):
+        with open(path, "r+b") as f:
+            f.truncate(len(complete))
+    return results
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run_tournament(motions: List[Dict[str, str]], results_path: str, limiter: RateLimiter,
+                   llm: Union[str, BaseLLM, None] = None, concurrency: int = 8, rounds: int = 1,
+                   current_year: str = "", transcripts_dir: Optional[str] = "output/transcripts",
+                   judge_llm: Union[str, BaseLLM, None] = None) -> Dict[str, Any]:
+    """
+    Debates every motion not already in results_path, concurrency at a time, and
+    appends each result as soon as it is done. Every argument and decision is also
+    written to transcripts_dir/<motion id>/, unless transcripts_dir is None.
+
+    The debaters use llm and the judge judge_llm; either defaults to the agent's
+    model in config/agents.yaml.
+
+    A result line holds the motion's id, the motion, the judge's decision (or the
+    error), the debate's wall time in seconds, its LLM calls and tokens.
+
+    Returns:
+        Throughput and latency stats for the debates run this time.
+    """
+    models = Debate(verbose=False).agents_config
+    debater_llm = llm if llm is not None else models["debater"]["model"]
+    judge_llm = judge_llm if judge_llm is not None else models["judge"]["model"]
+    finished = load_results(results_path)
+    pending = [motion for motion in motions if motion["id"] not in finished or "error" in finished[motion["id"]]]
+    directory = os.path.dirname(results_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    transcripts = TranscriptStore(transcripts_dir) if transcripts_dir else None
+    write_lock = threading.Lock()
+    latencies: List[float] = []
+    failures = 0
+
+    def debate(motion: Dict[str, str]) -> None:
+        nonlocal failures
+        counted = RateLimitedLLM(limiter, debater_llm)
+        judging = RateLimitedLLM(limiter, judge_llm)
+        inputs = {"motion": motion["motion"], "current_year": current_year}
+        start = time.perf_counter()
+        record: Dict[str, Any] = {"id": motion["id"], "motion": motion["motion"]}
+        try:
+            debate_crew = Debate(llm=counted, judge_llm=judging, verbose=False, transcripts=transcripts,
+                                 debate_id=motion["id"])
+            if rounds > 1:
+                record["decision"] = run_pipelined(debate_crew.round_tasks(rounds), inputs=inputs, verbose=False).raw
+            else:
+                record["decision"] = debate_crew.crew().kickoff(inputs=inputs).raw
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - start
+        record.update(seconds=round(seconds, 3), calls=counted.calls + judging.calls,
+                      tokens=counted.tokens + judging.tokens)
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+        with write_lock:
+            with open(results_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if "error" in record:
+                failures += 1
+            else:
+                latencies.append(seconds)
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(debate, pending))
+    finally:
+        if transcripts is not None:
+            transcripts.close()
+    wall_time = time.perf_counter() - start
+    return {
+        "debates": len(pending),
+        "skipped": len(motions) - len(pending),
+        "failed": failures,
+        "wall_time": wall_time,
+        "debates_per_minute": len(pending) * 60 / wall_time if wall_time else 0.0,
+        "latency_p50": statistics.median(latencies) if latencies else 0.0,
+        "latency_p95": _percentile(latencies, 0.95),
+        "latency_max": max(latencies, default=0.0),
+        "rate_limit_waits": limiter.waits,
+        "rate_limit_seconds": limiter.waited,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="motions, one per line, or a .jsonl file")
+    parser.add_argument("--results", default="output/tournament.jsonl")
+    parser.add_argument("--transcripts", default="output/transcripts", help="directory for every debate's arguments")
+    parser.add_argument("--model", help="model for the debaters; defaults to the one in config/agents.yaml")
+    parser.add_argument("--judge-model", help="model for the judge; defaults to the one in config/agents.yaml")
+    parser.add_argument("--concurrency", type=int, default=8, help="debates at a time")
+    parser.add_argument("--rpm", type=int, default=None, help="requests per minute across all debates")
+    parser.add_argument("--tpm", type=int, default=None, help="tokens per minute across all debates")
+    parser.add_argument("--rounds", type=int, default=1, help="rounds of rebuttals per debate")
+    args = parser.parse_args()
+    try:
+        limiter = RateLimiter(args.rpm, args.tpm)
+    except ValueError as e:
+        parser.error(str(e))
+
+    stats = run_tournament(load_motions(args.path), args.results, limiter, llm=args.model,
+                           concurrency=args.concurrency, rounds=args.rounds,
+                           current_year=time.strftime("%Y"), transcripts_dir=args.transcripts or None,
+                           judge_llm=args.judge_model)
+    print(f"{stats['debates']} debates in {stats['wall_time']:.1f}s ({stats['debates_per_minute']:.1f} per minute), "
+          f"{stats['failed']} failed, {stats['skipped']} already done")
+    print(f"Latency p50 {stats['latency_p50']:.1f}s, p95 {stats['latency_p95']:.1f}s, max {stats['latency_max']:.1f}s")
+    print(f"Waited for the rate limit {stats['rate_limit_waits']} times, {stats['rate_limit_seconds']:.1f}s in total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import os
+import queue
+import re
+import threading
+from typing import Optional
+
+
+class TranscriptStore:
+    """
+    Writes debate artifacts on a background thread, so saving them never holds up a
+    debate. Each artifact goes to <directory>/<debate id>/<name>.md.
+    """
+
+    def __init__(self, directory: str = "output/transcripts"):
+        self.directory = directory
+        self.written = 0
+        self.bytes = 0
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._write_all, name="transcript-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, debate_id: str, name: str, text: str) -> None:
+        """ Queues an artifact to be written """
+        self._queue.put((debate_id, name, text))
+
+    def path(self, debate_id: str, name: str) -> str:
+        safe = [re.sub(r"[^\w.-]+", "_", part) for part in (debate_id, name)]
+        return os.path.join(self.directory, safe[0], f"{safe[1]}.md")
+
+    def _write_all(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                debate_id, name, text = item
+                path = self.path(debate_id, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(tmp_path, path)
+                self.written += 1
+                self.bytes += len(text)
+            except OSError as e:
+                print(f"Could not write transcript {item[:2]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """ Waits until every queued artifact is written """
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
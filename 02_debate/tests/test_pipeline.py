@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+from debate.bench_latency import INPUTS, StubLLM
+from debate.crew import Debate
+from debate.pipeline import run_pipelined
+
+
+class TestRunPipelined(unittest.TestCase):
+    def setUp(self):
+        # decide writes its output file relative to the working directory
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(tmp.name)
+        self.tasks = Debate(llm=StubLLM(latency=0.2), verbose=False).round_tasks(2)
+        self.run = run_pipelined(self.tasks, inputs=INPUTS, verbose=False)
+
+    def started(self, name):
+        return self.run.finished[name] - self.run.durations[name]
+
+    def needs(self, task):
+        """Names of the listed tasks a task waits for, looking through summary carriers"""
+        names = set()
+        for needed in task.context or []:
+            names |= {needed.name} if any(needed is listed for listed in self.tasks) else self.needs(needed)
+        return names
+
+    def test_tasks_start_after_their_context(self):
+        """Test no task starts before every task in its context has finished"""
+        for task in self.tasks:
+            for name in self.needs(task):
+                self.assertLessEqual(self.run.finished[name], self.started(task.name) + 0.01,
+                                     f"{task.name} started before {name} finished")
+
+    def test_judge_notes_a_round_while_the_next_is_argued(self):
+        """Test the judge's note on round 1 runs alongside both sides' round 2 arguments"""
+        for name in ("propose_2", "oppose_2"):
+            self.assertLess(self.started(name), self.run.finished["judge_round_1"])
+            self.assertLess(self.started("judge_round_1"), self.run.finished[name])
+
+    def test_faster_than_one_task_at_a_time(self):
+        """Test the pipelined run takes well under the sum of its tasks' durations"""
+        self.assertEqual(self.run.raw, "A concise and convincing argument.")
+        self.assertLess(self.run.wall_time, self.run.sequential_time * 0.8)
+
+
+if __name__ == '__main__':
+    unittest.main()
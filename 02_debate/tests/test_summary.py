@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import unittest
+
+from debate.summary import estimate_tokens, summarize
+
+ARGUMENT = """Strict laws are needed because unregulated models already cause measurable harm. Deepfakes of \
+real people spread faster than any correction. Automated scams target the elderly at scale.
+
+Regulation works when it sets clear duties. Car makers accept crash tests, and nobody calls that the end of \
+cars. Model makers should accept safety tests in the same way. Audits of training data would expose bias early.
+
+Critics say laws slow innovation. Yet safety rules made aviation trustworthy, and trust grew the market. \
+Clear laws give companies certainty, and certainty brings investment.
+
+In short, strict laws protect people, reward careful builders and keep public trust in models."""
+
+
+class TestSummarize(unittest.TestCase):
+    def test_short_text_is_unchanged(self):
+        """Test text within the budget is returned as it is"""
+        self.assertEqual(summarize(ARGUMENT, estimate_tokens(ARGUMENT)), ARGUMENT)
+
+    def test_summary_fits_budget(self):
+        """Test the summary never exceeds the budget, at any budget"""
+        for budget in range(1, estimate_tokens(ARGUMENT) + 1, 7):
+            with self.subTest(budget=budget):
+                self.assertLessEqual(estimate_tokens(summarize(ARGUMENT, budget)), budget)
+
+    def test_summary_is_whole_sentences_in_order(self):
+        """Test the summary is sentences of the text, verbatim and in their original order"""
+        summary = summarize(ARGUMENT, 60)
+        self.assertLess(len(summary), len(ARGUMENT))
+        positions = []
+        for sentence in summary.split(". "):
+            sentence = sentence if sentence.endswith(".") else sentence + "."
+            self.assertIn(sentence, ARGUMENT)
+            positions.append(ARGUMENT.index(sentence))
+        self.assertEqual(positions, sorted(positions))
+
+    def test_favours_repeated_content(self):
+        """Test the sentences carrying the argument's recurring words are the ones kept"""
+        summary = summarize(ARGUMENT, 40)
+        self.assertIn("laws", summary.lower())
+        self.assertNotIn("Deepfakes", summary)
+
+    def test_falls_back_to_truncation(self):
+        """Test text whose every sentence is over the budget is cut to the budget"""
+        text = "word " * 100 + "end."
+        self.assertEqual(summarize(text + "\n" + text, 5), (text + "\n" + text)[:20])
+
+    def test_deterministic_across_processes(self):
+        """Test the same text and budget give the same summary whatever the hash seed"""
+        script = "import sys; from debate.summary import summarize; print(summarize(sys.stdin.read(), 60))"
+        summaries = set()
+        for seed in ("1", "2", "3"):
+            env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=os.pathsep.join(sys.path))
+            result = subprocess.run([sys.executable, "-c", script], input=ARGUMENT, capture_output=True,
+                                    text=True, env=env, check=True, timeout=30)
+            summaries.add(result.stdout)
+        self.assertEqual(summaries, {summarize(ARGUMENT, 60) + "\n"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from crewai.llms.base_llm import BaseLLM
+
+from debate.crew import Debate
+from debate.tournament import RateLimiter, load_results
+
+
+class StubLLM(BaseLLM):
+    """Stands in for a model, answering every call with a fixed reply"""
+
+    def __init__(self, model):
+        super().__init__(model=model)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        return "Final Answer: stub"
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_rejects_limits_below_one(self):
+        """Test a zero requests or tokens per minute limit is refused instead of failing in acquire"""
+        with self.assertRaises(ValueError):
+            RateLimiter(rpm=0)
+        with self.assertRaises(ValueError):
+            RateLimiter(tpm=0)
+
+    def test_waits_for_the_window_at_the_request_limit(self):
+        """Test a request over the requests per minute limit waits for the oldest to leave the window"""
+        limiter = RateLimiter(rpm=2, window=0.2)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.acquire(1)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(limiter.waits, 1)
+
+    def test_settle_frees_reserved_tokens(self):
+        """Test settling a reservation to fewer tokens lets a waiting request through before the window ends"""
+        limiter = RateLimiter(tpm=100, window=60)
+        reservation = limiter.acquire(80)
+        acquired = threading.Event()
+        waiter = threading.Thread(target=lambda: (limiter.acquire(30), acquired.set()))
+        waiter.start()
+        self.assertFalse(acquired.wait(0.1))
+        limiter.settle(reservation, 50)
+        self.assertTrue(acquired.wait(5))
+        waiter.join()
+        self.assertEqual(limiter.waits, 1)
+
+    def test_oversized_request_runs_alone(self):
+        """Test a request larger than the whole token budget runs once the window is empty"""
+        limiter = RateLimiter(tpm=100, window=60)
+        limiter.acquire(500)
+        self.assertEqual(limiter.waits, 0)
+
+
+class TestLoadResults(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "tournament.jsonl")
+
+    def test_missing_file_has_no_results(self):
+        """Test a first run starts with no finished debates"""
+        self.assertEqual(load_results(self.path), {})
+
+    def test_torn_line_is_cut_off(self):
+        """Test a line torn by a killed run is dropped, and the next result starts on its own line"""
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write('{"id":"1","decision":"For"}\n{"id":"2","decision":"Against"}\n{"id":"3","deci')
+        self.assertEqual(sorted(load_results(self.path)), ["1", "2"])
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": "3", "decision": "For"}) + "\n")
+        results = load_results(self.path)
+        self.assertEqual(sorted(results), ["1", "2", "3"])
+        self.assertEqual(results["3"]["decision"], "For")
+
+
+class TestModels(unittest.TestCase):
+    def test_judge_keeps_its_own_model(self):
+        """Test replacing the debaters' model leaves the judge's model alone"""
+        debaters, judge = StubLLM("openai/gpt-4o"), StubLLM("anthropic/claude-3-7-sonnet-latest")
+        debate = Debate(llm=debaters, judge_llm=judge, verbose=False)
+        self.assertIs(debate.debater().llm, debaters)
+        self.assertIs(debate.opposing_debater().llm, debaters)
+        self.assertIs(debate.judge().llm, judge)
+
+
+if __name__ == '__main__':
+    unittest.main()
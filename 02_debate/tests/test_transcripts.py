@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import threading
+import unittest
+
+from debate.bench_latency import INPUTS, StubLLM
+from debate.crew import Debate
+from debate.transcripts import TranscriptStore
+
+
+class RecordingStore(TranscriptStore):
+    """A transcript store that also notes the order artifacts are recorded in, and from which threads"""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.recorded = []
+        self.threads = set()
+
+    def record(self, debate_id, name, text):
+        self.recorded.append(name)
+        self.threads.add(threading.get_ident())
+        super().record(debate_id, name, text)
+
+
+class TestTranscriptStore(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+
+    def read(self, store, debate_id, name):
+        with open(store.path(debate_id, name), encoding="utf-8") as f:
+            return f.read()
+
+    def test_close_writes_everything_queued(self):
+        """Test every artifact queued before close is on disk once close returns"""
+        store = TranscriptStore(self.directory)
+        for number in range(200):
+            store.record(f"debate {number % 3}", f"round_{number}", f"argument {number}")
+        store.close()
+        self.assertEqual((store.written, store.bytes), (200, sum(len(f"argument {n}") for n in range(200))))
+        self.assertEqual(self.read(store, "debate 2", "round_5"), "argument 5")
+        self.assertFalse([name for _, _, names in os.walk(self.directory) for name in names if name.endswith(".tmp")])
+
+    def test_later_record_wins(self):
+        """Test artifacts are written in the order they were recorded, so a rewrite keeps the latest text"""
+        store = TranscriptStore(self.directory)
+        store.record("debate", "decide", "first draft")
+        store.record("debate", "decide", "final verdict")
+        store.flush()
+        self.assertEqual(self.read(store, "debate", "decide"), "final verdict")
+        store.close()
+
+    def test_paths_stay_inside_the_directory(self):
+        """Test debate ids and names can't escape the transcript directory"""
+        store = TranscriptStore(self.directory)
+        self.addCleanup(store.close)
+        path = store.path("../motion: LLM laws?", "../../propose")
+        self.assertTrue(os.path.abspath(path).startswith(os.path.abspath(self.directory) + os.sep))
+
+    def test_async_debaters_are_both_recorded_before_the_verdict(self):
+        """Test both debaters' arguments, recorded from their own threads, are saved before the judge's decision"""
+        store = RecordingStore(self.directory)
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(self.directory)
+        crew = Debate(llm=StubLLM(latency=0.2), verbose=False, transcripts=store, debate_id="llm laws").crew()
+        crew.kickoff(inputs=INPUTS)
+        store.close()
+        self.assertEqual(sorted(store.recorded[:2]), ["oppose", "propose"])
+        self.assertEqual(store.recorded[2:], ["decide"])
+        self.assertGreater(len(store.threads), 1)
+        for name in ("propose", "oppose", "decide"):
+            self.assertEqual(self.read(store, "llm laws", name), "A concise and convincing argument.")
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "output")))
+
+
+if __name__ == '__main__':
+    unittest.main()
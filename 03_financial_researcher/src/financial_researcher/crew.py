@@ -1,6 +1,6 @@
 from crewai import Agent, Task, Process, Crew
 from crewai.project import CrewBase, agent, task, crew
-from crewai_tools import SerperDevTool
+from agent_common.search_tool import CachedSerperDevTool
 
 @CrewBase
 class FinancialResearcher():
@@ -8,7 +8,8 @@ class FinancialResearcher():
 
     @agent
     def researcher(self) -> Agent:
-        return Agent(config=self.agents_config['researcher'], verbose=True, tools=[SerperDevTool()])
+        return Agent(config=self.agents_config['researcher'], verbose=True,
+                     tools=[CachedSerperDevTool(crew='financial_researcher')])
 
     @agent
     def analyst(self) -> Agent:
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import warnings
 from datetime import datetime
+from agent_common.search_cache import get_search_cache
 from financial_researcher.crew import FinancialResearcher
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
@@ -16,6 +17,7 @@ def run():
 
     result = FinancialResearcher().crew().kickoff(inputs=inputs)
     print(result.raw)
+    print(f"Search cache: {get_search_cache().report()}")
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+Research many companies at once.
+
+Each company goes through the researcher and then the analyst. Research runs for up
+to --researchers companies at a time, and a company moves on to the analyst as soon
+as its research is done, so analysis of one company overlaps the research of the
+next. Every finished stage is saved, so rerunning after a failure or a kill only
+redoes the stages that didn't finish:
+    python -m financial_researcher.portfolio AAPL MSFT NVDA --researchers 4 --analysts 2
+    python -m financial_researcher.portfolio --file tickers.txt
+
+Writes output/portfolio/<company>/research.md and report.md, and an index.md of all
+the companies.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from crewai import Crew, Process, Task
+from crewai.tasks.output_format import OutputFormat
+from crewai.tasks.task_output import TaskOutput
+
+from agent_common.search_cache import get_search_cache
+from financial_researcher.crew import FinancialResearcher
+
+
+def _slug(company: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", company.strip())
+
+
+def _write(path: str, text: str) -> None:
+    """ Writes atomically, so a file that exists is always complete """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _summary(report: str, limit: int = 300) -> str:
+    """ The report's executive summary, or its opening, on one line """
+    match = re.search(r"executive summary[^\n]*\n+(.+?)(?:\n\s*\n|\n#|$)", report, re.IGNORECASE | re.DOTALL)
+    text = " ".join((match.group(1) if match else report).split()).lstrip("#* ")
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + "..."
+
+
+class Portfolio:
+    """ Runs the research pipeline for a list of companies and keeps its progress on disk """
+
+    def __init__(self, companies: List[str], directory: str = "output/portfolio", researchers: int = 4,
+                 analysts: int = 2, verbose: bool = False):
+        self.companies = list(dict.fromkeys(company.strip() for company in companies if company.strip()))
+        self.directory = directory
+        self.researchers = researchers
+        self.analysts = analysts
+        self.verbose = verbose
+        self.current_year = str(datetime.now().year)
+        self.results: Dict[str, Dict] = {}
+
+    def path(self, company: str, stage: str) -> str:
+        return os.path.join(self.directory, _slug(company), f"{stage}.md")
+
+    def _done(self, company: str, stage: str) -> Optional[str]:
+        path = self.path(company, stage)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        return None
+
+    async def _stage(self, task: Task, inputs: Dict[str, str]) -> str:
+        crew = Crew(agents=[task.agent], tasks=[task], process=Process.sequential, verbose=self.verbose)
+        return (await crew.kickoff_async(inputs=inputs)).raw
+
+    async def _company(self, company: str, research_slots: asyncio.Semaphore,
+                       analysis_slots: asyncio.Semaphore) -> None:
+        result = self.results[company] = {"company": company, "status": "done", "research_seconds": None,
+                                          "analysis_seconds": None, "resumed": [], "error": None}
+        crew = FinancialResearcher()
+        research_task, analyst_task = crew.research_task(), crew.analyst_task()
+        inputs = {"company": company, "current_year": self.current_year}
+        try:
+            report = self._done(company, "report")
+            if report is not None:
+                result["resumed"].append("report")
+            else:
+                research = self._done(company, "research")
+                if research is None:
+                    async with research_slots:
+                        start = time.perf_counter()
+                        research = await self._stage(research_task, inputs)
+                        result["research_seconds"] = time.perf_counter() - start
+                    _write(self.path(company, "research"), research)
+                else:
+                    result["resumed"].append("research")
+                    # the analyst reads the saved research as its context
+                    research_task.output = TaskOutput(description=research_task.description, raw=research,
+                                                      agent=research_task.agent.role,
+                                                      output_format=OutputFormat.RAW)
+                async with analysis_slots:
+                    start = time.perf_counter()
+                    report = await self._stage(analyst_task, inputs)
+                    result["analysis_seconds"] = time.perf_counter() - start
+                _write(self.path(company, "report"), report)
+            result["summary"] = _summary(report)
+        except Exception as e:
+            result["status"] = "failed"
+            result["error"] = f"{type(e).__name__}: {e}"
+
+    async def _run_all(self) -> None:
+        research_slots = asyncio.Semaphore(self.researchers)
+        analysis_slots = asyncio.Semaphore(self.analysts)
+        await asyncio.gather(*(self._company(company, research_slots, analysis_slots)
+                               for company in self.companies))
+
+    def run(self) -> Dict:
+        """
+        Researches and analyzes every company not already done, then writes the index.
+
+        Returns:
+            Throughput stats for this run.
+        """
+        start = time.perf_counter()
+        asyncio.run(self._run_all())
+        wall_time = time.perf_counter() - start
+        results = list(self.results.values())
+        ran = [result for result in results if result["research_seconds"] or result["analysis_seconds"]]
+        busy = sum((result["research_seconds"] or 0) + (result["analysis_seconds"] or 0) for result in results)
+        stats = {
+            "companies": len(results),
+            "done": sum(result["status"] == "done" for result in results),
+            "failed": sum(result["status"] == "failed" for result in results),
+            "resumed": sum(bool(result["resumed"]) for result in results),
+            "wall_time": wall_time,
+            "companies_per_minute": len(ran) * 60 / wall_time if wall_time else 0.0,
+            "stage_seconds": busy,
+        }
+        self.write_index(stats)
+        return stats
+
+    def write_index(self, stats: Dict) -> None:
+        lines = [
+            "# Portfolio research",
+            "",
+            f"{stats['done']} of {stats['companies']} companies done, {stats['failed']} failed, "
+            f"generated {datetime.now():%Y-%m-%d %H:%M}.",
+            "",
+            "| Company | Status | Research | Analysis | Summary |",
+            "| --- | --- | --- | --- | --- |",
+        ]
+        for company in self.companies:
+            result = self.results[company]
+
+            def timing(stage: str, seconds: Optional[float]) -> str:
+                if stage in result["resumed"] or (stage == "research" and "report" in result["resumed"]):
+                    return "saved"
+                return f"{seconds:.0f}s" if seconds else "-"
+
+            if result["status"] == "done":
+                link = f"[{company}]({_slug(company)}/report.md)"
+                status = "done"
+                summary = result["summary"].replace("|", "\\|")
+            else:
+                link, status, summary = company, "failed", result["error"].replace("|", "\\|")
+            lines.append(f"| {link} | {status} | {timing('research', result['research_seconds'])} | "
+                         f"{timing('report', result['analysis_seconds'])} | {summary} |")
+        _write(os.path.join(self.directory, "index.md"), "\n".join(lines) + "\n")
+        _write(os.path.join(self.directory, "index.json"), json.dumps(list(self.results.values()), indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("companies", nargs="*", help="tickers or company names")
+    parser.add_argument("--file", help="file with one ticker or company name per line")
+    parser.add_argument("--researchers", type=int, default=4, help="companies researched at a time")
+    parser.add_argument("--analysts", type=int, default=2, help="companies analyzed at a time")
+    parser.add_argument("--output", default="output/portfolio")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    companies = list(args.companies)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            companies += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not companies:
+        parser.error("give companies on the command line or with --file")
+
+    portfolio = Portfolio(companies, args.output, args.researchers, args.analysts, args.verbose)
+    stats = portfolio.run()
+    print(f"{stats['done']} of {stats['companies']} companies done in {stats['wall_time']:.1f}s "
+          f"({stats['companies_per_minute']:.1f} per minute), {stats['failed']} failed, "
+          f"{stats['resumed']} resumed from saved stages")
+    if stats["wall_time"]:
+        print(f"Stages took {stats['stage_seconds']:.1f}s in total, {stats['stage_seconds'] / stats['wall_time']:.1f}x "
+              f"the wall time, from running companies and stages side by side")
+    print(f"Search cache: {get_search_cache().report()}")
+    print(f"Index written to {os.path.join(args.output, 'index.md')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import yaml
+from crewai import Agent, Task
+from crewai.llms.base_llm import BaseLLM
+
+from financial_researcher import crew, portfolio
+from financial_researcher.portfolio import Portfolio
+
+COMPANIES = ("Apple", "Nvidia", "Tesla")
+
+
+class StubLLM(BaseLLM):
+    """Stands in for a model: waits, then answers for whichever company the task names"""
+
+    def __init__(self, stage, log, latency=0.3, fail=()):
+        super().__init__(model="stub")
+        self.stage = stage
+        self.log = log
+        self.latency = latency
+        self.fail = set(fail)
+        self.prompts = {}
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        prompt = messages if isinstance(messages, str) else "\n".join(m["content"] for m in messages)
+        company = next(name for name in COMPANIES if re.search(rf"\b{name}\b", prompt))
+        self.prompts[company] = prompt
+        start = time.perf_counter()
+        time.sleep(self.latency)
+        self.log.append((self.stage, company, start, time.perf_counter()))
+        if company in self.fail:
+            raise RuntimeError(f"{self.stage} of {company} failed")
+        answer = (f"# {company} research\nRevenue grew." if self.stage == "research" else
+                  f"# {company} report\n\n## Executive summary\n{company} looks steady.\n\n## Outlook\nFine.")
+        return f"Thought: I now know the final answer\nFinal Answer: {answer}"
+
+    def supports_function_calling(self):
+        return False
+
+    def get_context_window_size(self):
+        return 128000
+
+
+class StubCrew:
+    """Stands in for FinancialResearcher, with the real task configs and stub models"""
+
+    researcher_llm = analyst_llm = None
+
+    def __init__(self):
+        with open(os.path.join(os.path.dirname(crew.__file__), "config", "tasks.yaml")) as f:
+            self.config = yaml.safe_load(f)
+
+    def task(self, name, llm, context):
+        config = {key: value for key, value in self.config[name].items() if key not in ("agent", "context")}
+        agent = Agent(role=llm.stage, goal="Report on companies", backstory="An analyst", llm=llm, max_retry_limit=0)
+        return Task(agent=agent, context=context, **config)
+
+    def research_task(self):
+        self.research = self.task("research_task", StubCrew.researcher_llm, [])
+        return self.research
+
+    def analyst_task(self):
+        return self.task("analysis_task", StubCrew.analyst_llm, [self.research])
+
+
+class TestPortfolio(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = os.path.join(tmp.name, "portfolio")
+        patcher = patch.object(portfolio, "FinancialResearcher", StubCrew)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_portfolio(self, companies, fail=(), researchers=1, analysts=1):
+        self.log = []
+        StubCrew.researcher_llm = StubLLM("research", self.log)
+        StubCrew.analyst_llm = StubLLM("analysis", self.log, fail=fail)
+        stats = Portfolio(list(companies), self.directory, researchers, analysts).run()
+        return stats
+
+    def span(self, stage, company):
+        spans = [(start, end) for logged, name, start, end in self.log if (logged, name) == (stage, company)]
+        self.assertEqual(len(spans), 1, f"{stage} of {company} ran {len(spans)} times")
+        return spans[0]
+
+    def saved(self, company, stage):
+        return os.path.exists(os.path.join(self.directory, company, f"{stage}.md"))
+
+    def index(self):
+        with open(os.path.join(self.directory, "index.json"), encoding="utf-8") as f:
+            return {result["company"]: result for result in json.load(f)}
+
+    def test_analysis_overlaps_next_research(self):
+        """Test one company is analyzed while the next is researched"""
+        stats = self.run_portfolio(["Apple", "Nvidia"])
+        self.assertEqual((stats["done"], stats["failed"]), (2, 0))
+        first, second = sorted(["Apple", "Nvidia"], key=lambda company: self.span("research", company)[0])
+        analysis, research = self.span("analysis", first), self.span("research", second)
+        self.assertLess(analysis[0], research[1])
+        self.assertLess(research[0], analysis[1])
+        self.assertLess(stats["wall_time"], stats["stage_seconds"])
+
+    def test_resume_skips_saved_stages(self):
+        """Test a saved report skips a company and saved research skips straight to the analyst"""
+        for company, stage, text in (("Apple", "report", "# Apple\n\n## Executive summary\nSaved.\n"),
+                                     ("Nvidia", "research", "Nvidia sells GPUs to everyone.")):
+            os.makedirs(os.path.join(self.directory, company), exist_ok=True)
+            with open(os.path.join(self.directory, company, f"{stage}.md"), "w", encoding="utf-8") as f:
+                f.write(text)
+        stats = self.run_portfolio(["Apple", "Nvidia", "Tesla"])
+        self.assertEqual((stats["done"], stats["resumed"]), (3, 2))
+        self.assertEqual(sorted((stage, company) for stage, company, _, _ in self.log),
+                         [("analysis", "Nvidia"), ("analysis", "Tesla"), ("research", "Tesla")])
+        self.assertIn("Nvidia sells GPUs to everyone.", StubCrew.analyst_llm.prompts["Nvidia"])
+        index = self.index()
+        self.assertEqual((index["Apple"]["resumed"], index["Nvidia"]["resumed"]), (["report"], ["research"]))
+        self.assertEqual(index["Apple"]["summary"], "Saved.")
+
+    def test_failed_analysis_keeps_research_for_next_run(self):
+        """Test a failed analysis leaves the research saved, and the next run only redoes the analysis"""
+        stats = self.run_portfolio(["Apple", "Tesla"], fail=["Tesla"])
+        self.assertEqual((stats["done"], stats["failed"]), (1, 1))
+        self.assertTrue(self.saved("Tesla", "research"))
+        self.assertFalse(self.saved("Tesla", "report"))
+        self.assertIn("analysis of Tesla failed", self.index()["Tesla"]["error"])
+
+        stats = self.run_portfolio(["Apple", "Tesla"])
+        self.assertEqual((stats["done"], stats["failed"]), (2, 0))
+        self.assertEqual([(stage, company) for stage, company, _, _ in self.log], [("analysis", "Tesla")])
+        self.assertTrue(self.saved("Tesla", "report"))
+
+    def test_index_lists_every_company(self):
+        """Test index.json and index.md record each company's status, timings and summary"""
+        self.run_portfolio(["Apple", "Nvidia"], fail=["Nvidia"], researchers=2)
+        index = self.index()
+        self.assertEqual(list(index), ["Apple", "Nvidia"])
+        self.assertEqual(index["Apple"]["status"], "done")
+        self.assertEqual(index["Apple"]["summary"], "Apple looks steady.")
+        self.assertGreater(index["Apple"]["research_seconds"], 0)
+        self.assertEqual((index["Nvidia"]["status"], index["Nvidia"]["analysis_seconds"]), ("failed", None))
+        with open(os.path.join(self.directory, "index.md"), encoding="utf-8") as f:
+            markdown = f.read()
+        self.assertIn("1 of 2 companies done, 1 failed", markdown)
+        self.assertIn("| [Apple](Apple/report.md) | done |", markdown)
+        self.assertFalse([name for name in os.listdir(self.directory) if name.endswith(".tmp")])
+
+
+if __name__ == '__main__':
+    unittest.main()
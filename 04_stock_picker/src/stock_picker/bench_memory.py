@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Benchmark many parallel crews writing to one long term memory database.
+
+Compares the stock LTMSQLiteStorage with BatchedLTMSQLiteStorage:
+    python -m stock_picker.bench_memory --writers 16 --rows 500
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from crewai.memory.storage.ltm_sqlite_storage import LTMSQLiteStorage
+
+from stock_picker.storage import BatchedLTMSQLiteStorage
+
+
+def _writer(storage_name: str, db_path: str, writer_id: int, rows: int) -> float:
+    if storage_name == "batched":
+        storage = BatchedLTMSQLiteStorage(db_path=db_path)
+    else:
+        storage = LTMSQLiteStorage(db_path=db_path)
+    start = time.perf_counter()
+    for i in range(rows):
+        storage.save(
+            task_description=f"task {i % 20}",
+            metadata={"writer": writer_id, "row": i, "quality": 7},
+            datetime=datetime.now().isoformat(),
+            score=7,
+        )
+        if i % 10 == 0:
+            storage.load(f"task {i % 20}", 3)
+    if isinstance(storage, BatchedLTMSQLiteStorage):
+        storage.close()
+    return time.perf_counter() - start
+
+
+def bench(storage_name: str, writers: int, rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "long_term_memory_storage.db")
+        # create the schema up front so writers don't race on it
+        schema = (BatchedLTMSQLiteStorage if storage_name == "batched" else LTMSQLiteStorage)(db_path=db_path)
+        if isinstance(schema, BatchedLTMSQLiteStorage):
+            schema.close()
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=writers) as pool:
+            durations = list(pool.map(_writer, [storage_name] * writers, [db_path] * writers,
+                                      range(writers), [rows] * writers))
+        elapsed = time.perf_counter() - start
+        with sqlite3.connect(db_path) as conn:
+            count = conn.execute("SELECT COUNT(*) FROM long_term_memories").fetchone()[0]
+    total = writers * rows
+    print(f"{storage_name:>8}: {writers} writers x {rows} rows -> {count}/{total} rows stored in "
+          f"{elapsed:.2f}s ({total / elapsed:,.0f} rows/s, slowest writer {max(durations):.2f}s)")
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--rows", type=int, default=500)
+    args = parser.parse_args()
+    for storage_name in ("stock", "batched"):
+        bench(storage_name, args.writers, args.rows)
+
+
+if __name__ == "__main__":
+    run()
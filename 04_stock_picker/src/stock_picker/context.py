@@ -0,0 +1,68 @@
+import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from crewai.tasks.task_output import TaskOutput
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional, fall back to a rough estimate
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """ Prompt tokens for text, using tiktoken when it is installed and ~4 chars per token otherwise """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+class ContextProjector:
+    """
+    Replaces a structured task output with a compact, field-selected projection of it, so
+    downstream tasks read only the fields they need. The full model is still written to the
+    task's output file, on a background thread so the crew doesn't wait for disk.
+    """
+
+    def __init__(self):
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifact-writer")
+        self._pending: List[Future] = []
+        self.report: List[Dict[str, Any]] = []
+
+    def callback(self, task_name: str, include: Dict[str, Any],
+                 output_file: Optional[str] = None) -> Callable[[TaskOutput], None]:
+        """
+        A task callback that projects the output onto `include` (pydantic include syntax)
+        and queues the full output for writing to output_file
+        """
+        def project(output: TaskOutput) -> None:
+            if output.pydantic is None:
+                return
+            if output_file:
+                self._pending.append(self._writer.submit(self._write, output_file, output.pydantic.model_dump_json()))
+            full_tokens = count_tokens(output.raw)
+            output.raw = json.dumps(output.pydantic.model_dump(include=include), separators=(",", ":"))
+            self.report.append({"task": task_name, "full_tokens": full_tokens, "projected_tokens": count_tokens(output.raw)})
+        return project
+
+    @staticmethod
+    def _write(path: str, content: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def flush(self) -> None:
+        """ Waits for queued output files to be written """
+        for future in self._pending:
+            future.result()
+        self._pending.clear()
+
+    def print_report(self) -> None:
+        for row in self.report:
+            saved = row["full_tokens"] - row["projected_tokens"]
+            print(f"Context from {row['task']}: {row['full_tokens']} -> {row['projected_tokens']} tokens "
+                  f"({saved} saved)")
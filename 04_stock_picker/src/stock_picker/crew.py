@@ -1,12 +1,16 @@
 from crewai import Agent, Crew, Process, Task
-from crewai.project import CrewBase, agent, crew, task
+from crewai.project import CrewBase, agent, crew, task, before_kickoff, after_kickoff
+from crewai.tasks.task_output import TaskOutput
 from crewai.memory import LongTermMemory, ShortTermMemory, EntityMemory
 from crewai.memory.storage.rag_storage import RAGStorage
-from crewai.memory.storage.ltm_sqlite_storage import LTMSQLiteStorage
+from agent_common.search_cache import get_search_cache
+from agent_common.search_tool import CachedSerperDevTool
+from stock_picker.context import ContextProjector
+from stock_picker.router import ManagerRouter
+from stock_picker.storage import BatchedLTMSQLiteStorage
+from stock_picker.ticker_index import TickerIndex
 from stock_picker.tools.push_tool import PushNotificationTool
-from typing import List
-
-from crewai_tools import SerperDevTool
+from typing import Any, Dict, List, Optional, Tuple
 from pydantic import Field, BaseModel
 
 
@@ -25,6 +29,7 @@ class TrendingCompanyList(BaseModel):
 class TrendingCompanyResearch(BaseModel):
     """ Detailed research on a company """
     name: str = Field(description="Company name")
+    ticker: str = Field(description="Stock ticker symbol")
     market_position: str = Field(description="Current market position and competitive analysis")
     future_outlook: str = Field(description="Future outlook and growth prospects")
     investment_potential: str = Field(description="Investment potential and suitability for investment")
@@ -35,42 +40,134 @@ class TrendingCompanyResearchList(BaseModel):
     research_list: List[TrendingCompanyResearch] = Field(description="Comprehensive research on all trending companies")
 
 
+class InvestmentDecision(BaseModel):
+    """ The company picked for investment, and why """
+    name: str = Field(description="Name of the chosen company")
+    ticker: str = Field(description="Stock ticker symbol of the chosen company")
+    rationale: str = Field(description="Detailed report on why this company was chosen")
+    not_selected: str = Field(description="The companies that were not selected and why")
+
+
+# The fields each downstream task reads: research needs only which companies to look up,
+# and the pick only each company's investment potential
+TRENDING_CONTEXT = {'companies': {'__all__': {'name', 'ticker'}}}
+RESEARCH_CONTEXT = {'research_list': {'__all__': {'name', 'ticker', 'investment_potential'}}}
+
+
 @CrewBase
 class StockPicker():
     """StockPicker crew"""
 
+    def __init__(self, ticker_index: Optional[TickerIndex] = None):
+        self.ticker_index = ticker_index or TickerIndex()
+        self._candidates: Dict[str, str] = {}
+        self._pick: Optional[str] = None
+        self.context_projector = ContextProjector()
+        self.manager_router: Optional[ManagerRouter] = None
+
+    @before_kickoff
+    def add_excluded_tickers(self, inputs):
+        inputs['excluded_tickers'] = ", ".join(self.ticker_index.excluded()) or "none"
+        return inputs
+
+    @after_kickoff
+    def write_artifacts(self, result):
+        self.record_tickers()
+        self.context_projector.flush()
+        self.context_projector.print_report()
+        if self.manager_router:
+            print(f"Manager routing: {self.manager_router.report()}")
+        print(f"Search cache: {get_search_cache().report()}")
+        return result
+
+    def exclude_known_companies(self, output: TaskOutput) -> Tuple[bool, Any]:
+        """
+        Drops companies found or picked in earlier runs, and repeats within the list, before
+        any research is done on them. They are recorded only once the run has succeeded.
+        """
+        if output.pydantic is None:
+            return False, "Respond with the list of trending companies in the expected format."
+        companies = output.pydantic.companies
+        tickers = set(self.ticker_index.fresh(company.ticker for company in companies))
+        fresh = []
+        for company in companies:
+            if company.ticker in tickers:
+                fresh.append(company)
+                tickers.discard(company.ticker)
+        if not fresh:
+            repeats = ", ".join(company.ticker for company in companies)
+            return False, f"All of these companies have been found before: {repeats}. Find different companies."
+        self._candidates = {company.ticker: company.name for company in fresh}
+        return True, TrendingCompanyList(companies=fresh).model_dump_json()
+
+    def record_pick(self, output: TaskOutput) -> None:
+        """ Keeps the ticker of the chosen company, to record once the run has succeeded """
+        if output.pydantic is not None:
+            self._pick = output.pydantic.ticker
+
+    def record_tickers(self) -> None:
+        """ Records this run's candidates as found and its pick as picked """
+        if self._candidates:
+            self.ticker_index.record(list(self._candidates), TickerIndex.FOUND, self._candidates)
+        if self._pick:
+            self.ticker_index.record([self._pick], TickerIndex.PICKED)
+
     @agent
     def trending_company_finder(self) -> Agent:
-        return Agent(config=self.agents_config['trending_company_finder'], tools=[SerperDevTool()], memory=True)
+        return Agent(config=self.agents_config['trending_company_finder'],
+                     tools=[CachedSerperDevTool(crew='stock_picker')], memory=True)
 
     @agent
     def financial_researcher(self) -> Agent:
-        return Agent(config=self.agents_config['financial_researcher'], tools=[SerperDevTool()])
+        return Agent(config=self.agents_config['financial_researcher'],
+                     tools=[CachedSerperDevTool(crew='stock_picker')])
 
     @agent
     def stock_picker(self) -> Agent:
         return Agent(config=self.agents_config['stock_picker'], tools=[PushNotificationTool()], memory=True)
 
+    # Output files of structured tasks are written by the context projector, off the critical path
+
     @task
     def find_trending_companies(self) -> Task:
-        return Task(config=self.tasks_config['find_trending_companies'], output_pydantic=TrendingCompanyList)
+        config = dict(self.tasks_config['find_trending_companies'])
+        output_file = config.pop('output_file')
+        return Task(config=config, output_pydantic=TrendingCompanyList,
+                    guardrail=self.exclude_known_companies,
+                    callback=self.context_projector.callback(
+                        'find_trending_companies',
+                        TRENDING_CONTEXT,
+                        output_file))
 
     @task
     def research_trending_companies(self) -> Task:
-        return Task(config=self.tasks_config['research_trending_companies'],
-                    output_pydantic=TrendingCompanyResearchList)
+        config = dict(self.tasks_config['research_trending_companies'])
+        output_file = config.pop('output_file')
+        return Task(config=config, output_pydantic=TrendingCompanyResearchList,
+                    callback=self.context_projector.callback(
+                        'research_trending_companies',
+                        RESEARCH_CONTEXT,
+                        output_file))
 
     @task
     def pick_best_company(self) -> Task:
-        return Task(config=self.tasks_config['pick_best_company'])
+        return Task(config=self.tasks_config['pick_best_company'], output_pydantic=InvestmentDecision,
+                    callback=self.record_pick)
 
     @crew
     def crew(self) -> Crew:
         """Creates the StockPicker crew"""
 
+        # Routine delegations go to a rule or the cheap model; only ambiguous turns reach gpt-4o
+        self.manager_router = ManagerRouter(
+            routes=[(task, task.agent) for task in self.tasks],
+            strong=self.agents_config['manager']['llm']
+        ).listen()
+
         manager = Agent(
             config=self.agents_config['manager'],
-            allow_delegation=True
+            allow_delegation=True,
+            llm=self.manager_router
         )
 
         short_term_memory = ShortTermMemory(
@@ -87,7 +184,7 @@ class StockPicker():
         )
 
         long_term_memory = LongTermMemory(
-            storage=LTMSQLiteStorage(
+            storage=BatchedLTMSQLiteStorage(
                 db_path="./memory/long_term_memory_storage.db"
             )
         )
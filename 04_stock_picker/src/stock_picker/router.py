@@ -0,0 +1,237 @@
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import yaml
+from crewai import LLM, Agent, Task
+from crewai.llms.base_llm import BaseLLM
+from crewai.tasks.task_output import TaskOutput
+from crewai.tools.agent_tools.delegate_work_tool import DelegateWorkTool
+from crewai.utilities.constants import NOT_SPECIFIED
+from crewai.utilities.events import (
+    AgentExecutionCompletedEvent,
+    AgentExecutionStartedEvent,
+    TaskCompletedEvent,
+    ToolUsageErrorEvent,
+    ToolUsageFinishedEvent,
+    crewai_event_bus,
+)
+from crewai.utilities.formatter import aggregate_raw_outputs_from_task_outputs
+
+PRICES_PATH = Path(__file__).parent / "config" / "prices.yaml"
+
+RULE = "rule"
+CHEAP = "cheap"
+STRONG = "strong"
+
+DELEGATE = DelegateWorkTool.model_fields["name"].default
+
+
+def _tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def load_prices(path: Union[str, Path] = PRICES_PATH) -> Dict[str, Tuple[float, float]]:
+    """ USD per million input and output tokens, by model """
+    with open(path, encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    return {model: (float(price["input"]), float(price["output"])) for model, price in config.items()}
+
+
+class ManagerRouter(BaseLLM):
+    """
+    LLM for the hierarchical manager that only spends gpt-4o on decisions that need it.
+
+    In a linear flow each task has an obvious owner, so the first manager turn on a task is a
+    delegation to that agent and, once the coworker has answered, the next turn returns that
+    answer. Those turns are produced by a deterministic rule. Turns that only need the manager
+    to fix its output format go to the cheap model; everything else goes to the strong model.
+
+    The router follows the run through crewAI's events: which task the manager has started,
+    and whether the task's owner answered the delegation. It never reads the prompt.
+    """
+
+    def __init__(self, routes: List[Tuple[Task, Agent]], strong: str = "openai/gpt-4o",
+                 cheap: str = "openai/gpt-4o-mini", prices: Optional[Dict[str, Tuple[float, float]]] = None):
+        """
+        Args:
+            routes: Each task with the agent that owns it. Taken before kickoff, as crewAI
+                makes the manager the agent of every task it runs.
+            strong: Model for turns that need judgment.
+            cheap: Model for format fixes.
+            prices: USD per million input and output tokens by model, for the savings
+                report; by default read from config/prices.yaml.
+        """
+        super().__init__(model=strong)
+        self.routes = routes
+        self.strong_model = strong
+        self.cheap_model = cheap
+        self.prices = load_prices() if prices is None else prices
+        self._llms = {STRONG: LLM(model=strong), CHEAP: LLM(model=cheap)}
+        self.turns: List[Dict[str, Any]] = []
+        self._manager_key: Optional[str] = None
+        self._task: Optional[Task] = None
+        self._owner: Optional[Agent] = None
+        self._owner_answered = False
+        self._task_calls = 0
+        self._started: Dict[int, int] = {}
+        self._finished: List[TaskOutput] = []
+        self._delegation: Optional[str] = None
+        self._listening = False
+
+    def listen(self) -> "ManagerRouter":
+        """ Follows the manager's tasks and delegations on crewAI's event bus """
+        if self._listening:
+            return self
+        self._listening = True
+
+        @crewai_event_bus.on(AgentExecutionStartedEvent)
+        def on_agent_started(source: Any, event: AgentExecutionStartedEvent) -> None:
+            if event.agent.llm is self:
+                self._manager_key = event.agent.key
+                self.start_task(event.task)
+
+        @crewai_event_bus.on(AgentExecutionCompletedEvent)
+        def on_agent_completed(source: Any, event: AgentExecutionCompletedEvent) -> None:
+            if self._owner is not None and event.agent is self._owner:
+                self._owner_answered = True
+
+        @crewai_event_bus.on(ToolUsageFinishedEvent)
+        def on_tool_finished(source: Any, event: ToolUsageFinishedEvent) -> None:
+            if event.agent_key == self._manager_key and event.tool_name == DELEGATE:
+                # the delegation tool reports a coworker it couldn't find as a normal result
+                self.finish_delegation(str(event.output) if self._owner_answered else None)
+
+        @crewai_event_bus.on(ToolUsageErrorEvent)
+        def on_tool_error(source: Any, event: ToolUsageErrorEvent) -> None:
+            if event.agent_key == self._manager_key and event.tool_name == DELEGATE:
+                self.finish_delegation(None)
+
+        @crewai_event_bus.on(TaskCompletedEvent)
+        def on_task_completed(source: Any, event: TaskCompletedEvent) -> None:
+            if event.task is not None and id(event.task) in self._started:
+                self._finished.append(event.output)
+
+        return self
+
+    def start_task(self, task: Task) -> None:
+        """ The manager has started a task, or is retrying it after a guardrail rejected its output """
+        self._task = task
+        self._owner = next((agent for routed, agent in self.routes if routed is task), None)
+        self._owner_answered = False
+        self._task_calls = 0
+        self._delegation = None
+        self._started[id(task)] = self._started.get(id(task), 0) + 1
+
+    def finish_delegation(self, result: Optional[str]) -> None:
+        """ The coworker has answered the current task's delegation; None if the delegation failed """
+        self._delegation = result
+        self._owner_answered = False
+
+    def _context(self, task: Task) -> str:
+        if task.context is NOT_SPECIFIED:
+            return aggregate_raw_outputs_from_task_outputs(self._finished)
+        return aggregate_raw_outputs_from_task_outputs(
+            [context.output for context in task.context or [] if context.output is not None])
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+    ) -> Union[str, Any]:
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        start = time.perf_counter()
+        tier, response = self._rule(messages)
+        if response is None:
+            llm = self._llms[tier]
+            llm.stop = self.stop
+            response = llm.call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions)
+        self._task_calls += 1
+        self._log(tier, messages, response, time.perf_counter() - start)
+        return response
+
+    def _rule(self, messages: List[Dict[str, str]]) -> Tuple[str, Optional[str]]:
+        task, owner = self._task, self._owner
+        # a task without an owner, or one retried after its guardrail, needs the manager's judgment
+        if task is None or owner is None or self._started[id(task)] > 1:
+            return STRONG, None
+        if self._task_calls == 0:
+            action_input = {
+                "task": task.description.strip(),
+                "context": f"{self._context(task)}\n\nExpected output: {task.expected_output.strip()}".strip(),
+                "coworker": owner.role.strip(),
+            }
+            return RULE, (f"Thought: This is a job for the {owner.role.strip()}, so I will delegate it.\n"
+                          f"Action: {DELEGATE}\n"
+                          f"Action Input: {json.dumps(action_input)}")
+        if self._delegation:
+            result, self._delegation = self._delegation, None
+            return RULE, f"Thought: I now know the final answer\nFinal Answer: {result}"
+        if messages[-1]["role"] == "user":
+            # crewAI answers a reply it couldn't parse with a reminder of the format
+            return CHEAP, None
+        return STRONG, None
+
+    def _log(self, tier: str, messages: List[Dict[str, str]], response: Any, latency: float) -> None:
+        prompt_tokens = sum(_tokens(m["content"]) for m in messages)
+        completion_tokens = _tokens(str(response))
+        strong_cost = self._cost(self.strong_model, prompt_tokens, completion_tokens)
+        cost = {RULE: 0.0, CHEAP: self._cost(self.cheap_model, prompt_tokens, completion_tokens),
+                STRONG: strong_cost}[tier]
+        strong_latencies = [t["latency"] for t in self.turns if t["tier"] == STRONG]
+        if tier == STRONG:
+            latency_saved = 0.0
+        elif strong_latencies:
+            latency_saved = max(sum(strong_latencies) / len(strong_latencies) - latency, 0.0)
+        else:
+            latency_saved = None  # no strong-model turn yet to compare against
+        turn = {
+            "tier": tier,
+            "latency": latency,
+            "cost": cost,
+            "cost_saved": None if cost is None or strong_cost is None else strong_cost - cost,
+            "latency_saved": latency_saved,
+        }
+        self.turns.append(turn)
+        print(f"Manager turn {len(self.turns)} handled by {tier} tier in {latency:.2f}s "
+              f"(saved {self._dollars(turn['cost_saved'])}, {self._seconds(latency_saved)})")
+
+    def _cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+        """ Estimated USD for a call, or None for a model without a configured price """
+        if model not in self.prices:
+            return None
+        input_price, output_price = self.prices[model]
+        return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+    @staticmethod
+    def _dollars(value: Optional[float]) -> str:
+        return "an unknown amount" if value is None else f"${value:.4f}"
+
+    @staticmethod
+    def _seconds(value: Optional[float]) -> str:
+        return "unknown time" if value is None else f"~{value:.2f}s"
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Turns per tier, and the cost and latency saved against the strong model. Savings
+        that couldn't be estimated are left out of the sums and counted as unknown.
+        """
+        tiers = {tier: sum(1 for t in self.turns if t["tier"] == tier) for tier in (RULE, CHEAP, STRONG)}
+        return {
+            "turns": len(self.turns),
+            "tiers": tiers,
+            "cost": sum(t["cost"] for t in self.turns if t["cost"] is not None),
+            "cost_saved": sum(t["cost_saved"] for t in self.turns if t["cost_saved"] is not None),
+            "latency_saved": sum(t["latency_saved"] for t in self.turns if t["latency_saved"] is not None),
+            "unknown_savings": sum(1 for t in self.turns if t["cost_saved"] is None or t["latency_saved"] is None),
+        }
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return self._llms[STRONG].get_context_window_size()
@@ -0,0 +1,241 @@
+import copy
+import json
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from crewai.memory.storage.ltm_sqlite_storage import LTMSQLiteStorage
+
+
+def _write_rows(conn: sqlite3.Connection, rows: List[Tuple[str, str, str, Union[int, float]]]) -> None:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            """
+            INSERT INTO long_term_memories (task_description, metadata, datetime, score)
+            VALUES (?, ?, ?, ?)
+            """,
+            rows,
+        )
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+
+def _finalize(db_path: str, busy_timeout_ms: int, lock: threading.RLock,
+              pending: List[Tuple[str, str, str, Union[int, float]]],
+              stop: threading.Event, wakeup: threading.Event) -> None:
+    """
+    Stops the flusher and writes rows still queued when a storage that wasn't closed is
+    collected or the interpreter exits. Takes the storage's parts rather than the storage,
+    so it doesn't keep it alive.
+    """
+    stop.set()
+    wakeup.set()
+    with lock:
+        if not pending:
+            return
+        rows = pending[:]
+        del pending[:]
+        try:
+            conn = sqlite3.connect(db_path, timeout=busy_timeout_ms / 1000, isolation_level=None)
+            try:
+                _write_rows(conn, rows)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"MEMORY ERROR: {len(rows)} long term memories were lost at shutdown: {e}")
+
+
+def _flush_loop(storage_ref: "weakref.ref[BatchedLTMSQLiteStorage]", stop: threading.Event,
+                wakeup: threading.Event, flush_interval: float) -> None:
+    # holds the storage only while flushing, so an unused storage can be collected
+    while not stop.is_set():
+        wakeup.wait()
+        wakeup.clear()
+        if stop.wait(flush_interval):
+            break
+        storage = storage_ref()
+        if storage is None:
+            break
+        storage.flush()
+        del storage
+
+
+class BatchedLTMSQLiteStorage(LTMSQLiteStorage):
+    """
+    Long term memory storage that can be shared by several crews at once.
+
+    The database runs in WAL mode so readers never block the writer, saves are
+    buffered and committed together in one transaction, lookups by task description
+    use an index, and recent lookups are served from an in-memory cache.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        batch_size: int = 32,
+        flush_interval: float = 0.5,
+        cache_size: int = 256,
+        busy_timeout_ms: int = 5000,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self._lock = threading.RLock()
+        self._pending: List[Tuple[str, str, str, Union[int, float]]] = []
+        self._cache: "OrderedDict[Tuple[str, int], List[Dict[str, Any]]]" = OrderedDict()
+        self._data_version: Optional[int] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        super().__init__(db_path=db_path)
+        self._flusher = threading.Thread(
+            target=_flush_loop, args=(weakref.ref(self), self._stop, self._wakeup, flush_interval),
+            name="ltm-flusher", daemon=True)
+        self._flusher.start()
+        # flushes at exit, or when the storage is collected without being closed
+        self._finalizer = weakref.finalize(self, _finalize, self.db_path, busy_timeout_ms, self._lock,
+                                           self._pending, self._stop, self._wakeup)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000,
+                                         check_same_thread=False, isolation_level=None)
+            self._conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+        return self._conn
+
+    def _initialize_db(self):
+        """
+        Creates the LTM table, switches the database to WAL mode and indexes the lookup columns
+        """
+        super()._initialize_db()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute(
+                    """
+                    CREATE INDEX IF NOT EXISTS idx_long_term_memories_task_datetime
+                    ON long_term_memories (task_description, datetime DESC, score)
+                    """
+                )
+        except sqlite3.Error as e:
+            self._printer.print(
+                content=f"MEMORY ERROR: An error occurred while configuring the LTM database: {e}",
+                color="red",
+            )
+
+    def save(
+        self,
+        task_description: str,
+        metadata: Dict[str, Any],
+        datetime: str,
+        score: Union[int, float],
+    ) -> None:
+        """Queues a row for the next batched write; the batch is flushed when full or after flush_interval."""
+        with self._lock:
+            self._pending.append((task_description, json.dumps(metadata), datetime, score))
+            self._invalidate(task_description)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+        else:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Writes all queued rows in a single transaction and returns how many were written."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            # the queue is emptied in place, as the finalizer holds the same list
+            rows = self._pending[:]
+            del self._pending[:]
+            try:
+                conn = self._connection()
+                _write_rows(conn, rows)
+                self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            except sqlite3.Error as e:
+                self._pending[:0] = rows
+                self._printer.print(
+                    content=f"MEMORY ERROR: An error occurred while saving to LTM: {e}",
+                    color="red",
+                )
+                return 0
+            return len(rows)
+
+    def load(
+        self, task_description: str, latest_n: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Queries the LTM table by task description, serving repeated lookups from the cache."""
+        self.flush()
+        key = (task_description, latest_n)
+        with self._lock:
+            try:
+                conn = self._connection()
+                # data_version changes when another connection (e.g. another crew) commits
+                data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+                if data_version != self._data_version:
+                    self._cache.clear()
+                    self._data_version = data_version
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    return copy.deepcopy(self._cache[key])
+                rows = conn.execute(
+                    """
+                    SELECT metadata, datetime, score
+                    FROM long_term_memories
+                    WHERE task_description = ?
+                    ORDER BY datetime DESC, score ASC
+                    LIMIT ?
+                    """,
+                    (task_description, latest_n),
+                ).fetchall()
+            except sqlite3.Error as e:
+                self._printer.print(
+                    content=f"MEMORY ERROR: An error occurred while querying LTM: {e}",
+                    color="red",
+                )
+                return None
+            if not rows:
+                return None
+            results = [
+                {"metadata": json.loads(row[0]), "datetime": row[1], "score": row[2]}
+                for row in rows
+            ]
+            self._cache[key] = results
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return copy.deepcopy(results)
+
+    def reset(self) -> None:
+        """Drops queued rows and cached lookups, then resets the LTM table."""
+        with self._lock:
+            self._pending.clear()
+            self._cache.clear()
+        super().reset()
+
+    def close(self) -> None:
+        """Flushes any queued rows and stops the background flusher."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._wakeup.set()
+        self.flush()
+        self._finalizer.detach()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _invalidate(self, task_description: str) -> None:
+        for key in [key for key in self._cache if key[0] == task_description]:
+            del self._cache[key]
@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+
+class TickerIndex:
+    """
+    On-disk record of every ticker the crew has found or picked, with timestamps.
+
+    Checking whether a company was seen before is a set lookup, so the crew can drop
+    repeats deterministically instead of relying on the agents recalling them from RAG memory.
+    """
+
+    FOUND = "found"
+    PICKED = "picked"
+
+    def __init__(self, path: str = "./memory/ticker_index.json", max_age_days: Optional[int] = None):
+        self.path = path
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, str]] = self._load()
+
+    @staticmethod
+    def normalize(ticker: str) -> str:
+        """ Tickers are compared case-insensitively and without an exchange prefix like NYSE: """
+        return ticker.strip().upper().split(":")[-1].strip()
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def __contains__(self, ticker: str) -> bool:
+        entry = self._entries.get(self.normalize(ticker))
+        if entry is None:
+            return False
+        if self.max_age_days is None:
+            return True
+        last_seen = datetime.fromisoformat(entry["last_seen"])
+        return datetime.now() - last_seen <= timedelta(days=self.max_age_days)
+
+    def fresh(self, tickers: Iterable[str]) -> List[str]:
+        """ The tickers not in the index, each once, in their original order """
+        seen = set()
+        fresh = []
+        for ticker in tickers:
+            key = self.normalize(ticker)
+            if key and key not in seen and ticker not in self:
+                seen.add(key)
+                fresh.append(ticker)
+        return fresh
+
+    def excluded(self) -> List[str]:
+        """ All tickers that would currently be filtered out, sorted """
+        return sorted(ticker for ticker in self._entries if ticker in self)
+
+    def record(self, tickers: Iterable[str], status: str = FOUND, names: Optional[Dict[str, str]] = None) -> None:
+        """ Marks tickers as found or picked; a picked ticker stays picked """
+        now = datetime.now().isoformat(timespec="seconds")
+        names = names or {}
+        with self._lock:
+            for ticker in tickers:
+                key = self.normalize(ticker)
+                entry = self._entries.setdefault(key, {"first_seen": now, "status": status})
+                entry["last_seen"] = now
+                if status == self.PICKED:
+                    entry["status"] = self.PICKED
+                    entry["picked_at"] = now
+                if ticker in names:
+                    entry["name"] = names[ticker]
+            self._save()
@@ -1,10 +1,9 @@
-import os
-import requests
-
 from crewai.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
 
+from agent_common.push_dispatcher import get_dispatcher
+
 
 class PushNotificationInput(BaseModel):
     """ A message to be sent to a user. """
@@ -18,12 +17,7 @@ class PushNotificationTool(BaseTool):
     args_schema: Type[BaseModel] = PushNotificationInput
 
     def _run(self, message: str) -> str:
-        pushover_user = os.getenv("PUSHOVER_USER")
-        pushover_token = os.getenv("PUSHOVER_TOKEN")
-        pushover_url = f"https://api.pushover.net/1/messages.json"
-
         print(f"Push: {message}")
-        payload = {"user": pushover_user, "token": pushover_token, "message": message}
-        requests.post(pushover_url, data=payload)
+        get_dispatcher().enqueue(message)
 
-        return '{"notification": "ok"}'
+        return '{"notification": "queued"}'
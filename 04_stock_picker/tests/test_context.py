@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+import unittest
+
+from crewai.tasks.task_output import TaskOutput
+
+from stock_picker.context import ContextProjector
+from stock_picker.crew import TRENDING_CONTEXT, TrendingCompany, TrendingCompanyList
+
+
+class TestContextProjector(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        companies = TrendingCompanyList(companies=[
+            TrendingCompany(name="Lockheed Martin", ticker="LMT",
+                            reason="Won a multi-year contract for next-generation interceptors, announced this week"),
+            TrendingCompany(name="RTX", ticker="RTX",
+                            reason="Raised its full-year guidance on strong missile and engine demand"),
+        ])
+        self.output = TaskOutput(description="find", agent="finder", raw=companies.model_dump_json(),
+                                 pydantic=companies)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_trending_context_keeps_only_names_and_tickers(self):
+        """Test research reads which companies to look up, and the full list is still written out"""
+        projector = ContextProjector()
+        path = os.path.join(self.tmp.name, "trending_companies.json")
+        projector.callback("find_trending_companies", TRENDING_CONTEXT, path)(self.output)
+        projector.flush()
+        self.assertEqual(json.loads(self.output.raw), {"companies": [
+            {"name": "Lockheed Martin", "ticker": "LMT"}, {"name": "RTX", "ticker": "RTX"}]})
+        report = projector.report[0]
+        self.assertLess(report["projected_tokens"], report["full_tokens"])
+        with open(path, encoding="utf-8") as f:
+            self.assertIn("reason", json.load(f)["companies"][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
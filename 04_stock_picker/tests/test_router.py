@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import json
+import unittest
+
+from crewai import Agent, Task
+from crewai.agents.parser import AgentAction, AgentFinish, CrewAgentParser
+from crewai.tasks.task_output import TaskOutput
+from crewai.utilities.events import (
+    AgentExecutionCompletedEvent,
+    AgentExecutionStartedEvent,
+    ToolUsageFinishedEvent,
+    crewai_event_bus,
+)
+
+from stock_picker.router import CHEAP, DELEGATE, RULE, STRONG, ManagerRouter, load_prices
+
+
+class StubLLM:
+    """Stands in for a model, answering every call with a fixed reply"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+        self.stop = []
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        self.calls += 1
+        return self.reply
+
+    def get_context_window_size(self):
+        return 128000
+
+
+PROMPT = [{"role": "system", "content": "You are the manager"}, {"role": "user", "content": "Do the task"}]
+
+
+class TestManagerRouter(unittest.TestCase):
+    def setUp(self):
+        self.researcher = Agent(role="Senior Financial Researcher", goal="Research", backstory="An analyst",
+                                llm="openai/gpt-4o-mini")
+        self.finder_task = Task(description="Find trending companies", expected_output="A list")
+        self.finder_task.output = TaskOutput(description="Find trending companies", agent="finder",
+                                             raw='{"companies":[{"name":"RTX","ticker":"RTX"}]}')
+        self.task = Task(description="Research the companies", expected_output="A report",
+                         agent=self.researcher, context=[self.finder_task])
+        self.router = ManagerRouter(routes=[(self.task, self.researcher)],
+                                    prices={"openai/gpt-4o": (2.50, 10.00), "openai/gpt-4o-mini": (0.15, 0.60)})
+        self.strong = StubLLM("Thought: I need to think\nFinal Answer: strong")
+        self.cheap = StubLLM("Thought: fixed\nFinal Answer: cheap")
+        self.router._llms = {STRONG: self.strong, CHEAP: self.cheap}
+
+    def emit_delegation(self, manager, output, owner_answered=True):
+        if owner_answered:
+            crewai_event_bus.emit(self.researcher, AgentExecutionCompletedEvent(
+                agent=self.researcher, task=self.task, output=output))
+        crewai_event_bus.emit(None, ToolUsageFinishedEvent(
+            agent_key=manager.key, agent_role="Manager", tool_name=DELEGATE, tool_args={},
+            tool_class="DelegateWorkTool", started_at=0, finished_at=0, output=output))
+
+    def test_first_turn_delegates_to_task_owner(self):
+        """Test the first turn is a rule delegation built from the task, its owner and its context"""
+        self.router.start_task(self.task)
+        answer = CrewAgentParser.parse_text(self.router.call(PROMPT))
+        self.assertIsInstance(answer, AgentAction)
+        self.assertEqual(answer.tool, DELEGATE)
+        action_input = json.loads(answer.tool_input)
+        self.assertEqual(action_input["task"], "Research the companies")
+        self.assertEqual(action_input["coworker"], "Senior Financial Researcher")
+        self.assertIn('"ticker":"RTX"', action_input["context"])
+        self.assertIn("Expected output: A report", action_input["context"])
+        self.assertEqual(self.router.turns[-1]["tier"], RULE)
+        self.assertEqual(self.strong.calls + self.cheap.calls, 0)
+
+    def test_returns_coworker_answer_after_delegation(self):
+        """Test the turn after a finished delegation returns the coworker's answer"""
+        self.router.start_task(self.task)
+        self.router.call(PROMPT)
+        self.router.finish_delegation("RTX looks strong")
+        answer = CrewAgentParser.parse_text(self.router.call(PROMPT + [{"role": "assistant", "content": "..."}]))
+        self.assertIsInstance(answer, AgentFinish)
+        self.assertEqual(answer.output, "RTX looks strong")
+        self.assertEqual(self.router.report()["tiers"], {RULE: 2, CHEAP: 0, STRONG: 0})
+
+    def test_failed_delegation_goes_to_strong_model(self):
+        """Test the manager decides what to do after a delegation fails"""
+        self.router.start_task(self.task)
+        self.router.call(PROMPT)
+        self.router.finish_delegation(None)
+        self.router.call(PROMPT + [{"role": "assistant", "content": "..."}])
+        self.assertEqual(self.strong.calls, 1)
+
+    def test_format_reminder_goes_to_cheap_model(self):
+        """Test a reply crewAI re-prompts for is fixed by the cheap model"""
+        self.router.start_task(self.task)
+        self.router.call(PROMPT)
+        self.router.call(PROMPT + [{"role": "assistant", "content": "..."},
+                                   {"role": "user", "content": "Invalid format"}])
+        self.assertEqual(self.cheap.calls, 1)
+
+    def test_guardrail_retry_goes_to_strong_model(self):
+        """Test a task started again after its guardrail rejected the output isn't handled by rule"""
+        self.router.start_task(self.task)
+        self.router.start_task(self.task)
+        self.router.call(PROMPT)
+        self.assertEqual(self.strong.calls, 1)
+
+    def test_task_without_owner_goes_to_strong_model(self):
+        """Test the manager chooses the coworker for a task without an owner"""
+        self.router.start_task(Task(description="Anything", expected_output="Something"))
+        self.router.call(PROMPT)
+        self.assertEqual(self.strong.calls, 1)
+
+    def test_latency_saved_unknown_without_strong_sample(self):
+        """Test no latency saving is claimed until a strong-model turn has been timed"""
+        self.router.start_task(self.task)
+        self.router.call(PROMPT)
+        self.assertIsNone(self.router.turns[-1]["latency_saved"])
+        self.assertEqual(self.router.report()["unknown_savings"], 1)
+        self.assertGreater(self.router.report()["cost_saved"], 0)
+
+    def test_unpriced_model_has_unknown_cost(self):
+        """Test a model missing from the price list doesn't fall back to another model's prices"""
+        router = ManagerRouter(routes=[], strong="openai/gpt-4o", cheap="openai/unpriced", prices=load_prices())
+        self.assertIn("openai/gpt-4o", router.prices)
+        self.assertIsNone(router._cost("openai/unpriced", 1000, 1000))
+
+    def manager(self):
+        return Agent(role="Manager", goal="Manage", backstory="A manager", llm=self.router, allow_delegation=True)
+
+    def test_follows_manager_through_events(self):
+        """Test the router learns the manager's task and the owner's answer from crewAI's events"""
+        manager = self.manager()
+        with crewai_event_bus.scoped_handlers():
+            self.router.listen()
+            # crewAI makes the manager the agent of the task it runs
+            self.task.agent = manager
+            crewai_event_bus.emit(manager, AgentExecutionStartedEvent(agent=manager, task=self.task, tools=[],
+                                                                      task_prompt=""))
+            delegation = json.loads(CrewAgentParser.parse_text(self.router.call(PROMPT)).tool_input)
+            self.assertEqual(delegation["coworker"], "Senior Financial Researcher")
+            self.emit_delegation(manager, "RTX looks strong")
+            answer = CrewAgentParser.parse_text(self.router.call(PROMPT))
+        self.assertEqual(answer.output, "RTX looks strong")
+
+    def test_delegation_the_owner_never_answered_goes_to_strong_model(self):
+        """Test a delegation tool result without the owner running, such as an unknown coworker, isn't echoed"""
+        manager = self.manager()
+        with crewai_event_bus.scoped_handlers():
+            self.router.listen()
+            crewai_event_bus.emit(manager, AgentExecutionStartedEvent(agent=manager, task=self.task, tools=[],
+                                                                      task_prompt=""))
+            self.router.call(PROMPT)
+            self.emit_delegation(manager, "Error executing tool. coworker mentioned not found", owner_answered=False)
+            self.router.call(PROMPT + [{"role": "assistant", "content": "..."}])
+        self.assertEqual(self.strong.calls, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import gc
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from stock_picker.storage import BatchedLTMSQLiteStorage
+
+
+def count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM long_term_memories").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class TestBatchedLTMSQLiteStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ltm.db")
+        self.storages = []
+
+    def tearDown(self):
+        for storage in self.storages:
+            storage.close()
+        self.tmp.cleanup()
+
+    def storage(self, **kwargs):
+        storage = BatchedLTMSQLiteStorage(db_path=self.db_path, **kwargs)
+        self.storages.append(storage)
+        return storage
+
+    def test_flushes_when_batch_is_full(self):
+        """Test saves are held back until batch_size rows are queued"""
+        storage = self.storage(batch_size=3, flush_interval=60)
+        storage.save("task", {"quality": 1}, "2025-01-01", 1)
+        storage.save("task", {"quality": 2}, "2025-01-02", 2)
+        self.assertEqual(count_rows(self.db_path), 0)
+        storage.save("task", {"quality": 3}, "2025-01-03", 3)
+        self.assertEqual(count_rows(self.db_path), 3)
+
+    def test_flushes_after_interval(self):
+        """Test a partial batch is written by the background flusher"""
+        storage = self.storage(batch_size=100, flush_interval=0.05)
+        storage.save("task", {"quality": 1}, "2025-01-01", 1)
+        deadline = time.monotonic() + 5
+        while count_rows(self.db_path) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(count_rows(self.db_path), 1)
+
+    def test_load_sees_rows_committed_by_another_connection(self):
+        """Test a cached lookup is invalidated when another storage commits"""
+        reader = self.storage(flush_interval=60)
+        writer = self.storage(flush_interval=60)
+        writer.save("task", {"quality": 1}, "2025-01-01", 1)
+        writer.flush()
+        self.assertEqual(len(reader.load("task", 5)), 1)
+        writer.save("task", {"quality": 2}, "2025-01-02", 2)
+        writer.flush()
+        rows = reader.load("task", 5)
+        self.assertEqual([row["metadata"]["quality"] for row in rows], [2, 1])
+
+    def test_load_returns_copies_of_cached_rows(self):
+        """Test callers can't change what the cache returns to the next caller"""
+        storage = self.storage(flush_interval=60)
+        storage.save("task", {"suggestions": ["a"]}, "2025-01-01", 1)
+        storage.load("task", 5)[0]["metadata"]["suggestions"].append("b")
+        self.assertEqual(storage.load("task", 5)[0]["metadata"]["suggestions"], ["a"])
+
+    def test_unclosed_storage_is_collected_and_flushed(self):
+        """Test a storage dropped without close() writes its queued rows and isn't kept alive"""
+        storage = BatchedLTMSQLiteStorage(db_path=self.db_path, batch_size=100, flush_interval=60)
+        storage.save("task", {"quality": 1}, "2025-01-01", 1)
+        flusher = storage._flusher
+        del storage
+        gc.collect()
+        self.assertEqual(count_rows(self.db_path), 1)
+        flusher.join(5)
+        self.assertFalse(flusher.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from stock_picker.crew import InvestmentDecision, StockPicker, TrendingCompany, TrendingCompanyList
+from stock_picker.ticker_index import TickerIndex
+
+
+class TestTickerIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ticker_index.json")
+        self.index = TickerIndex(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_normalize(self):
+        """Test tickers compare without case, whitespace or exchange prefix"""
+        self.assertEqual(TickerIndex.normalize(" nyse:lmt "), "LMT")
+        self.index.record(["LMT"])
+        self.assertIn("nyse:lmt", self.index)
+
+    def test_record_persists(self):
+        """Test recorded tickers survive reloading the index"""
+        self.index.record(["LMT", "RTX"], TickerIndex.FOUND, {"LMT": "Lockheed Martin"})
+        reloaded = TickerIndex(self.path)
+        self.assertEqual(reloaded.excluded(), ["LMT", "RTX"])
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["LMT"]["name"], "Lockheed Martin")
+
+    def test_picked_stays_picked(self):
+        """Test finding a picked ticker again doesn't demote it"""
+        self.index.record(["LMT"], TickerIndex.PICKED)
+        self.index.record(["LMT"], TickerIndex.FOUND)
+        self.assertEqual(TickerIndex(self.path)._entries["LMT"]["status"], TickerIndex.PICKED)
+
+    def test_max_age(self):
+        """Test tickers last seen longer ago than max_age_days are no longer excluded"""
+        self.index.record(["LMT", "RTX"])
+        self.index._entries["LMT"]["last_seen"] = (datetime.now() - timedelta(days=10)).isoformat()
+        self.index.max_age_days = 7
+        self.assertNotIn("LMT", self.index)
+        self.assertEqual(self.index.excluded(), ["RTX"])
+
+    def test_fresh_drops_known_and_repeated_tickers(self):
+        """Test fresh keeps the first of each new ticker in order"""
+        self.index.record(["LMT"])
+        self.assertEqual(self.index.fresh(["RTX", "lmt", "NOC", "rtx", "NYSE:NOC"]), ["RTX", "NOC"])
+
+
+class TestStockPickerTickers(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = TickerIndex(os.path.join(self.tmp.name, "ticker_index.json"))
+        self.index.record(["LMT"])
+        self.picker = SimpleNamespace(ticker_index=self.index, _candidates={}, _pick=None)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def companies(self, *tickers):
+        return SimpleNamespace(pydantic=TrendingCompanyList(companies=[
+            TrendingCompany(name=f"{ticker} Inc", ticker=ticker, reason="in the news") for ticker in tickers]))
+
+    def test_guardrail_drops_known_and_repeated_companies(self):
+        """Test the guardrail passes on each new company once"""
+        ok, result = StockPicker.exclude_known_companies(self.picker, self.companies("LMT", "RTX", "rtx", "NOC"))
+        self.assertTrue(ok)
+        self.assertEqual([company["ticker"] for company in json.loads(result)["companies"]], ["RTX", "NOC"])
+
+    def test_guardrail_retries_when_nothing_is_new(self):
+        """Test the guardrail asks for different companies when all were found before"""
+        ok, result = StockPicker.exclude_known_companies(self.picker, self.companies("LMT", "lmt"))
+        self.assertFalse(ok)
+        self.assertIn("found before", result)
+
+    def test_tickers_recorded_only_after_the_run(self):
+        """Test candidates and the pick reach the index only through record_tickers"""
+        StockPicker.exclude_known_companies(self.picker, self.companies("RTX", "NOC"))
+        decision = InvestmentDecision(name="Northrop Grumman", ticker="NOC", rationale="...", not_selected="RTX")
+        StockPicker.record_pick(self.picker, SimpleNamespace(pydantic=decision))
+        self.assertEqual(self.index.excluded(), ["LMT"])
+        StockPicker.record_tickers(self.picker)
+        self.assertEqual(self.index.excluded(), ["LMT", "NOC", "RTX"])
+        self.assertEqual(self.index._entries["NOC"]["status"], TickerIndex.PICKED)
+        self.assertEqual(self.index._entries["RTX"]["status"], TickerIndex.FOUND)
+
+
+if __name__ == '__main__':
+    unittest.main()
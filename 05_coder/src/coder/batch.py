@@ -0,0 +1,115 @@
+import json
+import os
+import queue
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from coder.crew import Coder
+from coder.sandbox import ExecutionCache
+from coder.tools.interpreter_tool import WarmInterpreterTool
+
+OUTPUT_DIR = "output/batch"  # matches the coding task's output_file in batch mode
+
+
+def load_assignments(path: str) -> List[Dict[str, str]]:
+    """
+    Reads assignments from a file: JSON lines with "assignment" and optional "id"
+    fields if it ends in .jsonl, otherwise plain text with assignments separated
+    by blank lines.
+
+    Returns:
+        List of {'id': ..., 'assignment': ...}; ids default to the assignment's position.
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".jsonl"):
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        records = [{"assignment": " ".join(block.split())} for block in re.split(r"\n\s*\n", text) if block.strip()]
+    assignments = []
+    for number, record in enumerate(records, 1):
+        assignment_id = re.sub(r"[^\w.-]+", "_", str(record.get("id") or f"{number:04d}"))
+        assignments.append({"id": assignment_id, "assignment": record["assignment"]})
+    return assignments
+
+
+class BatchResult:
+    """ Outcome and timings of a batch run """
+
+    def __init__(self, results: List[Dict], wall_time: float, interpreters: List[WarmInterpreterTool],
+                 cache: ExecutionCache):
+        self.results = results
+        self.wall_time = wall_time
+        self.cache = cache
+        self.stats = {key: sum(tool.interpreter.stats[key] for tool in interpreters)
+                      for key in ("starts", "start_seconds", "runs", "run_seconds", "timeouts")}
+
+    @property
+    def assignments_per_minute(self) -> float:
+        return len(self.results) * 60 / self.wall_time if self.wall_time else 0.0
+
+    def report(self) -> str:
+        failed = [result for result in self.results if result["error"]]
+        stats = self.stats
+        starts = stats["starts"] or 1
+        lines = [
+            f"{len(self.results)} assignments in {self.wall_time:.1f}s ({self.assignments_per_minute:.1f} per minute), "
+            f"{len(failed)} failed",
+            f"Interpreter start-up: {stats['starts']} starts, {stats['start_seconds']:.2f}s in total, "
+            f"{stats['start_seconds'] / starts * 1000:.0f}ms each, "
+            f"{stats['start_seconds'] / max(len(self.results), 1) * 1000:.0f}ms per assignment",
+            f"Code runs: {stats['runs']}, {stats['run_seconds']:.2f}s in total, {stats['timeouts']} timed out",
+            f"Execution cache: {self.cache.hits} hits, {self.cache.misses} misses "
+            f"({self.cache.hit_rate:.0%} hit rate), {self.cache.skipped} runs not memoizable",
+        ]
+        for result in self.results:
+            status = f"failed: {result['error']}" if result["error"] else result["output_file"]
+            lines.append(f"  {result['id']}: {result['seconds']:.1f}s, {status}")
+        return "\n".join(lines)
+
+
+def run_batch(assignments: List[Dict[str, str]], workers: int = 4, timeout: Optional[float] = None,
+              memoize: bool = True) -> BatchResult:
+    """
+    Runs a Coder crew for each assignment on a pool of worker threads. Each worker
+    keeps one warm interpreter for every assignment it takes, so the interpreter
+    starts once per worker rather than once per code run. The workers share one
+    ExecutionCache, unless memoize is off.
+
+    The code and output of each assignment go to output/batch/<id>.txt.
+    """
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    cache = ExecutionCache()
+    interpreters = [WarmInterpreterTool(cache=cache, memoize=memoize)
+                    for _ in range(min(workers, len(assignments)) or 1)]
+    idle: "queue.Queue[WarmInterpreterTool]" = queue.Queue()
+    for tool in interpreters:
+        if timeout:
+            tool.interpreter.timeout = timeout
+        idle.put(tool)
+
+    def run(assignment: Dict[str, str]) -> Dict:
+        tool = idle.get()
+        start = time.perf_counter()
+        error = None
+        try:
+            tool.interpreter.start()
+            Coder(interpreter=tool).crew().kickoff(
+                inputs={"assignment": assignment["assignment"], "assignment_id": assignment["id"]})
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            idle.put(tool)
+        return {"id": assignment["id"], "output_file": os.path.join(OUTPUT_DIR, f"{assignment['id']}.txt"),
+                "seconds": time.perf_counter() - start, "error": error}
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(len(interpreters)) as pool:
+            results = list(pool.map(run, assignments))
+    finally:
+        for tool in interpreters:
+            tool.interpreter.close()
+    return BatchResult(results, time.perf_counter() - start, interpreters, cache)
@@ -2,24 +2,35 @@ from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 from crewai.agents.agent_builder.base_agent import BaseAgent
 
+from coder.tools.interpreter_tool import MemoizedCodeInterpreterTool, WarmInterpreterTool
+
 
 @CrewBase
 class Coder:
     """Coder crew"""
 
+    def __init__(self, interpreter: WarmInterpreterTool = None):
+        # batch mode passes a worker's warm interpreter in place of the Docker sandbox
+        self.interpreter = interpreter
+
     @agent
     def coder(self) -> BaseAgent:
+        # either way, a verbatim rerun of deterministic code is answered from an ExecutionCache
+        tool = self.interpreter if self.interpreter is not None else MemoizedCodeInterpreterTool()
         return Agent(
             config=self.agents_config['coder'],
             verbose=True,
-            allow_code_execution=True,
-            code_execution_mode="safe",
+            tools=[tool],
             max_execution_time=30,
             max_retry_limit=5
         )
 
     @task
     def coding_task(self) -> Task:
+        if self.interpreter is not None:
+            # one file per assignment
+            return Task(config=self.tasks_config['coding_task'], verbose=True,
+                        output_file='output/batch/{assignment_id}.txt')
         return Task(config=self.tasks_config['coding_task'], verbose=True)
 
     @crew
@@ -1,7 +1,9 @@
 #!/usr/bin/env python
+import argparse
 import os
 import warnings
 
+from coder.batch import load_assignments, run_batch
 from coder.crew import Coder
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
@@ -22,4 +24,17 @@ def run():
     print(result.raw)
 
 
-    
+def batch():
+    """
+    Run the crew once per assignment in a file, on a pool of workers.
+    """
+    parser = argparse.ArgumentParser(description="Run the Coder crew on a file of assignments")
+    parser.add_argument('path', help="text file with assignments separated by blank lines, or a .jsonl file")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=30, help="seconds each code run may take")
+    parser.add_argument('--no-cache', action='store_true', help="always rerun code, even identical code")
+    args = parser.parse_args()
+
+    result = run_batch(load_assignments(args.path), workers=args.workers, timeout=args.timeout,
+                       memoize=not args.no_cache)
+    print(result.report())
@@ -0,0 +1,415 @@
+"""
+A warm Python interpreter for running generated code.
+
+The interpreter is a server process that starts once, imports the commonly used
+standard library modules, and then forks a fresh child for every piece of code it
+runs. Each child starts with the warm imports already in memory, has its CPU time
+and memory capped, runs in an empty working directory of its own, and exits when
+the code finishes, so runs never see each other's state. Starting a run costs a
+fork (about a millisecond) instead of a container.
+
+The server gets none of the parent's environment beyond SAFE_ENVIRONMENT, so API
+keys don't reach generated code, and only the standard library is importable. On
+Linux it drops its network access, where unprivileged user namespaces allow it.
+It is not a container: the code runs as the same user and can read whatever that
+user can read on the host.
+
+Where fork isn't available, code runs in the server process itself, in a fresh
+namespace, with only the wall-clock timeout as a limit.
+
+This module only uses the standard library, so it also runs as the server:
+    python sandbox.py --serve
+"""
+
+import ast
+import hashlib
+import json
+import logging
+import os
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# modules whose use makes a script's output differ from run to run
+NONDETERMINISTIC_MODULES = {'random', 'secrets', 'uuid', 'time', 'datetime', 'threading', 'multiprocessing',
+                            'asyncio', 'concurrent', 'subprocess', 'socket', 'urllib', 'requests', 'numpy.random',
+                            'tempfile', 'importlib'}
+
+# functions of otherwise deterministic modules that read the OS's randomness or the process
+NONDETERMINISTIC_FUNCTIONS = {'os.urandom', 'os.getrandom', 'os.getpid', 'os.getppid', 'os.times'}
+
+# builtins whose results depend on the process's hash seed or memory layout; iterating a
+# set of strings does too, so sets count as nondeterministic as well
+NONDETERMINISTIC_BUILTINS = {'hash', 'id', 'set', 'frozenset', '__import__'}
+
+# the only environment variables passed on to the interpreter
+SAFE_ENVIRONMENT = ('PATH', 'LANG', 'LANGUAGE', 'LC_ALL', 'LC_CTYPE', 'TZ', 'SYSTEMROOT')
+
+DEFAULT_PRELOAD = ('math', 'random', 'statistics', 'itertools', 'functools', 'collections', 'decimal',
+                   'fractions', 'datetime', 'json', 're', 'string', 'typing')
+
+
+class WarmInterpreter:
+    """
+    Client for one interpreter server process, which is started on first use and
+    restarted if it dies or a run overruns its timeout. Runs on one interpreter are
+    serialized; use one per worker thread.
+    """
+
+    def __init__(self, timeout: float = 30.0, cpu_seconds: int = 30, memory_mb: int = 512,
+                 max_output: int = 20_000, preload: Sequence[str] = DEFAULT_PRELOAD):
+        """
+        Args:
+            timeout: Wall-clock seconds a run may take before it is killed.
+            cpu_seconds: CPU time limit of each run.
+            memory_mb: Address space limit of each run.
+            max_output: Characters of output kept from each run; the rest is cut from the middle.
+            preload: Modules the server imports once, so runs don't pay for them.
+        """
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_output = max_output
+        self.preload = list(preload)
+        self.stats = {'starts': 0, 'start_seconds': 0.0, 'runs': 0, 'run_seconds': 0.0, 'timeouts': 0}
+        self.version = ''  # the server's sys.version, once started
+        self.network_isolated = False  # whether the server dropped its network access
+        self._process: Optional[subprocess.Popen] = None
+        self._workdir: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """ Starts the server process if it isn't running; returns once it is warm """
+        with self._lock:
+            self._start()
+
+    def _start(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            return
+        start = time.perf_counter()
+        self._workdir = tempfile.mkdtemp(prefix='coder-sandbox-')
+        env = {name: os.environ[name] for name in SAFE_ENVIRONMENT if name in os.environ}
+        env.update(HOME=self._workdir, TMPDIR=self._workdir, TEMP=self._workdir, TMP=self._workdir)
+        # -I ignores PYTHON* variables and the user's site-packages, -S the installed packages
+        command = [sys.executable, '-I', '-S', os.path.abspath(__file__), '--serve',
+                   '--preload', ','.join(self.preload)]
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL, bufsize=0, cwd=self._workdir, env=env)
+        # the server says when its imports are done
+        ready = json.loads(self._process.stdout.readline() or '{}')
+        self.version = ready.get('version', '')
+        self.network_isolated = ready.get('network_isolated', False)
+        if not self.network_isolated:
+            logger.warning("Interpreter could not drop network access; generated code can reach the network")
+        self.stats['starts'] += 1
+        self.stats['start_seconds'] += time.perf_counter() - start
+
+    def _stop(self) -> None:
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+        if self._workdir is not None:
+            shutil.rmtree(self._workdir, ignore_errors=True)
+            self._workdir = None
+
+    def run(self, code: str) -> Dict[str, Any]:
+        """
+        Runs code as a __main__ script.
+
+        Returns:
+            Dictionary with 'ok' (the code exited with status 0 in time), 'stdout',
+            'stderr' (including any traceback), 'output' (stdout followed by stderr),
+            'exit_code' (negative for the signal that killed it), 'timed_out' and 'seconds'.
+        """
+        with self._lock:
+            self._start()
+            start = time.perf_counter()
+            request = {'code': code, 'timeout': self.timeout, 'cpu_seconds': self.cpu_seconds,
+                       'memory_mb': self.memory_mb, 'max_output': self.max_output}
+            line = b''
+            try:
+                self._process.stdin.write(json.dumps(request).encode() + b'\n')
+                # the server enforces the timeout; this one only catches a stuck server
+                if select.select([self._process.stdout], [], [], self.timeout + 5)[0]:
+                    line = self._process.stdout.readline()
+            except OSError:
+                pass
+            if line:
+                result = json.loads(line)
+            else:
+                self._stop()
+                message = f"Interpreter stopped responding; no result after {self.timeout:.0f}s"
+                result = {'ok': False, 'stdout': '', 'stderr': message, 'output': message, 'exit_code': None,
+                          'timed_out': True}
+            result['seconds'] = time.perf_counter() - start
+            self.stats['runs'] += 1
+            self.stats['run_seconds'] += result['seconds']
+            self.stats['timeouts'] += result['timed_out']
+            return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+    def __enter__(self) -> "WarmInterpreter":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def is_deterministic(code: str) -> bool:
+    """
+    Whether code looks safe to memoize: it imports nothing that reads the clock, draws
+    random numbers or talks to other processes, calls none of NONDETERMINISTIC_FUNCTIONS
+    and uses no sets, hash() or id(). Code that doesn't parse counts as deterministic,
+    since it fails the same way every time.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return True
+    functions = {name.rsplit('.', 1)[1] for name in NONDETERMINISTIC_FUNCTIONS}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Set, ast.SetComp)):
+            return False
+        if isinstance(node, ast.Name) and node.id in NONDETERMINISTIC_BUILTINS:
+            return False
+        # os.urandom, or the same function under another name for the module
+        if isinstance(node, ast.Attribute) and node.attr in functions:
+            return False
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+        else:
+            continue
+        for name in names:
+            if (name in NONDETERMINISTIC_MODULES or name.split('.')[0] in NONDETERMINISTIC_MODULES
+                    or name in NONDETERMINISTIC_FUNCTIONS):
+                return False
+    return True
+
+
+class ExecutionCache:
+    """
+    Results of earlier runs, keyed on a hash of the code and what else decides its
+    result, such as the interpreter version and the run's limits, so a verbatim rerun
+    of deterministic code returns at once. Keeps
+    the max_entries most recently used results; safe to share between threads.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0  # runs that were not memoizable
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @staticmethod
+    def key(code: str, environment: Sequence[Any]) -> str:
+        return hashlib.sha256(json.dumps([code, *environment], default=str).encode()).hexdigest()
+
+    def call(self, code: str, environment: Sequence[Any], execute: Callable[[], Any], memoize: bool = True,
+             keep: Callable[[Any], bool] = lambda result: True) -> Tuple[Any, bool]:
+        """
+        Returns execute()'s result for running code, or the memoized result of an
+        earlier run of the same code in the same environment (whatever else decides
+        the result, such as the interpreter's version and limits). Results are memoized
+        only when memoize is set, the code is_deterministic and keep accepts the result.
+
+        Returns:
+            The result, and whether it came from the cache.
+        """
+        if not memoize or not is_deterministic(code):
+            with self._lock:
+                self.skipped += 1
+            return execute(), False
+        key = self.key(code, environment)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                logger.info("Execution cache hit: %d hits, %d misses (%.0f%% hit rate)",
+                            self.hits, self.misses, self.hit_rate * 100)
+                return result, True
+            self.misses += 1
+        result = execute()
+        if keep(result):
+            with self._lock:
+                self._entries[key] = result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result, False
+
+    def run(self, interpreter: WarmInterpreter, code: str, memoize: bool = True) -> Dict[str, Any]:
+        """
+        Runs code on interpreter, or returns the memoized result of the same run.
+        Runs that time out are not memoized.
+
+        Returns:
+            The interpreter's result, with 'cached' added.
+        """
+        interpreter.start()  # the key needs the interpreter's version
+        environment = [interpreter.version, interpreter.timeout, interpreter.cpu_seconds, interpreter.memory_mb,
+                       interpreter.max_output]
+        result, cached = self.call(code, environment, lambda: interpreter.run(code), memoize=memoize,
+                                   keep=lambda result: not result['timed_out'])
+        return dict(result, cached=True, seconds=0.0) if cached else dict(result, cached=False)
+
+
+# -- server -------------------------------------------------------------------
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    half = limit // 2
+    return f"{text[:half]}\n... {len(text) - limit} characters cut ...\n{text[-half:]}"
+
+
+def _execute(code: str) -> int:
+    """ Runs code as __main__ and returns its exit status, as the python command would """
+    namespace = {'__name__': '__main__', '__builtins__': __builtins__}
+    try:
+        exec(compile(code, '<assignment>', 'exec'), namespace)
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code & 0xff
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException as e:
+        # leave this function's frame out of the traceback
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        return 1
+
+
+def _limit(cpu_seconds: int, memory_mb: int) -> None:
+    if resource is None:
+        return
+    for limit, value in ((resource.RLIMIT_CPU, cpu_seconds), (resource.RLIMIT_AS, memory_mb * 1024 * 1024)):
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass
+
+
+def _isolate_network() -> bool:
+    """ Moves this process into new user and network namespaces, which have no interfaces up """
+    if not hasattr(os, 'unshare'):
+        return False
+    try:
+        os.unshare(os.CLONE_NEWUSER | os.CLONE_NEWNET)
+        return True
+    except OSError:  # user namespaces disabled, or not permitted here
+        return False
+
+
+def _result(stdout: str, stderr: str, exit_code: int, timed_out: bool, max_output: int) -> Dict[str, Any]:
+    stdout, stderr = _truncate(stdout, max_output), _truncate(stderr, max_output)
+    return {'ok': not timed_out and exit_code == 0, 'stdout': stdout, 'stderr': stderr,
+            'output': stdout + stderr, 'exit_code': exit_code, 'timed_out': timed_out}
+
+
+def _run_forked(request: Dict[str, Any]) -> Dict[str, Any]:
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr, \
+            tempfile.TemporaryDirectory() as workdir:
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:  # child: run the code with its output going to the capture files
+            status = 1
+            try:
+                os.setsid()
+                os.chdir(workdir)
+                os.dup2(stdout.fileno(), 1)
+                os.dup2(stderr.fileno(), 2)
+                devnull = os.open(os.devnull, os.O_RDONLY)
+                os.dup2(devnull, 0)
+                sys.stdout = os.fdopen(1, 'w', buffering=1, closefd=False)  # keep output printed before a kill
+                sys.stderr = os.fdopen(2, 'w', closefd=False)
+                _limit(request['cpu_seconds'], request['memory_mb'])
+                status = _execute(request['code'])
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(status)
+        deadline = time.monotonic() + request['timeout']
+        timed_out = False
+        while True:
+            finished, status = os.waitpid(pid, os.WNOHANG)
+            if finished:
+                break
+            if time.monotonic() > deadline:
+                os.killpg(pid, signal.SIGKILL)
+                _, status = os.waitpid(pid, 0)
+                timed_out = True
+                break
+            time.sleep(0.002)
+        stdout.seek(0)
+        stderr.seek(0)
+        out = stdout.read().decode(errors='replace')
+        err = stderr.read().decode(errors='replace')
+    note = ''
+    if timed_out:
+        note = f"Killed after {request['timeout']:.0f}s"
+    elif os.WIFSIGNALED(status):
+        note = f"Killed by signal {os.WTERMSIG(status)} (CPU or memory limit exceeded)"
+    if note:
+        err = f"{err}\n{note}" if err else note
+    exit_code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    return _result(out, err, exit_code, timed_out, request['max_output'])
+
+
+def _run_in_process(request: Dict[str, Any]) -> Dict[str, Any]:
+    import io
+    from contextlib import redirect_stderr, redirect_stdout
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        exit_code = _execute(request['code'])
+    return _result(stdout.getvalue(), stderr.getvalue(), exit_code, False, request['max_output'])
+
+
+def _serve(preload: Sequence[str]) -> None:
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    sys.stdout = open(os.devnull, 'w')
+    network_isolated = _isolate_network()
+    for name in preload:
+        __import__(name)
+    replies.write(json.dumps({'version': sys.version, 'network_isolated': network_isolated}) + '\n')  # ready
+    replies.flush()
+    run = _run_forked if hasattr(os, 'fork') else _run_in_process
+    for line in sys.stdin:
+        replies.write(json.dumps(run(json.loads(line))) + '\n')
+        replies.flush()
+
+
+if __name__ == '__main__' and '--serve' in sys.argv:
+    arguments = dict(zip(sys.argv[2::2], sys.argv[3::2]))
+    _serve([name for name in arguments.get('--preload', '').split(',') if name])
@@ -0,0 +1,84 @@
+from crewai.tools import BaseTool
+from crewai_tools import CodeInterpreterTool
+from typing import Callable, List, Optional, Type
+from pydantic import BaseModel, Field, PrivateAttr
+
+from coder.sandbox import ExecutionCache, WarmInterpreter
+
+
+class PythonCodeInput(BaseModel):
+    """Input schema for WarmInterpreterTool."""
+    code: str = Field(..., description="A complete Python 3 script. Print every result you want to see.")
+    cache: bool = Field(
+        True,
+        description="Reuse the result of an identical earlier run. Set to false for code whose output "
+                    "depends on randomness, the time or anything outside the script.",
+    )
+
+class WarmInterpreterTool(BaseTool):
+    name: str = "Python Interpreter"
+    description: str = (
+        "Runs a Python 3 script in a separate, resource-limited interpreter and returns everything it "
+        "printed, including any traceback. Only the standard library can be imported, and the script "
+        "starts in an empty working directory with no environment variables or API keys. Don't rely on "
+        "network access. Nothing is kept between runs."
+    )
+    args_schema: Type[BaseModel] = PythonCodeInput
+    # results are memoized by the ExecutionCache, which knows what is safe to reuse
+    cache_function: Callable = lambda _args=None, _result=None: False
+    memoize: bool = True
+    _interpreter: WarmInterpreter = PrivateAttr(default_factory=WarmInterpreter)
+    _cache: ExecutionCache = PrivateAttr(default_factory=ExecutionCache)
+
+    def __init__(self, cache: ExecutionCache = None, **kwargs):
+        """ Pass the same cache to several tools to share results between them """
+        super().__init__(**kwargs)
+        if cache is not None:
+            self._cache = cache
+
+    @property
+    def interpreter(self) -> WarmInterpreter:
+        return self._interpreter
+
+    @property
+    def execution_cache(self) -> ExecutionCache:
+        return self._cache
+
+    def _run(self, code: str, cache: bool = True) -> str:
+        result = self._cache.run(self._interpreter, code, memoize=self.memoize and cache)
+        status = "ran successfully" if result["ok"] else f"failed (exit code {result['exit_code']})"
+        timing = "reused from an identical earlier run" if result["cached"] else f"in {result['seconds']:.2f}s"
+        report = f"The code {status}, {timing}. Output:\n{result['stdout'] or '(no output)'}"
+        if result["stderr"]:
+            report += f"\nErrors:\n{result['stderr']}"
+        return report
+
+
+class MemoizedCodeInterpreterTool(CodeInterpreterTool):
+    """
+    crewAI's code interpreter, which runs code in its Docker sandbox in safe mode, with
+    an ExecutionCache in front, so a verbatim rerun of deterministic code doesn't start
+    another container.
+    """
+    cache_function: Callable = lambda _args=None, _result=None: False
+    memoize: bool = True
+    _cache: ExecutionCache = PrivateAttr(default_factory=ExecutionCache)
+
+    def __init__(self, cache: ExecutionCache = None, **kwargs):
+        """ Pass the same cache to several tools to share results between them """
+        super().__init__(**kwargs)
+        if cache is not None:
+            self._cache = cache
+
+    @property
+    def execution_cache(self) -> ExecutionCache:
+        return self._cache
+
+    def _run(self, code: str = "", libraries_used: Optional[List[str]] = None, **kwargs) -> str:
+        libraries = sorted(libraries_used or [])
+        environment = [self.default_image_tag, self.unsafe_mode, libraries]
+        result, _ = self._cache.call(code, environment,
+                                     lambda: super(MemoizedCodeInterpreterTool, self)._run(
+                                         code=code, libraries_used=libraries, **kwargs),
+                                     memoize=self.memoize)
+        return result
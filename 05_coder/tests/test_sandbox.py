@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import unittest
+from unittest.mock import patch
+
+from crewai_tools import CodeInterpreterTool
+
+from coder.sandbox import ExecutionCache, is_deterministic
+from coder.tools.interpreter_tool import MemoizedCodeInterpreterTool
+
+
+class TestIsDeterministic(unittest.TestCase):
+    def test_plain_code_is_deterministic(self):
+        """Test arithmetic, dicts and lists can be memoized"""
+        self.assertTrue(is_deterministic("import math\nprint({'a': math.sqrt(2)}, sorted([3, 1]))"))
+
+    def test_randomness_and_process_state_are_not(self):
+        """Test code reading the OS's randomness, the process or the hash seed isn't memoized"""
+        for code in ("import os\nprint(os.urandom(8))",
+                     "from os import urandom\nprint(urandom(8))",
+                     "import os as o\nprint(o.getpid())",
+                     "import uuid\nprint(uuid.uuid4())",
+                     "from secrets import token_hex\nprint(token_hex())",
+                     "print(__import__('uuid').uuid4())",
+                     "import importlib\nprint(importlib.import_module('random').random())",
+                     "print(hash('word'))",
+                     "print(id(object()))",
+                     "print({'b', 'a'})",
+                     "print(list(set('abc')))",
+                     "print({c for c in 'abc'})"):
+            self.assertFalse(is_deterministic(code), code)
+
+
+class TestMemoizedCodeInterpreterTool(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(CodeInterpreterTool, "run_code_safety", side_effect=lambda code, libraries: "42\n")
+        self.run_code = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tool = MemoizedCodeInterpreterTool(cache=ExecutionCache())
+
+    def test_rerun_is_answered_from_the_cache(self):
+        """Test the same code with the same libraries runs in the sandbox once"""
+        for libraries in (["numpy", "pandas"], ["pandas", "numpy"]):
+            self.assertEqual(self.tool.run(code="print(6 * 7)", libraries_used=libraries), "42\n")
+        self.assertEqual(self.run_code.call_count, 1)
+        self.assertEqual(self.tool.execution_cache.hits, 1)
+
+    def test_other_libraries_run_again(self):
+        """Test the libraries to install are part of the key"""
+        self.tool.run(code="print(6 * 7)", libraries_used=[])
+        self.tool.run(code="print(6 * 7)", libraries_used=["numpy"])
+        self.assertEqual(self.run_code.call_count, 2)
+
+    def test_nondeterministic_code_always_runs(self):
+        """Test code that isn't deterministic is run every time"""
+        for _ in range(2):
+            self.tool.run(code="import uuid\nprint(uuid.uuid4())", libraries_used=[])
+        self.assertEqual(self.run_code.call_count, 2)
+        self.assertEqual(self.tool.execution_cache.skipped, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
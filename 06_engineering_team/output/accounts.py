@@ -1,7 +1,19 @@
 #!/usr/bin/env python3
 
+import csv
+import heapq
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from collections.abc import Sequence
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional, Union
+from itertools import accumulate, compress, islice
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
 
 def get_share_price(symbol: str) -> float:
     """
@@ -21,6 +33,699 @@ def get_share_price(symbol: str) -> float:
     }
     return prices.get(symbol, 0.0)
 
+TRANSACTION_TYPES = ('DEPOSIT', 'WITHDRAWAL', 'BUY', 'SELL')
+TYPE_CODES = {name: code for code, name in enumerate(TRANSACTION_TYPES)}
+DEPOSIT_CODE, WITHDRAWAL_CODE, BUY_CODE, SELL_CODE = range(len(TRANSACTION_TYPES))
+NO_SYMBOL = -1
+
+def to_epoch_ns(timestamp: Union[datetime, int, float, None]) -> Optional[int]:
+    """
+    Converts a datetime or epoch seconds to epoch nanoseconds, passing None through.
+    """
+    if timestamp is None:
+        return None
+    if isinstance(timestamp, datetime):
+        return int(timestamp.timestamp() * 1_000_000) * 1000
+    return int(timestamp * 1_000_000_000)
+
+def share_count(quantity: Union[int, float]) -> Optional[int]:
+    """
+    Returns quantity as a whole number of shares, or None if it is fractional.
+    Shares are only traded whole, and the ledger stores counts as integers.
+    """
+    try:
+        count = int(quantity)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return count if count == quantity else None
+
+def _ledger_shares(quantity: Union[int, float]) -> int:
+    count = share_count(quantity)
+    if count is None:
+        raise ValueError(f"Share quantity must be a whole number, got {quantity!r}")
+    return count
+
+class PriceProvider:
+    """
+    Source of share prices. Subclasses implement get_price; get_prices looks up
+    several symbols in one call and should be overridden by feeds that can batch.
+    """
+    
+    def get_price(self, symbol: str) -> float:
+        """
+        Returns the current price for symbol, or 0.0 if it is unknown.
+        """
+        raise NotImplementedError
+    
+    def get_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        """
+        Returns the current price of each distinct symbol.
+        """
+        return {symbol: self.get_price(symbol) for symbol in dict.fromkeys(symbols)}
+
+class SharePriceProvider(PriceProvider):
+    """
+    Prices from get_share_price, looked up at call time so it can be patched.
+    """
+    
+    def get_price(self, symbol: str) -> float:
+        return get_share_price(symbol)
+
+class DictPriceProvider(PriceProvider):
+    """
+    Prices from a mapping of symbol to price, which can be updated in place.
+    """
+    
+    def __init__(self, prices: Optional[Dict[str, float]] = None):
+        self.prices = dict(prices or {})
+    
+    def get_price(self, symbol: str) -> float:
+        return self.prices.get(symbol, 0.0)
+    
+    def get_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        prices = self.prices
+        return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
+
+class CachedPriceProvider(PriceProvider):
+    """
+    Memoizes another provider's prices for ttl seconds, so every valuation within
+    a tick sees the same quote and the underlying feed is asked once per symbol.
+    """
+    
+    def __init__(self, provider: PriceProvider, ttl: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.provider = provider
+        self.ttl = ttl
+        self.clock = clock
+        self._cache: Dict[str, tuple] = {}  # symbol -> (price, expires_at)
+        self.hits = 0
+        self.misses = 0
+    
+    def get_price(self, symbol: str) -> float:
+        return self.get_prices([symbol])[symbol]
+    
+    def get_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        now = self.clock()
+        cache = self._cache
+        prices = {}
+        missing = []
+        for symbol in dict.fromkeys(symbols):
+            cached = cache.get(symbol)
+            if cached is not None and cached[1] > now:
+                prices[symbol] = cached[0]
+            else:
+                missing.append(symbol)
+        self.hits += len(prices)
+        if missing:
+            self.misses += len(missing)
+            fetched = self.provider.get_prices(missing)
+            expires_at = now + self.ttl
+            for symbol, price in fetched.items():
+                cache[symbol] = (price, expires_at)
+            prices.update(fetched)
+        return prices
+    
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        """
+        Drops the cached price for symbol, or every cached price.
+        """
+        if symbol is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(symbol, None)
+
+class ReplayPriceProvider(PriceProvider):
+    """
+    Replays recorded prices for simulations. Each symbol's quote is the last one
+    recorded at or before the provider's current time, which is moved with
+    advance(); before a symbol's first quote its price is 0.0.
+    """
+    
+    def __init__(self, quotes: Iterable[tuple] = ()):
+        """
+        Args:
+            quotes: (timestamp, symbol, price) rows, with timestamps as datetimes
+                or epoch seconds.
+        """
+        series: Dict[str, list] = {}
+        for timestamp, symbol, price in quotes:
+            series.setdefault(symbol, []).append((to_epoch_ns(timestamp), float(price)))
+        self._times: Dict[str, array] = {}
+        self._prices: Dict[str, array] = {}
+        for symbol, rows in series.items():
+            rows.sort()
+            self._times[symbol] = array('q', (t for t, _ in rows))
+            self._prices[symbol] = array('d', (p for _, p in rows))
+        self.now = None  # epoch ns; None replays up to the last quote
+    
+    @classmethod
+    def from_csv(cls, path: str) -> 'ReplayPriceProvider':
+        """
+        Loads quotes from a CSV file with timestamp, symbol and price columns;
+        timestamps are epoch seconds or ISO 8601 datetimes.
+        """
+        def parse(value: str):
+            try:
+                return float(value)
+            except ValueError:
+                return datetime.fromisoformat(value)
+        
+        with open(path, newline='') as f:
+            return cls((parse(row['timestamp']), row['symbol'], row['price']) for row in csv.DictReader(f))
+    
+    def advance(self, timestamp: Union[datetime, int, float]) -> None:
+        """
+        Moves the replay clock to timestamp.
+        """
+        self.now = to_epoch_ns(timestamp)
+    
+    def ticks(self) -> Iterable[float]:
+        """
+        Advances the replay clock through every distinct quote time in order,
+        yielding each time in epoch seconds.
+        """
+        for now in sorted({t for times in self._times.values() for t in times}):
+            self.now = now
+            yield now / 1e9
+    
+    def get_price(self, symbol: str) -> float:
+        return self._price_at(symbol, self.now)
+    
+    def prices_at(self, timestamp: Union[datetime, int, float], symbols: Iterable[str]) -> Dict[str, float]:
+        """
+        Returns each symbol's quote as of timestamp, without moving the replay clock.
+        """
+        now = to_epoch_ns(timestamp)
+        return {symbol: self._price_at(symbol, now) for symbol in symbols}
+    
+    def _price_at(self, symbol: str, now: Optional[int]) -> float:
+        times = self._times.get(symbol)
+        if times is None:
+            return 0.0
+        row = len(times) if now is None else bisect_right(times, now)
+        return self._prices[symbol][row - 1] if row else 0.0
+
+class TransactionLedger:
+    """
+    Append-only, columnar store of an account's transactions.
+
+    Every field is a typed array, symbols are interned to small integer ids and
+    timestamps are epoch nanoseconds, so a row costs about 45 bytes instead of a
+    dict with a datetime. Timestamps never decrease, which lets time-range queries
+    use binary search: a row given an earlier timestamp than the last row is
+    rejected, and a default timestamp is held at the last row's if the clock steps back.
+
+    The ledger also keeps running share positions and total deposits, and
+    snapshots them every `snapshot_interval` rows, so the state as of any row is
+    the nearest snapshot plus a replay of at most snapshot_interval rows.
+    """
+
+    def __init__(self, snapshot_interval: int = 1024):
+        self.types = array('b')
+        self.symbol_ids = array('i')
+        self.quantities = array('q')
+        self.prices = array('d')
+        self.amounts = array('d')
+        self.balances = array('d')
+        self.timestamps = array('q')
+        self.symbols: List[str] = []
+        self._symbol_ids: Dict[str, int] = {}
+        self._rows_by_symbol: List[array] = []
+        self.snapshot_interval = snapshot_interval
+        self._positions: Dict[int, int] = {}
+        self._deposited = 0.0
+        self._snapshots: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def symbol_id(self, symbol: str) -> int:
+        """
+        Returns the interned id for a symbol, assigning a new one if needed.
+        """
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self._symbol_ids[symbol] = symbol_id
+            self.symbols.append(symbol)
+            self._rows_by_symbol.append(array('q'))
+        return symbol_id
+
+    def append(self, type_: str, amount: float, balance_after: float, symbol: Optional[str] = None,
+               quantity: int = 0, price: float = 0.0, timestamp_ns: Optional[int] = None) -> int:
+        """
+        Appends a transaction in O(1) and returns its row number.
+
+        Args:
+            type_: One of DEPOSIT, WITHDRAWAL, BUY or SELL.
+            amount: The cash amount moved (the total for a trade).
+            balance_after: The cash balance after the transaction.
+            symbol: The stock symbol for trades.
+            quantity: The number of shares for trades.
+            price: The share price for trades.
+            timestamp_ns: Epoch nanoseconds; defaults to now. Must not be before
+                the last row's.
+        """
+        quantity = _ledger_shares(quantity)
+        row = len(self.types)
+        now = self._next_timestamp(timestamp_ns)
+        symbol_id = NO_SYMBOL if symbol is None else self.symbol_id(symbol)
+        code = TYPE_CODES[type_]
+        if row % self.snapshot_interval == 0:
+            self._snapshots.append((dict(self._positions), self._deposited))
+        if code == DEPOSIT_CODE:
+            self._deposited += amount
+        elif code in (BUY_CODE, SELL_CODE):
+            change = quantity if code == BUY_CODE else -quantity
+            self._positions[symbol_id] = self._positions.get(symbol_id, 0) + change
+        self.types.append(code)
+        self.symbol_ids.append(symbol_id)
+        self.quantities.append(quantity)
+        self.prices.append(price)
+        self.amounts.append(amount)
+        self.balances.append(balance_after)
+        self.timestamps.append(now)
+        if symbol_id != NO_SYMBOL:
+            self._rows_by_symbol[symbol_id].append(row)
+        return row
+
+    def state_at(self, rows: int) -> tuple:
+        """
+        Returns (positions by symbol, total deposited) after the first `rows` rows,
+        from the nearest earlier snapshot plus a replay of the rows since.
+        """
+        if rows >= len(self.types):
+            return {self.symbols[sid]: qty for sid, qty in self._positions.items() if qty}, self._deposited
+        base = rows // self.snapshot_interval
+        snapshot_positions, deposited = self._snapshots[base]
+        positions = dict(snapshot_positions)
+        for row in range(base * self.snapshot_interval, rows):
+            code = self.types[row]
+            if code == DEPOSIT_CODE:
+                deposited += self.amounts[row]
+            elif code in (BUY_CODE, SELL_CODE):
+                change = self.quantities[row] if code == BUY_CODE else -self.quantities[row]
+                positions[self.symbol_ids[row]] = positions.get(self.symbol_ids[row], 0) + change
+        return {self.symbols[sid]: qty for sid, qty in positions.items() if qty}, deposited
+
+    def rows_until(self, timestamp: Union[datetime, int, float]) -> int:
+        """
+        Returns how many rows have a timestamp at or before the given time.
+        """
+        return bisect_right(self.timestamps, to_epoch_ns(timestamp))
+
+    def extend(self, types: List[str], amounts: List[float], balances: List[float], symbols: List[Optional[str]],
+               quantities: List[int], prices: List[float], timestamp_ns: Optional[int] = None) -> None:
+        """
+        Appends many rows that share one timestamp, extending each column in bulk.
+        
+        The result is the same as calling append for each row in order.
+        """
+        if not types:
+            return
+        now = self._next_timestamp(timestamp_ns)
+        ids = {symbol: self.symbol_id(symbol) for symbol in set(symbols) if symbol is not None}
+        codes = [TYPE_CODES[type_] for type_ in types]
+        symbol_ids = [NO_SYMBOL if symbol is None else ids[symbol] for symbol in symbols]
+        quantities = [_ledger_shares(quantity) for quantity in quantities]
+        self._index_rows(codes, symbol_ids, quantities, amounts)
+        self.types.extend(codes)
+        self.symbol_ids.extend(symbol_ids)
+        self.quantities.extend(quantities)
+        self.prices.extend(prices)
+        self.amounts.extend(amounts)
+        self.balances.extend(balances)
+        self.timestamps.extend([now] * len(codes))
+
+    def _next_timestamp(self, timestamp_ns: Optional[int]) -> int:
+        """
+        Returns the timestamp for the next row, raising ValueError if timestamp_ns
+        is before the last row's.
+        """
+        last = self.timestamps[-1] if self.timestamps else None
+        if timestamp_ns is None:
+            now = time.time_ns()
+            return now if last is None or now >= last else last
+        if last is not None and timestamp_ns < last:
+            raise ValueError(f"Timestamp {timestamp_ns} is before the last transaction's ({last}); "
+                             f"the ledger is append-only in time order")
+        return timestamp_ns
+
+    def _index_rows(self, codes: Sequence, symbol_ids: Sequence, quantities: Sequence, amounts: Sequence) -> None:
+        """
+        Updates positions, deposits, snapshots and the symbol index for rows about
+        to be added to the end of the columns.
+        """
+        positions = self._positions
+        rows_by_symbol = self._rows_by_symbol
+        interval = self.snapshot_interval
+        row = len(self.types)
+        for code, symbol_id, quantity, amount in zip(codes, symbol_ids, quantities, amounts):
+            if row % interval == 0:
+                self._snapshots.append((dict(positions), self._deposited))
+            if code == DEPOSIT_CODE:
+                self._deposited += amount
+            elif code == BUY_CODE:
+                positions[symbol_id] = positions.get(symbol_id, 0) + quantity
+            elif code == SELL_CODE:
+                positions[symbol_id] = positions.get(symbol_id, 0) - quantity
+            if symbol_id != NO_SYMBOL:
+                rows_by_symbol[symbol_id].append(row)
+            row += 1
+
+    COLUMNS = ('types', 'symbol_ids', 'quantities', 'prices', 'amounts', 'balances', 'timestamps')
+
+    def columns(self) -> List[array]:
+        """
+        Returns the column arrays in COLUMNS order.
+        """
+        return [getattr(self, name) for name in self.COLUMNS]
+
+    @classmethod
+    def from_columns(cls, columns: Sequence[array], symbols: Sequence[str],
+                     snapshot_interval: int = 1024) -> 'TransactionLedger':
+        """
+        Builds a ledger from column arrays in COLUMNS order, as returned by columns(),
+        and the symbols their symbol ids refer to.
+        """
+        ledger = cls(snapshot_interval)
+        for symbol in symbols:
+            ledger.symbol_id(symbol)
+        types, symbol_ids, quantities, _, amounts, _, _ = columns
+        ledger._index_rows(types, symbol_ids, quantities, amounts)
+        for name, column in zip(cls.COLUMNS, columns):
+            setattr(ledger, name, column)
+        return ledger
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'TransactionLedger':
+        """
+        Builds a ledger from transaction dictionaries in the get_transaction_history format.
+        """
+        ledger = cls()
+        for record in records:
+            ledger.append(
+                record.get('type', 'DEPOSIT'),
+                record.get('total', record.get('amount', 0.0)),
+                record.get('balance_after', 0.0),
+                symbol=record.get('symbol'),
+                quantity=record.get('quantity', 0),
+                price=record.get('price', 0.0),
+                timestamp_ns=to_epoch_ns(record.get('timestamp'))
+            )
+        return ledger
+
+    def record(self, row: int) -> Dict:
+        """
+        Materializes one row as a transaction dictionary.
+        """
+        type_ = TRANSACTION_TYPES[self.types[row]]
+        timestamp = datetime.fromtimestamp(self.timestamps[row] / 1_000_000_000)
+        if type_ in ('BUY', 'SELL'):
+            return {
+                'type': type_,
+                'symbol': self.symbols[self.symbol_ids[row]],
+                'quantity': self.quantities[row],
+                'price': self.prices[row],
+                'total': self.amounts[row],
+                'timestamp': timestamp,
+                'balance_after': self.balances[row]
+            }
+        return {
+            'type': type_,
+            'amount': self.amounts[row],
+            'timestamp': timestamp,
+            'balance_after': self.balances[row]
+        }
+
+    def time_range(self, start: Union[datetime, int, float, None] = None,
+                   end: Union[datetime, int, float, None] = None) -> range:
+        """
+        Returns the rows with start <= timestamp <= end in O(log n).
+        """
+        start_ns, end_ns = to_epoch_ns(start), to_epoch_ns(end)
+        lo = 0 if start_ns is None else bisect_left(self.timestamps, start_ns)
+        hi = len(self.timestamps) if end_ns is None else bisect_right(self.timestamps, end_ns)
+        return range(lo, max(lo, hi))
+
+    def select(self, type_: Optional[str] = None, symbol: Optional[str] = None,
+               start: Union[datetime, int, float, None] = None,
+               end: Union[datetime, int, float, None] = None) -> array:
+        """
+        Returns the row numbers matching every given filter, in order.
+
+        The time range is found by binary search, a symbol filter reads that symbol's
+        row index, and the type filter runs as a C-level compress over the type column.
+        """
+        rows = self.time_range(start, end)
+        if symbol is not None:
+            symbol_id = self._symbol_ids.get(symbol)
+            if symbol_id is None:
+                return array('q')
+            symbol_rows = self._rows_by_symbol[symbol_id]
+            candidates = symbol_rows[bisect_left(symbol_rows, rows.start):bisect_left(symbol_rows, rows.stop)]
+            if type_ is None:
+                return candidates
+            code = TYPE_CODES[type_]
+            return array('q', [row for row in candidates if self.types[row] == code])
+        if type_ is None:
+            return array('q', rows)
+        code = TYPE_CODES[type_]
+        return array('q', compress(rows, map(code.__eq__, self.types[rows.start:rows.stop])))
+
+    def iter_rows(self, type_: Optional[str] = None, symbol: Optional[str] = None,
+                  start: Union[datetime, int, float, None] = None,
+                  end: Union[datetime, int, float, None] = None,
+                  cursor: Optional[int] = None, reverse: bool = False) -> Iterator[int]:
+        """
+        Lazily yields the row numbers matching every given filter.
+
+        Rows are yielded in order, or newest first with reverse. A cursor resumes a
+        previous scan: forwards it is the first row to consider, in reverse the row
+        to stop before. Finding where to start is O(log n), so reading a page costs
+        the same however long the history is.
+        """
+        rows = self.time_range(start, end)
+        lo, hi = rows.start, rows.stop
+        if cursor is not None:
+            if reverse:
+                hi = min(hi, cursor)
+            else:
+                lo = max(lo, cursor)
+        if lo >= hi:
+            return
+        code = None if type_ is None else TYPE_CODES[type_]
+        types = self.types
+        if symbol is not None:
+            symbol_id = self._symbol_ids.get(symbol)
+            if symbol_id is None:
+                return
+            symbol_rows = self._rows_by_symbol[symbol_id]
+            first, last = bisect_left(symbol_rows, lo), bisect_left(symbol_rows, hi)
+            positions = range(last - 1, first - 1, -1) if reverse else range(first, last)
+            candidates = (symbol_rows[position] for position in positions)
+        else:
+            candidates = range(hi - 1, lo - 1, -1) if reverse else range(lo, hi)
+        for row in candidates:
+            if code is None or types[row] == code:
+                yield row
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory used by the columns and indexes.
+        """
+        columns = (self.types, self.symbol_ids, self.quantities, self.prices, self.amounts,
+                   self.balances, self.timestamps, *self._rows_by_symbol)
+        return sum(column.itemsize * len(column) for column in columns)
+
+COST_METHODS = ('average', 'fifo', 'lifo', 'hifo')
+
+class LotBook:
+    """
+    Cost-basis lots per symbol, matched against sells by a cost method:
+    
+    - average: every share costs the position's average cost
+    - fifo / lifo: the oldest / newest lots are sold first, from a deque
+    - hifo: the highest-cost lots are sold first; lots are kept in a deque per
+      price and the prices in a max-heap
+    
+    A sell costs O(1) amortized per lot it consumes, plus O(log p) per price level
+    it empties for hifo, so sells that close thousands of small lots stay fast.
+    """
+    
+    def __init__(self, method: str = 'average'):
+        if method not in COST_METHODS:
+            raise ValueError(f"Unknown cost method {method}; expected one of {', '.join(COST_METHODS)}")
+        self.method = method
+        self.costs: Dict[str, float] = {}  # symbol -> cost basis of the shares held
+        self.quantities: Dict[str, int] = {}  # symbol -> shares held
+        self.realized: Dict[str, float] = {}  # symbol -> realized profit/loss
+        self._lots: Dict[str, deque] = {}  # fifo/lifo: symbol -> [quantity, price] lots
+        self._levels: Dict[str, tuple] = {}  # hifo: symbol -> (heap of -price, price -> [quantity, sequence] lots)
+        self._sequence = 0  # buy order of hifo lots
+    
+    def buy(self, symbol: str, quantity: int, price: float) -> None:
+        """
+        Adds a lot of quantity shares bought at price.
+        """
+        self.costs[symbol] = self.costs.get(symbol, 0.0) + price * quantity
+        self.quantities[symbol] = self.quantities.get(symbol, 0) + quantity
+        if self.method == 'average':
+            return
+        if self.method == 'hifo':
+            heap, levels = self._levels.setdefault(symbol, ([], {}))
+            lots = levels.get(price)
+            if lots is None:
+                lots = levels[price] = deque()
+                heapq.heappush(heap, -price)
+            self._sequence += 1
+            lots.append([quantity, self._sequence])
+            return
+        lots = self._lots.get(symbol)
+        if lots is None:
+            lots = self._lots[symbol] = deque()
+        lots.append([quantity, price])
+    
+    def sell(self, symbol: str, quantity: int, price: float) -> float:
+        """
+        Removes quantity shares sold at price, realizing profit or loss against
+        the matched lots; quantity must not exceed the shares held.
+        
+        Returns:
+            The cost basis of the shares sold.
+        """
+        held = self.quantities[symbol]
+        cost = self.costs[symbol]
+        if quantity >= held:
+            sold_cost = cost
+        elif self.method == 'average':
+            sold_cost = cost * quantity / held
+        elif self.method == 'hifo':
+            sold_cost = self._match_highest(*self._levels[symbol], quantity)
+        else:
+            sold_cost = self._match(self._lots[symbol], quantity)
+        after = held - quantity
+        if after:
+            self.quantities[symbol] = after
+            self.costs[symbol] = cost - sold_cost
+        else:
+            del self.quantities[symbol]
+            del self.costs[symbol]
+            self._lots.pop(symbol, None)
+            self._levels.pop(symbol, None)
+        self.realized[symbol] = self.realized.get(symbol, 0.0) + price * quantity - sold_cost
+        return sold_cost
+    
+    def _match_highest(self, heap: List[float], levels: Dict[float, deque], quantity: int) -> float:
+        sold_cost = 0.0
+        while quantity:
+            price = -heap[0]
+            lots = levels[price]
+            while quantity and lots:
+                lot = lots[0]
+                if lot[0] <= quantity:
+                    lots.popleft()
+                    quantity -= lot[0]
+                    sold_cost += lot[0] * price
+                else:
+                    lot[0] -= quantity
+                    sold_cost += quantity * price
+                    quantity = 0
+            if not lots:
+                heapq.heappop(heap)
+                del levels[price]
+        return sold_cost
+    
+    def _match(self, lots: deque, quantity: int) -> float:
+        sold_cost = 0.0
+        index, pop = (0, lots.popleft) if self.method == 'fifo' else (-1, lots.pop)
+        while quantity:
+            lot = lots[index]
+            if lot[0] <= quantity:
+                pop()
+                quantity -= lot[0]
+                sold_cost += lot[0] * lot[1]
+            else:
+                lot[0] -= quantity
+                sold_cost += quantity * lot[1]
+                quantity = 0
+        return sold_cost
+    
+    def lots(self, symbol: str) -> List[tuple]:
+        """
+        Returns the open (quantity, price) lots for symbol in buy order; with
+        average cost, a single lot at the average price.
+        """
+        if symbol not in self.quantities:
+            return []
+        if self.method == 'average':
+            return [(self.quantities[symbol], self.costs[symbol] / self.quantities[symbol])]
+        if self.method == 'hifo':
+            _, levels = self._levels[symbol]
+            by_buy_order = sorted((sequence, quantity, price) for price, lots in levels.items()
+                                  for quantity, sequence in lots)
+            return [(quantity, price) for _, quantity, price in by_buy_order]
+        return [(quantity, price) for quantity, price in self._lots[symbol]]
+    
+    def get_state(self) -> Dict:
+        """
+        Returns the book as plain values, for snapshots.
+        """
+        return {
+            'method': self.method,
+            'costs': self.costs,
+            'realized': self.realized,
+            'lots': {symbol: self.lots(symbol) for symbol in self.quantities} if self.method != 'average' else {},
+            'quantities': self.quantities
+        }
+    
+    @classmethod
+    def from_state(cls, state: Dict) -> 'LotBook':
+        """
+        Rebuilds a book from get_state.
+        """
+        book = cls(state['method'])
+        for symbol, lots in state['lots'].items():
+            for quantity, price in lots:
+                book.buy(symbol, quantity, price)
+        book.costs = dict(state['costs'])
+        book.quantities = dict(state['quantities'])
+        book.realized = dict(state['realized'])
+        return book
+
+class TransactionView(Sequence):
+    """
+    Read-only, lazy list of transaction dictionaries backed by a TransactionLedger.
+
+    Rows are only turned into dictionaries when they are accessed.
+    """
+
+    def __init__(self, ledger: TransactionLedger, rows: Optional[Sequence] = None):
+        self._ledger = ledger
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._ledger) if self._rows is None else len(self._rows)
+
+    def __getitem__(self, index):
+        rows = range(len(self._ledger)) if self._rows is None else self._rows
+        if isinstance(index, slice):
+            return [self._ledger.record(row) for row in rows[index]]
+        return self._ledger.record(rows[index])
+
+    def __iter__(self):
+        rows = range(len(self._ledger)) if self._rows is None else self._rows
+        for row in rows:
+            yield self._ledger.record(row)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, tuple, TransactionView)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"TransactionView({len(self)} transactions)"
+
 class Account:
     """
     Represents a user's account in the trading simulation platform.
@@ -28,36 +733,124 @@ class Account:
     portfolio and profit/loss.
     """
     
-    def __init__(self, user_id: str):
+    def __init__(self, user_id: str, price_provider: Optional[PriceProvider] = None,
+                 live_prices: bool = True, cost_method: str = 'average'):
         """
         Initialize an account for a user with a unique identifier.
         
         Args:
             user_id: A unique string identifier for the user.
+            price_provider: Where share prices come from; defaults to get_share_price.
+            live_prices: Whether valuations look up current prices. When False, holdings
+                are valued at the last trade or update_price tick, in constant time.
+            cost_method: How sells are matched to cost-basis lots: average, fifo,
+                lifo or hifo (see LotBook).
         """
+        if cost_method not in COST_METHODS:
+            raise ValueError(f"Unknown cost method {cost_method}; expected one of {', '.join(COST_METHODS)}")
         self.user_id = user_id
+        self.price_provider = price_provider if price_provider is not None else SharePriceProvider()
+        self.live_prices = live_prices
+        self.cost_method = cost_method
         self.balance = 0.0
         self.initial_deposit = 0.0
-        self.portfolio = {}  # symbol -> quantity
-        self.transactions = []
+        self._portfolio = {}  # symbol -> quantity
+        self.ledger = TransactionLedger()
         self.created_at = datetime.now()
+        self._reset_valuation()
+        self.journal = None  # set by Journal.attach
+        self.journal_seq = 0  # sequence number of the last journaled event
     
+    def _reset_valuation(self) -> None:
+        """
+        Clears the running valuation aggregates.
+        """
+        self.market_value = 0.0  # holdings at their marks
+        self.cost_basis = 0.0  # cost of the shares held, by the cost method
+        self.realized_pl = 0.0
+        self._marks = {}  # symbol -> last known price, for held symbols
+        self.lots = LotBook(self.cost_method)
+    
+    @property
+    def unrealized_pl(self) -> float:
+        """
+        Gain or loss on the shares held, at their last known prices.
+        """
+        return self.market_value - self.cost_basis
+
+    @property
+    def transactions(self) -> TransactionView:
+        """
+        The transaction history as a lazy, list-like view over the ledger.
+        """
+        return TransactionView(self.ledger)
+
+    @transactions.setter
+    def transactions(self, records: Iterable[Dict]) -> None:
+        self._check_unjournaled('transactions')
+        self.ledger = TransactionLedger.from_records(records)
+
+    @property
+    def portfolio(self) -> MappingProxyType:
+        """
+        The shares held, as a read-only mapping of symbol to quantity. Trades
+        keep it and the valuation aggregates in step.
+        """
+        return MappingProxyType(self._portfolio)
+
+    @portfolio.setter
+    def portfolio(self, holdings: Dict[str, int]) -> None:
+        """
+        Replaces the holdings outright, as if they were transferred in at their
+        current prices, and rebuilds the valuation aggregates from them. Not
+        allowed on a journaled account: the journal records ledger rows, and an
+        assignment has none, so recovery would lose it.
+        """
+        self._check_unjournaled('portfolio')
+        portfolio = {symbol: _ledger_shares(quantity) for symbol, quantity in holdings.items() if quantity}
+        self._reset_valuation()
+        prices = self.price_provider.get_prices(portfolio) if portfolio else {}
+        for symbol, quantity in portfolio.items():
+            self._value_trade('BUY', symbol, quantity, prices[symbol], 0)
+        self._portfolio = portfolio
+
+    def _check_unjournaled(self, attribute: str) -> None:
+        """
+        Raises ValueError if the account is journaled, for changes the journal can't record.
+        """
+        if self.journal is not None:
+            raise ValueError(f"Can't assign {attribute} of journaled account {self.user_id}; "
+                             f"trade or call create_account instead")
+
     def create_account(self) -> None:
         """
         Prepares the account for use, initializing balance and portfolio.
         """
         self.balance = 0.0
         self.initial_deposit = 0.0
-        self.portfolio = {}
-        self.transactions = []
+        self._portfolio = {}
+        self.ledger = TransactionLedger()
         self.created_at = datetime.now()
+        self._reset_valuation()
+        if self.journal is not None:
+            self.journal.log_reset(self)
     
-    def deposit_funds(self, amount: float) -> bool:
+    def _journal(self, start: int) -> None:
+        """
+        Sends the ledger rows from start onwards to the journal, if there is one.
+        """
+        if self.journal is not None:
+            self.journal.log(self, start)
+    
+    def deposit_funds(self, amount: float, timestamp: Union[datetime, int, float, None] = None) -> bool:
         """
         Deposits an amount into the account balance.
         
         Args:
             amount: The amount of money to deposit. Must be positive.
+            timestamp: When the deposit happened, as a datetime or epoch seconds;
+                defaults to now. Used when replaying historical data; raises
+                ValueError if it is before the last transaction.
             
         Returns:
             True if the deposit was successful, False otherwise.
@@ -65,16 +858,12 @@ class Account:
         if amount <= 0:
             return False
         
+        # the ledger goes first, so a rejected timestamp leaves the balance alone
+        row = self.ledger.append('DEPOSIT', amount, self.balance + amount, timestamp_ns=to_epoch_ns(timestamp))
         self.balance += amount
         self.initial_deposit += amount
         
-        transaction = {
-            'type': 'DEPOSIT',
-            'amount': amount,
-            'timestamp': datetime.now(),
-            'balance_after': self.balance
-        }
-        self.transactions.append(transaction)
+        self._journal(row)
         
         return True
     
@@ -93,13 +882,7 @@ class Account:
         
         self.balance -= amount
         
-        transaction = {
-            'type': 'WITHDRAWAL',
-            'amount': amount,
-            'timestamp': datetime.now(),
-            'balance_after': self.balance
-        }
-        self.transactions.append(transaction)
+        self._journal(self.ledger.append('WITHDRAWAL', amount, self.balance))
         
         return True
     
@@ -109,15 +892,16 @@ class Account:
         
         Args:
             symbol: The stock symbol to buy.
-            quantity: The number of shares to buy.
+            quantity: The number of shares to buy; only whole shares are traded.
             
         Returns:
             True if the purchase was successful, False otherwise.
         """
-        if quantity <= 0:
+        quantity = share_count(quantity)
+        if quantity is None or quantity <= 0:
             return False
         
-        price = get_share_price(symbol)
+        price = self.price_provider.get_price(symbol)
         if price == 0.0:  # Symbol not found
             return False
         
@@ -126,24 +910,7 @@ class Account:
         if total_cost > self.balance:
             return False
         
-        self.balance -= total_cost
-        
-        # Update portfolio
-        if symbol in self.portfolio:
-            self.portfolio[symbol] += quantity
-        else:
-            self.portfolio[symbol] = quantity
-        
-        transaction = {
-            'type': 'BUY',
-            'symbol': symbol,
-            'quantity': quantity,
-            'price': price,
-            'total': total_cost,
-            'timestamp': datetime.now(),
-            'balance_after': self.balance
-        }
-        self.transactions.append(transaction)
+        self._record_trade('BUY', symbol, quantity, price)
         
         return True
     
@@ -153,82 +920,339 @@ class Account:
         
         Args:
             symbol: The stock symbol to sell.
-            quantity: The number of shares to sell.
+            quantity: The number of shares to sell; only whole shares are traded.
             
         Returns:
             True if the sale was successful, False otherwise.
         """
-        if quantity <= 0:
+        quantity = share_count(quantity)
+        if quantity is None or quantity <= 0:
             return False
         
-        if symbol not in self.portfolio or self.portfolio[symbol] < quantity:
+        if symbol not in self._portfolio or self._portfolio[symbol] < quantity:
             return False
         
-        price = get_share_price(symbol)
+        price = self.price_provider.get_price(symbol)
         if price == 0.0:  # Symbol not found
             return False
         
-        total_value = price * quantity
+        self._record_trade('SELL', symbol, quantity, price)
         
-        self.balance += total_value
-        self.portfolio[symbol] -= quantity
+        return True
+    
+    def _record_trade(self, side: str, symbol: str, quantity: int, price: float) -> None:
+        """
+        Applies an already validated trade to the balance, portfolio and ledger.
+        """
+        total = price * quantity
+        self._value_trade(side, symbol, quantity, price, self._portfolio.get(symbol, 0))
+        if side == 'BUY':
+            self.balance -= total
+            self._portfolio[symbol] = self._portfolio.get(symbol, 0) + quantity
+        else:
+            self.balance += total
+            self._portfolio[symbol] -= quantity
+            # Remove the symbol from the portfolio if quantity becomes 0
+            if self._portfolio[symbol] == 0:
+                del self._portfolio[symbol]
+        self._journal(self.ledger.append(side, total, self.balance, symbol=symbol, quantity=quantity, price=price))
+    
+    def _value_trade(self, side: str, symbol: str, quantity: int, price: float, held: int) -> None:
+        """
+        Updates the valuation aggregates for a trade of quantity shares at price,
+        given the shares held before it. The trade price becomes the symbol's mark.
+        """
+        total = price * quantity
+        if side == 'BUY':
+            after = held + quantity
+            self.lots.buy(symbol, quantity, price)
+            self.cost_basis += total
+        else:
+            after = held - quantity
+            sold_cost = self.lots.sell(symbol, quantity, price)
+            self.realized_pl += total - sold_cost
+            self.cost_basis -= sold_cost
+        self.market_value += after * price - held * self._marks.get(symbol, price)
+        if after:
+            self._marks[symbol] = price
+        else:
+            self._marks.pop(symbol, None)
+            if not self._marks:
+                # drop accumulated rounding once nothing is held
+                self.market_value = self.cost_basis = 0.0
+    
+    def apply_event(self, type_: str, amount: float, balance_after: float, symbol: Optional[str] = None,
+                    quantity: int = 0, price: float = 0.0, timestamp_ns: Optional[int] = None) -> None:
+        """
+        Re-applies a recorded transaction without validating or pricing it, as
+        when replaying a journal. The balance is set to the recorded balance_after.
+        """
+        if type_ == 'DEPOSIT':
+            self.initial_deposit += amount
+        elif type_ in ('BUY', 'SELL'):
+            held = self._portfolio.get(symbol, 0)
+            self._value_trade(type_, symbol, quantity, price, held)
+            after = held + quantity if type_ == 'BUY' else held - quantity
+            if after:
+                self._portfolio[symbol] = after
+            else:
+                self._portfolio.pop(symbol, None)
+        self.balance = balance_after
+        self.ledger.append(type_, amount, balance_after, symbol=symbol, quantity=quantity, price=price,
+                           timestamp_ns=timestamp_ns)
+    
+    def get_state(self) -> Dict:
+        """
+        Returns the account's scalar state (everything but the ledger) as plain
+        values, for snapshots.
+        """
+        return {
+            'user_id': self.user_id,
+            'balance': self.balance,
+            'initial_deposit': self.initial_deposit,
+            'created_at': self.created_at.isoformat(),
+            'market_value': self.market_value,
+            'cost_basis': self.cost_basis,
+            'realized_pl': self.realized_pl,
+            'marks': self._marks,
+            'lots': self.lots.get_state(),
+            'portfolio': self._portfolio,
+            'journal_seq': self.journal_seq
+        }
+    
+    def set_state(self, state: Dict, ledger: TransactionLedger) -> None:
+        """
+        Restores the state returned by get_state together with its ledger.
+        Snapshots without a portfolio have it rebuilt from the ledger's positions.
+        """
+        self.balance = state['balance']
+        self.initial_deposit = state['initial_deposit']
+        self.created_at = datetime.fromisoformat(state['created_at'])
+        self.market_value = state['market_value']
+        self.cost_basis = state['cost_basis']
+        self.realized_pl = state['realized_pl']
+        self._marks = dict(state['marks'])
+        self.lots = LotBook.from_state(state['lots'])
+        self.cost_method = self.lots.method
+        self.journal_seq = state['journal_seq']
+        self.ledger = ledger
+        if 'portfolio' in state:
+            self._portfolio = dict(state['portfolio'])
+        else:
+            positions, _ = ledger.state_at(len(ledger))
+            self._portfolio = {symbol: quantity for symbol, quantity in positions.items() if quantity}
+    
+    def update_price(self, symbol: str, price: float) -> None:
+        """
+        Applies a price tick for symbol to the valuation in constant time.
+        Ticks for symbols that are not held are ignored.
+        """
+        mark = self._marks.get(symbol)
+        if mark is not None:
+            self.market_value += self._portfolio[symbol] * (price - mark)
+            self._marks[symbol] = price
+    
+    def update_prices(self, prices: Dict[str, float]) -> None:
+        """
+        Applies a price tick for each symbol in prices.
+        """
+        for symbol, price in prices.items():
+            self.update_price(symbol, price)
+    
+    def execute_batch(self, orders: Iterable, atomic: bool = True,
+                      timestamp: Union[datetime, int, float, None] = None) -> Dict:
+        """
+        Executes a batch of buy and sell orders in order, pricing each symbol once.
         
-        # Remove the symbol from the portfolio if quantity becomes 0
-        if self.portfolio[symbol] == 0:
-            del self.portfolio[symbol]
+        Each order is checked against the balance and holdings left by the orders
+        before it. With atomic=True nothing is committed if any order is rejected;
+        otherwise the valid orders are executed and the rest are skipped.
         
-        transaction = {
-            'type': 'SELL',
-            'symbol': symbol,
-            'quantity': quantity,
-            'price': price,
-            'total': total_value,
-            'timestamp': datetime.now(),
-            'balance_after': self.balance
-        }
-        self.transactions.append(transaction)
+        Args:
+            orders: (side, symbol, quantity) tuples, or dictionaries with 'side'
+                (or 'type'), 'symbol' and 'quantity'; side is BUY or SELL.
+            atomic: Whether the batch commits all-or-nothing.
+            timestamp: When the orders executed, as a datetime or epoch seconds;
+                defaults to now. Used when replaying historical data; raises
+                ValueError if it is before the last transaction.
+            
+        Returns:
+            Dictionary with 'committed' (whether anything was executed), 'executed'
+            (indices of executed orders) and 'rejected' ((index, reason) pairs).
+        """
+        orders = [(o.get('side', o.get('type')), o['symbol'], o['quantity']) if isinstance(o, dict) else tuple(o)
+                  for o in orders]
+        sides = [str(side).upper() for side, _, _ in orders]
+        symbols = [symbol for _, symbol, _ in orders]
+        quantities = [share_count(quantity) for _, _, quantity in orders]
+        prices = self.price_provider.get_prices(symbols)
+        totals = [prices[symbol] * (quantity or 0) for symbol, quantity in zip(symbols, quantities)]
         
-        return True
+        plan = self._plan_batch_bulk(sides, symbols, quantities, prices, totals)
+        if plan is None:
+            plan = self._plan_batch(sides, symbols, quantities, prices, totals)
+        accepted, rejected, balances, helds, positions = plan
+        
+        if atomic and rejected:
+            return {'committed': False, 'executed': [], 'rejected': rejected}
+        
+        if len(accepted) < len(orders):
+            sides, symbols, quantities, totals = ([column[i] for i in accepted]
+                                                  for column in (sides, symbols, quantities, totals))
+        start = len(self.ledger)
+        self.ledger.extend(sides, totals, balances, symbols, quantities, [prices[symbol] for symbol in symbols],
+                           timestamp_ns=to_epoch_ns(timestamp))
+        if balances:
+            self.balance = balances[-1]
+        # lots are matched in trade order, so the valuation is applied order by order
+        for side, symbol, quantity, held in zip(sides, symbols, quantities, helds):
+            self._value_trade(side, symbol, quantity, prices[symbol], held)
+        for symbol, quantity in positions.items():
+            if quantity:
+                self._portfolio[symbol] = quantity
+            else:
+                self._portfolio.pop(symbol, None)
+        self._journal(start)
+        
+        return {'committed': bool(accepted), 'executed': accepted, 'rejected': rejected}
     
-    def calculate_portfolio_value(self) -> float:
+    def _plan_batch_bulk(self, sides: List[str], symbols: List[str], quantities: List[Optional[int]],
+                         prices: Dict[str, float], totals: List[float]) -> Optional[tuple]:
+        """
+        Plans a batch column by column, on the assumption that every order is
+        accepted: the balances are a running sum of the cash each order moves and
+        the positions a running sum of its shares. Returns None if any order would
+        be rejected, for _plan_batch to work out which; with nothing rejected the
+        two plans are the same.
+        """
+        if not all(side == 'BUY' or side == 'SELL' for side in sides):
+            return None
+        if not all(quantity is not None and quantity > 0 for quantity in quantities):
+            return None
+        if not all(prices[symbol] != 0.0 for symbol in set(symbols)):
+            return None
+        balances = list(accumulate((-total if side == 'BUY' else total for side, total in zip(sides, totals)),
+                                   initial=self.balance))[1:]
+        if balances and min(balances) < 0:
+            return None
+        positions = {symbol: self._portfolio.get(symbol, 0) for symbol in set(symbols)}
+        helds = []
+        for side, symbol, quantity in zip(sides, symbols, quantities):
+            held = positions[symbol]
+            helds.append(held)
+            positions[symbol] = held + quantity if side == 'BUY' else held - quantity
+        if positions and min(positions.values()) < 0 or any(held < 0 for held in helds):
+            return None
+        return list(range(len(sides))), [], balances, helds, positions
+
+    def _plan_batch(self, sides: List[str], symbols: List[str], quantities: List[Optional[int]],
+                    prices: Dict[str, float], totals: List[float]) -> tuple:
+        """
+        Plans a batch order by order, checking each against the balance and
+        holdings left by the orders accepted before it.
+        """
+        balance = self.balance
+        positions = {}
+        accepted = []
+        rejected = []
+        balances = []
+        helds = []
+        for index, (side, symbol, quantity, total) in enumerate(zip(sides, symbols, quantities, totals)):
+            if side != 'BUY' and side != 'SELL':
+                rejected.append((index, f"Unknown side {side}"))
+                continue
+            if quantity is None:
+                rejected.append((index, "Quantity must be a whole number of shares"))
+                continue
+            if quantity <= 0:
+                rejected.append((index, "Quantity must be positive"))
+                continue
+            if prices[symbol] == 0.0:
+                rejected.append((index, f"Unknown symbol {symbol}"))
+                continue
+            held = positions[symbol] if symbol in positions else self._portfolio.get(symbol, 0)
+            if side == 'BUY':
+                if total > balance:
+                    rejected.append((index, "Insufficient funds"))
+                    continue
+                balance -= total
+                positions[symbol] = held + quantity
+            else:
+                if quantity > held:
+                    rejected.append((index, "Insufficient shares"))
+                    continue
+                balance += total
+                positions[symbol] = held - quantity
+            accepted.append(index)
+            balances.append(balance)
+            helds.append(held)
+        return accepted, rejected, balances, helds, positions
+    
+    def get_prices(self) -> Dict[str, float]:
+        """
+        Returns the current price of every held symbol, in one provider lookup,
+        and marks the holdings to those prices.
+        """
+        prices = self.price_provider.get_prices(self._portfolio)
+        self.update_prices(prices)
+        return prices
+    
+    def calculate_portfolio_value(self, prices: Optional[Dict[str, float]] = None) -> float:
         """
         Calculates and returns the current total value of the user's portfolio.
         
+        Args:
+            prices: Share prices to value the holdings at; if not given, current
+                prices when live_prices is set and the last known prices otherwise.
+            
         Returns:
             The current total value of the portfolio.
         """
+        if prices is None:
+            if self.live_prices:
+                self.get_prices()
+            return self.market_value
         total_value = 0.0
         
-        for symbol, quantity in self.portfolio.items():
-            price = get_share_price(symbol)
-            total_value += price * quantity
+        for symbol, quantity in self._portfolio.items():
+            total_value += prices[symbol] * quantity
         
         return total_value
     
-    def calculate_profit_loss(self) -> float:
+    def calculate_profit_loss(self, prices: Optional[Dict[str, float]] = None) -> float:
         """
         Calculates and returns the profit or loss based on the initial deposits.
         
+        Args:
+            prices: Share prices to value the holdings at; if not given, current
+                prices when live_prices is set and the last known prices otherwise.
+            
         Returns:
             The profit or loss as a float value.
         """
-        portfolio_value = self.calculate_portfolio_value()
+        portfolio_value = self.calculate_portfolio_value(prices)
         total_assets = portfolio_value + self.balance
         
         return total_assets - self.initial_deposit
     
-    def get_holdings(self) -> Dict[str, Dict[str, Union[int, float]]]:
+    def get_holdings(self, prices: Optional[Dict[str, float]] = None) -> Dict[str, Dict[str, Union[int, float]]]:
         """
         Returns a dictionary representing the user's current holdings.
         
+        Args:
+            prices: Share prices to value the holdings at; if not given, current
+                prices when live_prices is set and the last known prices otherwise.
+            
         Returns:
             Dictionary where keys are stock symbols and values are dictionaries
             containing quantity and current value.
         """
+        if prices is None:
+            prices = self.get_prices() if self.live_prices else self._marks
         holdings = {}
         
-        for symbol, quantity in self.portfolio.items():
-            price = get_share_price(symbol)
+        for symbol, quantity in self._portfolio.items():
+            price = prices[symbol]
             value = price * quantity
             holdings[symbol] = {
                 'quantity': quantity,
@@ -238,24 +1262,147 @@ class Account:
         
         return holdings
     
-    def get_transaction_history(self) -> List[Dict]:
+    def get_symbol_profit_loss(self, prices: Optional[Dict[str, float]] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Returns realized and unrealized profit/loss for every symbol held or traded,
+        with cost basis from the account's cost method.
+        
+        Args:
+            prices: Share prices to value the holdings at; if not given, current
+                prices when live_prices is set and the last known prices otherwise.
+            
+        Returns:
+            Dictionary of symbol to quantity, cost_basis, average_cost, market_value,
+            realized and unrealized.
+        """
+        if prices is None:
+            prices = self.get_prices() if self.live_prices else self._marks
+        lots = self.lots
+        report = {}
+        for symbol in {**lots.realized, **lots.quantities}:
+            quantity = lots.quantities.get(symbol, 0)
+            cost_basis = lots.costs.get(symbol, 0.0)
+            market_value = quantity * prices[symbol] if quantity else 0.0
+            report[symbol] = {
+                'quantity': quantity,
+                'cost_basis': cost_basis,
+                'average_cost': cost_basis / quantity if quantity else 0.0,
+                'market_value': market_value,
+                'realized': lots.realized.get(symbol, 0.0),
+                'unrealized': market_value - cost_basis
+            }
+        return report
+    
+    def holdings_at(self, timestamp: Union[datetime, int, float]) -> Dict[str, int]:
+        """
+        Returns the shares held at a point in time.
+        
+        Args:
+            timestamp: A datetime or epoch seconds.
+            
+        Returns:
+            Dictionary of stock symbol to quantity held at that time.
+        """
+        positions, _ = self.ledger.state_at(self.ledger.rows_until(timestamp))
+        return positions
+    
+    def profit_loss_at(self, timestamp: Union[datetime, int, float],
+                       prices: Union[Dict[str, float], ReplayPriceProvider]) -> float:
         """
-        Returns a list of all the transactions made by the user.
+        Returns the profit or loss at a point in time: the cash balance and
+        holdings at that time, valued at that time's prices, less everything
+        deposited up to that time.
         
+        Args:
+            timestamp: A datetime or epoch seconds.
+            prices: The share prices at that time, as a mapping of symbol to price
+                or a ReplayPriceProvider whose quotes as of timestamp are used.
+                Current prices would mix today's marks into a historical figure,
+                so there is no default.
+            
+        Returns:
+            The profit or loss as a float value.
+        """
+        rows = self.ledger.rows_until(timestamp)
+        positions, deposited = self.ledger.state_at(rows)
+        balance = self.ledger.balances[rows - 1] if rows else 0.0
+        if isinstance(prices, ReplayPriceProvider):
+            prices = prices.prices_at(timestamp, positions)
+        missing = [symbol for symbol in positions if symbol not in prices]
+        if missing:
+            raise ValueError(f"No price for {', '.join(missing)} at {timestamp}")
+        value = sum(quantity * prices[symbol] for symbol, quantity in positions.items())
+        return balance + value - deposited
+    
+    def get_transaction_history(self) -> TransactionView:
+        """
+        Returns all the transactions made by the user.
+        
+        Returns:
+            A lazy, read-only list of dictionaries containing transaction details.
+        """
+        return TransactionView(self.ledger)
+    
+    def iter_transactions(self, type_: Optional[str] = None, symbol: Optional[str] = None,
+                          start: Union[datetime, int, float, None] = None,
+                          end: Union[datetime, int, float, None] = None,
+                          newest_first: bool = False) -> Iterator[Dict]:
+        """
+        Streams the transactions matching the filters, building each dictionary
+        only when it is reached.
+        
+        Args:
+            type_: Only DEPOSIT, WITHDRAWAL, BUY or SELL transactions.
+            symbol: Only trades in this stock symbol.
+            start: Only transactions at or after this datetime or epoch seconds.
+            end: Only transactions at or before this datetime or epoch seconds.
+            newest_first: Whether to stream the newest transactions first.
+        """
+        ledger = self.ledger
+        for row in ledger.iter_rows(type_, symbol, start, end, reverse=newest_first):
+            yield ledger.record(row)
+    
+    def get_transactions_page(self, type_: Optional[str] = None, symbol: Optional[str] = None,
+                              start: Union[datetime, int, float, None] = None,
+                              end: Union[datetime, int, float, None] = None,
+                              cursor: Optional[int] = None, limit: int = 50,
+                              newest_first: bool = True) -> Dict:
+        """
+        Returns one page of the transactions matching the filters.
+        
+        Args:
+            type_, symbol, start, end: Filters, as for iter_transactions.
+            cursor: The next_cursor of the previous page, or None for the first page.
+            limit: The most transactions to return.
+            newest_first: Whether pages run from the newest transaction backwards.
+            
         Returns:
-            List of dictionaries containing transaction details.
+            Dictionary with 'transactions' (the page) and 'next_cursor' (None when
+            there are no more matching transactions).
         """
-        return self.transactions
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        ledger = self.ledger
+        rows = ledger.iter_rows(type_, symbol, start, end, cursor=cursor, reverse=newest_first)
+        page = list(islice(rows, limit + 1))
+        next_cursor = None
+        if len(page) > limit:
+            page.pop()
+            next_cursor = page[-1] if newest_first else page[-1] + 1
+        return {'transactions': [ledger.record(row) for row in page], 'next_cursor': next_cursor}
     
     def get_profit_loss_report(self) -> Dict:
         """
-        Provides a detailed report of the user's profit or loss.
+        Provides a detailed report of the user's profit or loss. The totals come
+        from the running aggregates, after a single price lookup for all holdings
+        when live_prices is set.
         
         Returns:
             A dictionary with detailed profit/loss calculation.
         """
-        portfolio_value = self.calculate_portfolio_value()
-        profit_loss = self.calculate_profit_loss()
+        prices = self.get_prices() if self.live_prices else self._marks
+        portfolio_value = self.market_value
+        profit_loss = portfolio_value + self.balance - self.initial_deposit
         
         report = {
             'initial_deposit': self.initial_deposit,
@@ -264,11 +1411,151 @@ class Account:
             'total_assets': portfolio_value + self.balance,
             'profit_loss': profit_loss,
             'profit_loss_percentage': (profit_loss / self.initial_deposit) * 100 if self.initial_deposit > 0 else 0.0,
-            'holdings': self.get_holdings()
+            'cost_basis': self.cost_basis,
+            'realized_profit_loss': self.realized_pl,
+            'unrealized_profit_loss': self.unrealized_pl,
+            'cost_method': self.cost_method,
+            'by_symbol': self.get_symbol_profit_loss(prices),
+            'holdings': self.get_holdings(prices)
         }
         
         return report
 
+class AccountManager:
+    """
+    Thread-safe registry of many accounts.
+    
+    Accounts are spread over shards by user id, and each shard has its own lock
+    guarding only its part of the registry, so opening and looking up accounts
+    rarely contends. Every account also has its own lock: operations on one
+    account are serialized, while different accounts trade in parallel.
+    """
+    
+    def __init__(self, shards: int = 64, price_provider: Optional[PriceProvider] = None,
+                 live_prices: bool = True, journal=None, cost_method: str = 'average'):
+        """
+        Args:
+            shards: Number of registry shards.
+            price_provider: Provider shared by the accounts; defaults to get_share_price.
+            live_prices: Passed to every account, see Account.
+            cost_method: Passed to every account, see Account.
+            journal: Optional journal.Journal; the accounts it holds are recovered
+                and every account's transactions are logged to it.
+        """
+        self.price_provider = price_provider if price_provider is not None else SharePriceProvider()
+        self.live_prices = live_prices
+        self.cost_method = cost_method
+        self.journal = journal
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]  # user_id -> (account, lock)
+        if journal is not None:
+            for user_id, account in journal.recover(self._new_account).items():
+                self._shard(user_id)[0][user_id] = (account, threading.RLock())
+    
+    def _new_account(self, user_id: str) -> Account:
+        return Account(user_id, price_provider=self.price_provider, live_prices=self.live_prices,
+                       cost_method=self.cost_method)
+    
+    def _shard(self, user_id: str) -> tuple:
+        # crc32 rather than hash() so a user lands on the same shard in every process
+        return self._shards[zlib.crc32(user_id.encode()) % len(self._shards)]
+    
+    def _entry(self, user_id: str, create: bool = False) -> Optional[tuple]:
+        accounts, lock = self._shard(user_id)
+        entry = accounts.get(user_id)
+        if entry is None and create:
+            with lock:
+                entry = accounts.get(user_id)
+                if entry is None:
+                    account = self._new_account(user_id)
+                    if self.journal is not None:
+                        self.journal.attach(account)
+                    entry = accounts[user_id] = (account, threading.RLock())
+        return entry
+    
+    def open_account(self, user_id: str) -> Account:
+        """
+        Returns the account for user_id, creating it on first use.
+        """
+        return self._entry(user_id, create=True)[0]
+    
+    def get(self, user_id: str) -> Optional[Account]:
+        """
+        Returns the account for user_id, or None if it has not been opened.
+        """
+        entry = self._entry(user_id)
+        return entry[0] if entry is not None else None
+    
+    def close_account(self, user_id: str) -> bool:
+        """
+        Removes the account for user_id once no operation holds it.
+        
+        Returns:
+            True if the account existed, False otherwise.
+        """
+        accounts, lock = self._shard(user_id)
+        entry = accounts.get(user_id)
+        if entry is None:
+            return False
+        with entry[1], lock:
+            if accounts.pop(user_id, None) is None:
+                return False
+            if self.journal is not None:
+                self.journal.log_close(entry[0])
+            return True
+    
+    def __contains__(self, user_id: str) -> bool:
+        return self._entry(user_id) is not None
+    
+    def __len__(self) -> int:
+        return sum(len(accounts) for accounts, _ in self._shards)
+    
+    def user_ids(self) -> List[str]:
+        """
+        Returns the ids of every open account.
+        """
+        user_ids = []
+        for accounts, lock in self._shards:
+            with lock:
+                user_ids.extend(accounts)
+        return user_ids
+    
+    @contextmanager
+    def locked(self, user_id: str) -> Iterator[Account]:
+        """
+        Holds the account's lock for a sequence of operations, creating the
+        account on first use.
+        
+        Example:
+            with manager.locked("alice") as account:
+                if account.balance >= 1000:
+                    account.buy_shares("AAPL", 5)
+        """
+        account, lock = self._entry(user_id, create=True)
+        with lock:
+            yield account
+    
+    def execute(self, user_id: str, operation: str, *args, **kwargs) -> Any:
+        """
+        Calls an Account method under the account's lock, e.g.
+        manager.execute("alice", "buy_shares", "AAPL", 5).
+        """
+        with self.locked(user_id) as account:
+            return getattr(account, operation)(*args, **kwargs)
+    
+    def checkpoint(self) -> None:
+        """
+        Snapshots every account to the journal, so recovery only replays what
+        happens after this point.
+        """
+        def accounts():
+            for user_id in self.user_ids():
+                entry = self._entry(user_id)
+                if entry is not None:
+                    with entry[1]:
+                        yield entry[0]
+        
+        self.journal.snapshot(accounts())
+
 if __name__ == "__main__":
     # Example usage
     account = Account("user123")
@@ -282,5 +1569,5 @@ if __name__ == "__main__":
     print(f"Portfolio value: ${account.calculate_portfolio_value():.2f}")
     print(f"Profit/Loss: ${account.calculate_profit_loss():.2f}")
     print(f"Holdings: {account.get_holdings()}")
-    print(f"Transaction history: {account.get_transaction_history()}")
+    print(f"Transaction history: {list(account.get_transaction_history())}")
     print(f"Profit/Loss report: {account.get_profit_loss_report()}")
\ No newline at end of file
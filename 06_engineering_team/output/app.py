@@ -1,69 +1,73 @@
 #!/usr/bin/env python3
 
 import gradio as gr
-from accounts import Account, get_share_price
+from accounts import AccountManager
 
-# Initialize account for demo
-account = Account("demo_user")
-account.create_account()
+# Every browser session trades on its own account; the manager serializes
+# concurrent requests on the same account
+manager = AccountManager()
 
-def create_account():
-    account.create_account()
+def user_id(request: gr.Request) -> str:
+    return request.session_hash if request is not None and request.session_hash else "demo_user"
+
+def create_account(request: gr.Request):
+    with manager.locked(user_id(request)) as account:
+        account.create_account()
     return "Account created successfully!"
 
-def deposit(amount):
+def deposit(amount, request: gr.Request):
     try:
         amount = float(amount)
-        if account.deposit_funds(amount):
+        if manager.execute(user_id(request), "deposit_funds", amount):
             return f"Successfully deposited ${amount:.2f}"
         else:
             return "Deposit failed. Amount must be positive."
     except ValueError:
         return "Invalid amount. Please enter a valid number."
 
-def withdraw(amount):
+def withdraw(amount, request: gr.Request):
     try:
         amount = float(amount)
-        if account.withdraw_funds(amount):
+        if manager.execute(user_id(request), "withdraw_funds", amount):
             return f"Successfully withdrew ${amount:.2f}"
         else:
             return "Withdrawal failed. Insufficient funds or invalid amount."
     except ValueError:
         return "Invalid amount. Please enter a valid number."
 
-def buy_shares(symbol, quantity):
+def buy_shares(symbol, quantity, request: gr.Request):
     try:
         quantity = int(quantity)
-        if account.buy_shares(symbol, quantity):
+        if manager.execute(user_id(request), "buy_shares", symbol, quantity):
             return f"Successfully bought {quantity} shares of {symbol}"
         else:
             return "Purchase failed. Check symbol, quantity, or available funds."
     except ValueError:
         return "Invalid quantity. Please enter a valid number."
 
-def sell_shares(symbol, quantity):
+def sell_shares(symbol, quantity, request: gr.Request):
     try:
         quantity = int(quantity)
-        if account.sell_shares(symbol, quantity):
+        if manager.execute(user_id(request), "sell_shares", symbol, quantity):
             return f"Successfully sold {quantity} shares of {symbol}"
         else:
             return "Sale failed. Check symbol or available shares."
     except ValueError:
         return "Invalid quantity. Please enter a valid number."
 
-def get_portfolio_value():
-    value = account.calculate_portfolio_value()
+def get_portfolio_value(request: gr.Request):
+    value = manager.execute(user_id(request), "calculate_portfolio_value")
     return f"Current portfolio value: ${value:.2f}"
 
-def get_profit_loss():
-    profit_loss = account.calculate_profit_loss()
+def get_profit_loss(request: gr.Request):
+    profit_loss = manager.execute(user_id(request), "calculate_profit_loss")
     if profit_loss >= 0:
         return f"Current profit: ${profit_loss:.2f}"
     else:
         return f"Current loss: ${-profit_loss:.2f}"
 
-def get_holdings():
-    holdings = account.get_holdings()
+def get_holdings(request: gr.Request):
+    holdings = manager.execute(user_id(request), "get_holdings")
     if not holdings:
         return "No holdings found."
     
@@ -73,27 +77,51 @@ def get_holdings():
     
     return result
 
-def get_transactions():
-    transactions = account.get_transaction_history()
-    if not transactions:
-        return "No transactions found."
-    
-    result = "Transaction History:\n"
-    for i, tx in enumerate(transactions, 1):
-        result += f"{i}. {tx['type']}"
-        if tx['type'] == 'DEPOSIT' or tx['type'] == 'WITHDRAWAL':
-            result += f": ${tx['amount']:.2f}"
-        elif tx['type'] == 'BUY' or tx['type'] == 'SELL':
-            result += f": {tx['quantity']} {tx['symbol']} at ${tx['price']:.2f} = ${tx['total']:.2f}"
-        result += f" (Balance after: ${tx['balance_after']:.2f})\n"
-    
-    return result
+def format_transaction(tx):
+    line = f"{tx['timestamp']:%Y-%m-%d %H:%M:%S} {tx['type']}"
+    if tx['type'] == 'DEPOSIT' or tx['type'] == 'WITHDRAWAL':
+        line += f": ${tx['amount']:.2f}"
+    elif tx['type'] == 'BUY' or tx['type'] == 'SELL':
+        line += f": {tx['quantity']} {tx['symbol']} at ${tx['price']:.2f} = ${tx['total']:.2f}"
+    return line + f" (Balance after: ${tx['balance_after']:.2f})"
 
-def get_account_summary():
-    if account.initial_deposit == 0:
-        return "Account has not been funded yet. Please deposit funds first."
+def get_transactions(tx_type, symbol, page_size, cursor, request: gr.Request):
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        return "Invalid page size. Please enter a whole number.", cursor
+    if page_size < 1:
+        return "Page size must be at least 1.", cursor
+    with manager.locked(user_id(request)) as account:
+        page = account.get_transactions_page(
+            type_=None if tx_type == "ALL" else tx_type,
+            symbol=symbol.strip().upper() or None,
+            cursor=cursor,
+            limit=page_size
+        )
+    if not page['transactions']:
+        return "No transactions found.", None
     
-    report = account.get_profit_loss_report()
+    lines = ["Transaction History (newest first):"]
+    lines.extend(format_transaction(tx) for tx in page['transactions'])
+    if page['next_cursor'] is None:
+        lines.append("-- end of history --")
+    return "\n".join(lines), page['next_cursor']
+
+def get_newest_transactions(tx_type, symbol, page_size, request: gr.Request):
+    return get_transactions(tx_type, symbol, page_size, None, request)
+
+def get_older_transactions(tx_type, symbol, page_size, cursor, request: gr.Request):
+    if cursor is None:
+        return "No older transactions. Load the newest page first.", None
+    return get_transactions(tx_type, symbol, page_size, cursor, request)
+
+def get_account_summary(request: gr.Request):
+    with manager.locked(user_id(request)) as account:
+        if account.initial_deposit == 0:
+            return "Account has not been funded yet. Please deposit funds first."
+        
+        report = account.get_profit_loss_report()
     
     summary = f"""
 Account Summary:
@@ -117,7 +145,7 @@ Total Assets: ${report['total_assets']:.2f}
 
 def get_available_stocks():
     stocks = ["AAPL", "TSLA", "GOOGL"]
-    prices = [f"{stock}: ${get_share_price(stock):.2f}" for stock in stocks]
+    prices = [f"{stock}: ${price:.2f}" for stock, price in manager.price_provider.get_prices(stocks).items()]
     return "\n".join(prices)
 
 with gr.Blocks(title="Trading Simulation Platform") as demo:
@@ -180,9 +208,20 @@ with gr.Blocks(title="Trading Simulation Platform") as demo:
                 holdings_btn.click(get_holdings, inputs=[], outputs=holdings_value)
     
     with gr.Tab("Transaction History"):
-        transactions_btn = gr.Button("Get Transaction History")
+        with gr.Row():
+            transactions_type = gr.Dropdown(["ALL", "DEPOSIT", "WITHDRAWAL", "BUY", "SELL"], value="ALL", label="Type")
+            transactions_symbol = gr.Textbox(label="Symbol (optional)")
+            transactions_page_size = gr.Number(value=50, precision=0, label="Page size")
+        transactions_cursor = gr.State(None)
+        with gr.Row():
+            transactions_btn = gr.Button("Newest Transactions")
+            older_btn = gr.Button("Older")
         transactions_value = gr.Textbox(label="Transactions", lines=10)
-        transactions_btn.click(get_transactions, inputs=[], outputs=transactions_value)
+        filters = [transactions_type, transactions_symbol, transactions_page_size]
+        transactions_btn.click(get_newest_transactions, inputs=filters,
+                               outputs=[transactions_value, transactions_cursor])
+        older_btn.click(get_older_transactions, inputs=filters + [transactions_cursor],
+                        outputs=[transactions_value, transactions_cursor])
 
 if __name__ == "__main__":
     demo.launch()
\ No newline at end of file
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+"""
+Backtests trading strategies against historical OHLC bars, fully offline.
+
+Bars are streamed from a local CSV file (memory-mapped) or Parquet file (with
+pyarrow installed) with timestamp, symbol, open, high, low, close and optional
+volume columns, in time order. Timestamps are epoch seconds or ISO 8601.
+
+A strategy is a module-level function called for every bar:
+
+    def strategy(bar: Bar, account: Account, state: dict, **params) -> orders
+
+It returns (side, symbol, quantity) orders, which execute at the bar's close.
+Example:
+    python backtest.py prices.csv --fast 5,10,20 --slow 50,100 --processes 4
+    python backtest.py prices.csv --generate 1000000   # write synthetic bars first
+"""
+
+import argparse
+import itertools
+import mmap
+import random
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from accounts import Account, DictPriceProvider
+
+class Bar(NamedTuple):
+    timestamp: float  # epoch seconds
+    symbol: str
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float = 0.0
+
+def _seconds(value) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.decode() if isinstance(value, bytes) else value).timestamp()
+
+def read_csv_bars(path: str) -> Iterator[Bar]:
+    """
+    Streams bars from a CSV file through a memory map, so the file is paged in by
+    the OS rather than read into memory.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header = [name.strip().lower() for name in data.readline().decode().split(',')]
+        columns = [header.index(name) for name in ('timestamp', 'symbol', 'open', 'high', 'low', 'close')]
+        volume = header.index('volume') if 'volume' in header else None
+        symbols: Dict[bytes, str] = {}
+        last_raw, last_seconds = None, 0.0
+        for line in iter(data.readline, b''):
+            fields = line.rstrip(b'\r\n').split(b',')
+            if len(fields) < len(header):
+                continue
+            t, s, o, h, l, c = (fields[i] for i in columns)
+            if t != last_raw:
+                last_raw, last_seconds = t, _seconds(t)
+            symbol = symbols.get(s)
+            if symbol is None:
+                symbol = symbols[s] = s.decode()
+            yield Bar(last_seconds, symbol, float(o), float(h), float(l), float(c),
+                      float(fields[volume]) if volume is not None else 0.0)
+
+def read_parquet_bars(path: str, batch_size: int = 65536) -> Iterator[Bar]:
+    """
+    Streams bars from a memory-mapped Parquet file in record batches; needs pyarrow.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet files needs pyarrow: pip install pyarrow") from e
+    parquet = pq.ParquetFile(path, memory_map=True)
+    names = set(parquet.schema_arrow.names)
+    wanted = ['timestamp', 'symbol', 'open', 'high', 'low', 'close'] + (['volume'] if 'volume' in names else [])
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=wanted):
+        columns = batch.to_pydict()
+        timestamps = [_seconds(value) for value in columns['timestamp']]
+        volumes = columns.get('volume') or itertools.repeat(0.0)
+        for row in zip(timestamps, columns['symbol'], columns['open'], columns['high'], columns['low'],
+                       columns['close'], volumes):
+            yield Bar(*row)
+
+def read_bars(path: str) -> Iterator[Bar]:
+    """
+    Streams bars from a .csv or .parquet file.
+    """
+    return read_parquet_bars(path) if path.endswith('.parquet') else read_csv_bars(path)
+
+class BacktestResult(NamedTuple):
+    params: Dict
+    timestamps: array  # epoch seconds, one per distinct bar time
+    equity: array  # cash plus holdings at the close of each bar time
+    bars: int
+    seconds: float
+    trades: int
+    final_equity: float
+
+    @property
+    def bars_per_second(self) -> float:
+        return self.bars / self.seconds if self.seconds else 0.0
+
+    @property
+    def total_return(self) -> float:
+        return self.final_equity / self.equity[0] - 1 if self.equity and self.equity[0] else 0.0
+
+    @property
+    def max_drawdown(self) -> float:
+        peak, drawdown = float('-inf'), 0.0
+        for value in self.equity:
+            peak = max(peak, value)
+            if peak > 0:
+                drawdown = max(drawdown, 1 - value / peak)
+        return drawdown
+
+    def summary(self) -> Dict:
+        return {
+            'params': self.params,
+            'final_equity': self.final_equity,
+            'total_return': self.total_return,
+            'max_drawdown': self.max_drawdown,
+            'trades': self.trades,
+            'bars': self.bars,
+            'bars_per_second': self.bars_per_second,
+        }
+
+def run_backtest(bars: Iterable[Bar], strategy: Callable, params: Optional[Dict] = None,
+                 initial_cash: float = 100_000.0, cost_method: str = 'average') -> BacktestResult:
+    """
+    Replays bars through strategy, executing its orders against an Account at each
+    bar's close, and records the equity curve.
+
+    The account values holdings from running aggregates updated by each bar's
+    close, so a bar costs O(1) plus the strategy and its orders.
+    """
+    params = params or {}
+    feed = DictPriceProvider()
+    account = Account("backtest", price_provider=feed, live_prices=False, cost_method=cost_method)
+    prices = feed.prices
+    update_price = account.update_price
+    execute = account.execute_batch
+    state: Dict = {}
+    timestamps, equity = array('d'), array('d')
+    current = None
+    count = trades = 0
+    start = time.perf_counter()
+    for bar in bars:
+        if bar.timestamp != current:
+            if current is None:
+                account.deposit_funds(initial_cash, timestamp=bar.timestamp)
+            else:
+                timestamps.append(current)
+                equity.append(account.balance + account.market_value)
+            current = bar.timestamp
+        count += 1
+        prices[bar.symbol] = bar.close
+        update_price(bar.symbol, bar.close)
+        orders = strategy(bar, account, state, **params)
+        if orders:
+            trades += len(execute(orders, atomic=False, timestamp=bar.timestamp)['executed'])
+    if current is not None:
+        timestamps.append(current)
+        equity.append(account.balance + account.market_value)
+    return BacktestResult(params, timestamps, equity, count, time.perf_counter() - start, trades,
+                          equity[-1] if equity else initial_cash)
+
+def _run_file(path: str, strategy: Callable, params: Dict, initial_cash: float, cost_method: str) -> BacktestResult:
+    return run_backtest(read_bars(path), strategy, params, initial_cash, cost_method)
+
+def sweep(path: str, strategy: Callable, param_grid: Iterable[Dict], processes: Optional[int] = None,
+          initial_cash: float = 100_000.0, cost_method: str = 'average') -> List[BacktestResult]:
+    """
+    Backtests strategy once per parameter set, in parallel worker processes that
+    each stream the file themselves. strategy must be a module-level function so
+    it can be sent to the workers.
+    """
+    param_grid = list(param_grid)
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(_run_file, path, strategy, params, initial_cash, cost_method) for params in param_grid]
+        return [future.result() for future in futures]
+
+def grid(**values: Iterable) -> List[Dict]:
+    """
+    Every combination of parameter values, e.g. grid(fast=[5, 10], slow=[50]).
+    """
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+def moving_average_crossover(bar: Bar, account: Account, state: Dict, fast: int = 10, slow: int = 50,
+                             quantity: int = 10) -> List[tuple]:
+    """
+    Buys when a symbol's fast moving average of closes crosses above its slow one and
+    sells the position when it crosses back below. Averages are kept as running sums.
+    """
+    if fast >= slow:
+        return []
+    windows = state.get(bar.symbol)
+    if windows is None:
+        windows = state[bar.symbol] = {'closes': deque(), 'fast': 0.0, 'slow': 0.0, 'above': None}
+    closes = windows['closes']
+    closes.append(bar.close)
+    windows['fast'] += bar.close
+    windows['slow'] += bar.close
+    if len(closes) > fast:
+        windows['fast'] -= closes[-fast - 1]
+    if len(closes) > slow:
+        windows['slow'] -= closes.popleft()
+    if len(closes) < slow:
+        return []
+    above = windows['fast'] / fast > windows['slow'] / slow
+    crossed = windows['above'] is not None and above != windows['above']
+    windows['above'] = above
+    if not crossed:
+        return []
+    if above:
+        return [('BUY', bar.symbol, quantity)]
+    held = account.portfolio.get(bar.symbol, 0)
+    return [('SELL', bar.symbol, held)] if held else []
+
+def generate_bars(path: str, bars: int, symbols: Iterable[str] = ('AAPL', 'TSLA', 'GOOGL', 'MSFT'),
+                  seed: int = 0) -> None:
+    """
+    Writes a synthetic random-walk OHLC CSV with `bars` rows, one bar per symbol per minute.
+    """
+    symbols = list(symbols)
+    rng = random.Random(seed)
+    closes = {symbol: 100.0 for symbol in symbols}
+    start = 1_700_000_000
+    with open(path, 'w') as f:
+        f.write("timestamp,symbol,open,high,low,close,volume\n")
+        for i in range(bars):
+            symbol = symbols[i % len(symbols)]
+            open_ = closes[symbol]
+            close = max(1.0, open_ * (1 + rng.gauss(0, 0.002)))
+            high, low = max(open_, close) * 1.001, min(open_, close) * 0.999
+            closes[symbol] = close
+            f.write(f"{start + 60 * (i // len(symbols))},{symbol},{open_:.4f},{high:.4f},{low:.4f},{close:.4f},"
+                    f"{rng.randint(100, 10000)}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help="CSV or Parquet file of bars")
+    parser.add_argument('--generate', type=int, metavar='BARS', help="write synthetic bars to path first")
+    parser.add_argument('--fast', default='10', help="comma-separated fast moving average windows")
+    parser.add_argument('--slow', default='50', help="comma-separated slow moving average windows")
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--target', type=float, default=100_000, help="bars per second to aim for")
+    args = parser.parse_args()
+    if args.generate:
+        generate_bars(args.path, args.generate)
+    params = grid(fast=[int(v) for v in args.fast.split(',')], slow=[int(v) for v in args.slow.split(',')])
+    start = time.perf_counter()
+    results = sweep(args.path, moving_average_crossover, params, args.processes)
+    elapsed = time.perf_counter() - start
+    for result in results:
+        summary = result.summary()
+        print(f"{summary['params']}: return {summary['total_return']:+.2%}, "
+              f"max drawdown {summary['max_drawdown']:.2%}, {summary['trades']} trades, "
+              f"{summary['bars_per_second']:,.0f} bars/s")
+    total_bars = sum(result.bars for result in results)
+    per_run = min(result.bars_per_second for result in results) if results else 0.0
+    print(f"{len(results)} runs, {total_bars:,} bars in {elapsed:.2f}s ({total_bars / elapsed:,.0f} bars/s overall); "
+          f"slowest run {per_run:,.0f} bars/s, target {args.target:,.0f}: {'met' if per_run >= args.target else 'missed'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks for the accounts module.
+
+Run a single benchmark with its name, e.g. `python bench_accounts.py ledger --rows 10000000`,
+or every benchmark with `python bench_accounts.py all`.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import accounts
+import backtest
+import journal
+
+SYMBOLS = ['AAPL', 'TSLA', 'GOOGL', 'MSFT', 'AMZN', 'NVDA', 'META', 'NFLX']
+
+def timed(label: str, count: int, fn):
+    """
+    Runs fn once and prints its throughput; returns fn's result.
+    """
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<40} {elapsed:8.3f}s  {count / elapsed:>14,.0f} /s")
+    return result
+
+def bench_ledger(rows: int) -> None:
+    """
+    Append throughput, memory per row and filter speed of the columnar ledger,
+    compared with the list of dicts it replaced.
+    """
+    print(f"ledger: {rows:,} rows")
+    ledger = accounts.TransactionLedger()
+
+    def fill():
+        append = ledger.append
+        for i in range(rows):
+            append('BUY' if i % 2 else 'SELL', 100.0, 1000.0, symbol=SYMBOLS[i % len(SYMBOLS)],
+                   quantity=1, price=100.0, timestamp_ns=i)
+
+    timed("append", rows, fill)
+    print(f"  {'columnar bytes/row':<40} {ledger.nbytes() / rows:8.1f}")
+
+    sample = min(rows, 200_000)
+    tracemalloc.start()
+    dicts = [{'type': 'BUY', 'symbol': SYMBOLS[i % len(SYMBOLS)], 'quantity': 1, 'price': 100.0,
+              'total': 100.0 + i, 'timestamp': datetime.now(), 'balance_after': 1000.0 + i}
+             for i in range(sample)]
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del dicts
+    print(f"  {'list-of-dicts bytes/row':<40} {dict_bytes / sample:8.1f}")
+
+    timed("select type=BUY", rows, lambda: ledger.select(type_='BUY'))
+    timed("select symbol=AAPL", rows, lambda: ledger.select(symbol='AAPL'))
+    timed("select symbol=AAPL type=SELL", rows, lambda: ledger.select(symbol='AAPL', type_='SELL'))
+    timed("select time range (middle 10%)", rows,
+          lambda: ledger.select(start=rows * 0.45e-9, end=rows * 0.55e-9))
+
+def bench_snapshots(rows: int) -> None:
+    """
+    Point-in-time holdings from snapshots versus replaying the whole history.
+    """
+    print(f"snapshots: {rows:,} rows of history")
+    account = accounts.Account("bench")
+    ledger = account.ledger
+    for i in range(rows):
+        ledger.append('BUY' if i % 3 else 'SELL', 100.0, 1000.0, symbol=SYMBOLS[i % len(SYMBOLS)],
+                      quantity=1, price=100.0, timestamp_ns=i * 1000)
+    queries = 1000
+    times = [(rows * 1000 * q // queries) / 1e9 for q in range(queries)]
+    timed("holdings_at (snapshot + tail)", queries, lambda: [account.holdings_at(t) for t in times])
+
+    def full_replay(t):
+        positions = {}
+        for row in range(ledger.rows_until(t)):
+            symbol = ledger.symbol_ids[row]
+            change = ledger.quantities[row] if ledger.types[row] == accounts.BUY_CODE else -ledger.quantities[row]
+            positions[symbol] = positions.get(symbol, 0) + change
+        return positions
+
+    replay_queries = max(1, min(queries, 20_000_000 // rows))
+    timed("full replay", replay_queries, lambda: [full_replay(t) for t in times[::queries // replay_queries]])
+
+def bench_batch(rows: int) -> None:
+    """
+    Orders per second through execute_batch versus calling buy_shares/sell_shares in a loop,
+    for a batch where every order is accepted and for one whose first order is rejected.
+    """
+    print(f"batch: {rows:,} orders")
+    symbols = ['AAPL', 'TSLA', 'GOOGL']
+    for label, first in (("all accepted", 3), ("one rejected", 0)):
+        orders = [('SELL' if i % 4 == first else 'BUY', symbols[i % 3], 1) for i in range(rows)]
+
+        single = accounts.Account("single")
+        single.deposit_funds(1e12)
+        def loop():
+            for side, symbol, quantity in orders:
+                (single.buy_shares if side == 'BUY' else single.sell_shares)(symbol, quantity)
+        timed(f"single-order loop, {label}", rows, loop)
+
+        batched = accounts.Account("batched")
+        batched.deposit_funds(1e12)
+        timed(f"execute_batch, {label}", rows, lambda: batched.execute_batch(orders, atomic=False))
+
+class RemoteFeed(accounts.DictPriceProvider):
+    """
+    A price feed where every request costs a fixed round trip.
+    """
+    
+    def __init__(self, prices, latency: float):
+        super().__init__(prices)
+        self.latency = latency
+        self.requests = 0
+    
+    def get_price(self, symbol):
+        return self.get_prices([symbol])[symbol]
+    
+    def get_prices(self, symbols):
+        self.requests += 1
+        time.sleep(self.latency)
+        return super().get_prices(symbols)
+
+def bench_prices(rows: int) -> None:
+    """
+    Profit/loss reports against a feed with 1 ms round trips: one batched lookup per
+    report versus one lookup per holding per valuation.
+    """
+    holdings = min(rows, 1000)
+    reports = 20
+    print(f"prices: {reports} reports over {holdings:,} holdings")
+    symbols = [f"SYM{i}" for i in range(holdings)]
+    feed = RemoteFeed({symbol: 10.0 for symbol in symbols}, latency=0.001)
+    account = accounts.Account("bench", price_provider=feed)
+    account.deposit_funds(1e12)
+    account.execute_batch([('BUY', symbol, 1) for symbol in symbols])
+
+    def per_symbol():
+        # the report before batching valued every holding twice and listed it once
+        for _ in range(reports):
+            for _ in range(3):
+                sum(feed.get_price(symbol) * quantity for symbol, quantity in account.portfolio.items())
+
+    feed.requests = 0
+    timed("per-symbol lookups", reports, per_symbol)
+    print(f"  {'feed requests':<40} {feed.requests:8,}")
+    feed.requests = 0
+    timed("batched report", reports, lambda: [account.get_profit_loss_report() for _ in range(reports)])
+    print(f"  {'feed requests':<40} {feed.requests:8,}")
+    account.price_provider = accounts.CachedPriceProvider(feed, ttl=60.0)
+    feed.requests = 0
+    timed("batched report, cached", reports, lambda: [account.get_profit_loss_report() for _ in range(reports)])
+    print(f"  {'feed requests':<40} {feed.requests:8,}")
+
+def bench_valuation(rows: int) -> None:
+    """
+    Price ticks and portfolio valuation from running aggregates versus iterating every holding.
+    """
+    holdings = min(rows, 10_000)
+    print(f"valuation: {holdings:,} holdings, {rows:,} ticks")
+    symbols = [f"SYM{i}" for i in range(holdings)]
+    feed = accounts.DictPriceProvider({symbol: 10.0 for symbol in symbols})
+    account = accounts.Account("bench", price_provider=feed, live_prices=False)
+    account.deposit_funds(1e12)
+    account.execute_batch([('BUY', symbol, 1) for symbol in symbols])
+
+    def ticks():
+        update = account.update_price
+        for i in range(rows):
+            update(symbols[i % holdings], 10.0 + i % 7)
+    timed("update_price", rows, ticks)
+
+    valuations = 10_000
+    prices = {symbol: data['price'] for symbol, data in account.get_holdings().items()}
+    timed("full recomputation", valuations // 100,
+          lambda: [account.calculate_portfolio_value(prices) for _ in range(valuations // 100)])
+    timed("running aggregate", valuations,
+          lambda: [account.calculate_portfolio_value() for _ in range(valuations)])
+
+def simulate_users(users: int, operations: int, seed: int, manager=None) -> int:
+    """
+    Runs random deposits and trades for users user0..user{users - 1} through an
+    AccountManager; returns the number of operations executed.
+    """
+    manager = manager if manager is not None else accounts.AccountManager()
+    rng = random.Random(seed)
+    for _ in range(operations):
+        user = f"user{rng.randrange(users)}"
+        action = rng.random()
+        if action < 0.1:
+            manager.execute(user, "deposit_funds", 10000.0)
+        elif action < 0.6:
+            manager.execute(user, "buy_shares", rng.choice(['AAPL', 'TSLA', 'GOOGL']), rng.randint(1, 3))
+        elif action < 0.9:
+            manager.execute(user, "sell_shares", rng.choice(['AAPL', 'TSLA', 'GOOGL']), 1)
+        else:
+            manager.execute(user, "get_profit_loss_report")
+    return operations
+
+def bench_manager(rows: int) -> None:
+    """
+    Throughput of an AccountManager shared by several threads, and of independent
+    managers in separate processes, each owning a slice of the users.
+    """
+    users = 5000
+    print(f"manager: {users:,} users, {rows:,} operations")
+    for threads in (1, 2, 4, 8):
+        manager = accounts.AccountManager()
+        workers = [threading.Thread(target=simulate_users, args=(users, rows // threads, seed, manager))
+                   for seed in range(threads)]
+
+        def run():
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        timed(f"{threads} thread(s), shared manager", rows, run)
+
+    for processes in (1, 2, 4):
+        if processes > (os.cpu_count() or 1):
+            break
+        with ProcessPoolExecutor(processes) as pool:
+            pool.submit(int).result()  # start the workers before timing
+            timed(f"{processes} process(es), {users // processes:,} users each", rows,
+                  lambda: sum(pool.map(simulate_users, [users // processes] * processes,
+                                       [rows // processes] * processes, range(processes))))
+
+def bench_journal(rows: int) -> None:
+    """
+    Journaled deposit throughput with fsync batching at different group sizes, and
+    recovery time from the log alone versus a snapshot plus a short log tail.
+    """
+    print(f"journal: {rows:,} events")
+    for group_size in (1, 8, 64, 512):
+        # a commit per event is slow enough that a sample is representative
+        events = rows if group_size > 1 else min(rows, 2000)
+        with tempfile.TemporaryDirectory() as directory:
+            log = journal.Journal(directory, group_size=group_size, flush_interval=0)
+            manager = accounts.AccountManager(journal=log)
+            deposit = manager.open_account("bench").deposit_funds
+
+            def run():
+                for _ in range(events):
+                    deposit(1.0)
+                log.flush()
+            timed(f"group commit, {group_size} events/fsync", events, run)
+            log.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = journal.Journal(directory, group_size=4096, flush_interval=0, sync=False)
+        manager = accounts.AccountManager(journal=log)
+        for user in range(100):
+            manager.execute(f"user{user}", "deposit_funds", 1e9)
+        simulate_users(100, rows, 0, manager)
+        log.close()
+        timed("recover from log", rows, lambda: journal.Journal(directory, flush_interval=0).recover())
+        manager.checkpoint()
+        simulate_users(100, rows // 100, 1, manager)
+        log.close()
+        print(f"  {'snapshot bytes':<40} {os.path.getsize(log.snapshot_path):8,}")
+        timed("recover from snapshot + 1% tail", rows, lambda: journal.Journal(directory, flush_interval=0).recover())
+
+def bench_lots(rows: int) -> None:
+    """
+    Buying one-share lots and selling them in blocks of 1,000 with each cost method,
+    versus FIFO matching over a plain list.
+    """
+    print(f"lots: {rows:,} one-share lots")
+    block = 1000
+    for method in accounts.COST_METHODS:
+        book = accounts.LotBook(method)
+
+        def buy():
+            for i in range(rows):
+                book.buy('AAPL', 1, 100.0 + i % 50)
+        timed(f"{method} buy", rows, buy)
+        timed(f"{method} sell, {block:,} lots per sell", rows,
+              lambda: [book.sell('AAPL', block, 120.0) for _ in range(rows // block)])
+
+    sample = min(rows, 200_000)
+    lots = [[1, 100.0 + i % 50] for i in range(sample)]
+
+    def list_fifo():
+        for _ in range(sample // block):
+            remaining = block
+            while remaining:
+                quantity, _ = lots.pop(0)
+                remaining -= quantity
+    timed(f"list.pop(0) fifo sell ({sample:,} lots)", sample, list_fifo)
+
+def bench_history(rows: int) -> None:
+    """
+    Latency of one filtered page of history as the history grows, versus formatting
+    the whole history.
+    """
+    pages = 1000
+    for size in sorted({rows // 100, rows}):
+        print(f"history: {size:,} transactions")
+        account = accounts.Account("bench")
+        ledger = account.ledger
+        for i in range(size):
+            ledger.append('BUY' if i % 3 else 'SELL', 100.0, 1000.0, symbol=SYMBOLS[i % len(SYMBOLS)],
+                          quantity=1, price=100.0, timestamp_ns=i)
+        timed("newest page of 50", pages, lambda: [account.get_transactions_page(limit=50) for _ in range(pages)])
+        timed("newest page of 50, AAPL sells", pages,
+              lambda: [account.get_transactions_page(type_='SELL', symbol='AAPL', limit=50) for _ in range(pages)])
+        timed("whole history as one string", 1,
+              lambda: "\n".join(str(tx) for tx in account.get_transaction_history()))
+
+def bench_backtest(rows: int) -> None:
+    """
+    Bars per second for reading a memory-mapped CSV, for a moving average crossover
+    backtest, and for a parameter sweep across processes.
+    """
+    print(f"backtest: {rows:,} bars")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bars.csv')
+        backtest.generate_bars(path, rows)
+        timed("read csv", rows, lambda: sum(1 for _ in backtest.read_bars(path)))
+        timed("crossover backtest", rows,
+              lambda: backtest.run_backtest(backtest.read_bars(path), backtest.moving_average_crossover))
+        params = backtest.grid(fast=[5, 10], slow=[50, 100])
+        timed(f"sweep of {len(params)} on {os.cpu_count()} cpu(s)", rows * len(params),
+              lambda: backtest.sweep(path, backtest.moving_average_crossover, params))
+
+BENCHMARKS = {
+    'ledger': bench_ledger,
+    'snapshots': bench_snapshots,
+    'batch': bench_batch,
+    'prices': bench_prices,
+    'valuation': bench_valuation,
+    'manager': bench_manager,
+    'journal': bench_journal,
+    'lots': bench_lots,
+    'history': bench_history,
+    'backtest': bench_backtest,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmark', choices=[*BENCHMARKS, 'all'])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    for name, bench in BENCHMARKS.items():
+        if args.benchmark in (name, 'all'):
+            bench(args.rows)
+
+if __name__ == "__main__":
+    main()
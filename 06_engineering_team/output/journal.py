@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+
+"""
+Write-ahead log and snapshots for Account state.
+
+Every ledger row an account writes is appended to the journal as a binary event.
+Events are buffered and written with one fsync per group (group commit), so the
+cost of durability is shared by many transactions. A snapshot stores every
+account's ledger columns as raw arrays; recovery loads the latest snapshot and
+replays only the events logged after it.
+
+Files in the journal directory:
+    snapshot.bin            the latest snapshot
+    wal-<first seq>.log     log segments; a snapshot starts a new segment and
+                            removes the segments it covers
+"""
+
+import atexit
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from typing import Callable, Dict, Iterable, List
+
+from accounts import TRANSACTION_TYPES, Account, TransactionLedger
+
+# Frame: payload length, CRC32 of the payload
+FRAME = struct.Struct('<II')
+# Event: seq, timestamp_ns, type code, quantity, price, amount, balance_after,
+# user id length, symbol length; followed by the user id and symbol in UTF-8
+EVENT = struct.Struct('<QqbqdddHH')
+RESET_CODE = -1
+CLOSE_CODE = -2
+
+SNAPSHOT_MAGIC = b'ACCTSNAP1\n'
+SNAPSHOT_HEADER = struct.Struct('<I')
+
+class Journal:
+    """
+    Durable record of account transactions with group commit and snapshots.
+
+    Up to group_size events, or flush_interval seconds of events, can be lost if the
+    process dies before they are committed; call flush() where a caller needs its
+    transaction on disk before continuing.
+    """
+
+    def __init__(self, directory: str, group_size: int = 64, flush_interval: float = 0.05,
+                 sync: bool = True):
+        """
+        Args:
+            directory: Where the log segments and snapshot are kept.
+            group_size: Events buffered before they are written and fsynced together.
+            flush_interval: Longest time, in seconds, an event waits in the buffer.
+            sync: Whether commits fsync; without it a commit only reaches the OS.
+        """
+        self.directory = directory
+        self.group_size = group_size
+        self.flush_interval = flush_interval
+        self.sync = sync
+        os.makedirs(directory, exist_ok=True)
+        self.stats = {'events': 0, 'commits': 0, 'bytes': 0, 'snapshots': 0}
+        self._seq = 0
+        self._buffer = bytearray()
+        self._pending = 0
+        self._lock = threading.Lock()  # guards the buffer and sequence numbers
+        self._io_lock = threading.Lock()  # guards the open segment
+        self._file = None
+        self._stop = threading.Event()
+        if flush_interval:
+            threading.Thread(target=self._flush_periodically, name="journal-flusher", daemon=True).start()
+        atexit.register(self.close)
+
+    # -- logging -------------------------------------------------------------
+
+    def attach(self, account: Account) -> None:
+        """
+        Journals every transaction the account writes from now on.
+        """
+        account.journal = self
+
+    def log(self, account: Account, start: int) -> None:
+        """
+        Logs the account's ledger rows from start to the end of the ledger.
+        """
+        ledger = account.ledger
+        user = account.user_id.encode()
+        symbols = ledger.symbols
+        with self._lock:
+            for row in range(start, len(ledger)):
+                symbol_id = ledger.symbol_ids[row]
+                symbol = symbols[symbol_id].encode() if symbol_id >= 0 else b''
+                self._seq += 1
+                self._append(EVENT.pack(self._seq, ledger.timestamps[row], ledger.types[row],
+                                        ledger.quantities[row], ledger.prices[row], ledger.amounts[row],
+                                        ledger.balances[row], len(user), len(symbol)) + user + symbol)
+            account.journal_seq = self._seq
+        self._after_append()
+
+    def log_reset(self, account: Account) -> None:
+        """
+        Logs that the account was reset by create_account.
+        """
+        self._log_control(account, RESET_CODE)
+
+    def log_close(self, account: Account) -> None:
+        """
+        Logs that the account was closed, so recovery drops it.
+        """
+        self._log_control(account, CLOSE_CODE)
+
+    def _log_control(self, account: Account, code: int) -> None:
+        user = account.user_id.encode()
+        with self._lock:
+            self._seq += 1
+            self._append(EVENT.pack(self._seq, time.time_ns(), code, 0, 0.0, 0.0, 0.0, len(user), 0) + user)
+            account.journal_seq = self._seq
+        self._after_append()
+
+    def _append(self, payload: bytes) -> None:
+        self._buffer += FRAME.pack(len(payload), zlib.crc32(payload))
+        self._buffer += payload
+        self._pending += 1
+
+    def _after_append(self) -> None:
+        if self._pending >= self.group_size:
+            self.flush()
+
+    def _flush_periodically(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            if self._pending:
+                self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes and fsyncs every buffered event. Callers that arrive while another
+        thread is committing add their events to the next group.
+        """
+        with self._io_lock:
+            with self._lock:
+                if not self._buffer:
+                    return
+                data, count = bytes(self._buffer), self._pending
+                first_seq = self._seq - count + 1
+                self._buffer.clear()
+                self._pending = 0
+            if self._file is None:
+                self._file = open(self._segment_path(first_seq), 'ab')
+            self._file.write(data)
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+            self.stats['events'] += count
+            self.stats['commits'] += 1
+            self.stats['bytes'] += len(data)
+
+    def close(self) -> None:
+        """
+        Commits buffered events and closes the open segment.
+        """
+        self._stop.set()
+        self.flush()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # -- snapshots -----------------------------------------------------------
+
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"wal-{first_seq:020d}.log")
+
+    def _segments(self) -> List[str]:
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                      if name.startswith('wal-') and name.endswith('.log'))
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, 'snapshot.bin')
+
+    def snapshot(self, accounts: Iterable[Account]) -> None:
+        """
+        Writes a snapshot of the accounts and removes the log segments it covers.
+        accounts must include every account that logs to this journal.
+
+        Each account must not change while it is being written; AccountManager.checkpoint
+        holds each account's lock while it is yielded. Events logged during the snapshot
+        go to a new segment, and recovery skips the ones an account's snapshot already
+        includes.
+        """
+        self.flush()
+        with self._io_lock:
+            covered = self._segments()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            for account in accounts:
+                self._write_account(f, account)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._sync_directory()
+        # a segment opened after the rotation is never in covered
+        for path in covered:
+            os.remove(path)
+        self.stats['snapshots'] += 1
+
+    @staticmethod
+    def _write_account(f, account: Account) -> None:
+        ledger = account.ledger
+        header = account.get_state()
+        header['symbols'] = ledger.symbols
+        header['rows'] = len(ledger)
+        header['snapshot_interval'] = ledger.snapshot_interval
+        encoded = json.dumps(header, separators=(',', ':')).encode()
+        f.write(SNAPSHOT_HEADER.pack(len(encoded)))
+        f.write(encoded)
+        for column in ledger.columns():
+            column.tofile(f)
+
+    def _read_snapshot(self, make_account: Callable[[str], Account]) -> Dict[str, Account]:
+        accounts: Dict[str, Account] = {}
+        if not os.path.exists(self.snapshot_path):
+            return accounts
+        with open(self.snapshot_path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"{self.snapshot_path} is not an account snapshot")
+            while True:
+                size = f.read(SNAPSHOT_HEADER.size)
+                if not size:
+                    break
+                header = json.loads(f.read(SNAPSHOT_HEADER.unpack(size)[0]))
+                columns = []
+                for template in TransactionLedger().columns():
+                    column = array(template.typecode)
+                    column.fromfile(f, header['rows'])
+                    columns.append(column)
+                ledger = TransactionLedger.from_columns(columns, header['symbols'], header['snapshot_interval'])
+                account = make_account(header['user_id'])
+                account.set_state(header, ledger)
+                accounts[account.user_id] = account
+        return accounts
+
+    def _sync_directory(self) -> None:
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    # -- recovery ------------------------------------------------------------
+
+    def recover(self, make_account: Callable[[str], Account] = Account) -> Dict[str, Account]:
+        """
+        Rebuilds every account from the latest snapshot plus the log tail, and
+        attaches the journal to them.
+
+        A torn or corrupt record at the end of the last segment (from a crash during
+        a write) is truncated away. Call before logging anything with this journal.
+
+        Args:
+            make_account: Creates an empty account for a user id.
+
+        Returns:
+            Dictionary of user id to recovered account.
+        """
+        accounts = self._read_snapshot(make_account)
+        self._seq = max((account.journal_seq for account in accounts.values()), default=0)
+        for path in self._segments():
+            with open(path, 'rb') as f:
+                data = f.read()
+            offset = self._replay(data, accounts, make_account)
+            if offset < len(data):
+                with open(path, 'r+b') as f:
+                    f.truncate(offset)
+        for account in accounts.values():
+            self.attach(account)
+        return accounts
+
+    def _replay(self, data: bytes, accounts: Dict[str, Account],
+                make_account: Callable[[str], Account]) -> int:
+        """
+        Applies the events in one segment; returns the offset of the first bad record.
+        """
+        offset = 0
+        while offset + FRAME.size <= len(data):
+            length, crc = FRAME.unpack_from(data, offset)
+            start = offset + FRAME.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            offset = start + length
+            seq, timestamp_ns, code, quantity, price, amount, balance, user_len, symbol_len = EVENT.unpack_from(payload)
+            self._seq = max(self._seq, seq)
+            user = payload[EVENT.size:EVENT.size + user_len].decode()
+            account = accounts.get(user)
+            if account is not None and seq <= account.journal_seq:
+                continue  # already in the snapshot
+            if code == CLOSE_CODE:
+                accounts.pop(user, None)
+                continue
+            if account is None:
+                account = accounts[user] = make_account(user)
+            if code == RESET_CODE:
+                account.create_account()
+            else:
+                symbol = payload[EVENT.size + user_len:EVENT.size + user_len + symbol_len].decode() or None
+                account.apply_event(TRANSACTION_TYPES[code], amount, balance, symbol=symbol, quantity=quantity,
+                                    price=price, timestamp_ns=timestamp_ns)
+            account.journal_seq = seq
+        return offset
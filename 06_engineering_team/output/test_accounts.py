@@ -1,9 +1,16 @@
 #!/usr/bin/env python3
 
+import importlib.util
+import os
+import random
+import tempfile
+import threading
 import unittest
 from unittest.mock import patch, MagicMock
 from datetime import datetime
 import accounts
+import backtest
+import journal
 from accounts import Account
 
 class TestGetSharePrice(unittest.TestCase):
@@ -288,4 +295,790 @@ class TestAccount(unittest.TestCase):
     def test_get_profit_loss_report(self):
         """Test getting a detailed profit/loss report"""
         self.account.deposit_funds(10000.0)
-        self.account.buy_shares('AAPL', 10)
\ No newline at end of file
+        self.account.buy_shares('AAPL', 10)
+
+class TestTransactionLedger(unittest.TestCase):
+    def setUp(self):
+        """Set up a ledger with a few deposits and trades"""
+        self.ledger = accounts.TransactionLedger()
+        self.ledger.append('DEPOSIT', 1000.0, 1000.0, timestamp_ns=100)
+        self.ledger.append('BUY', 300.0, 700.0, symbol='AAPL', quantity=2, price=150.0, timestamp_ns=200)
+        self.ledger.append('BUY', 800.0, -100.0, symbol='TSLA', quantity=1, price=800.0, timestamp_ns=300)
+        self.ledger.append('SELL', 150.0, 50.0, symbol='AAPL', quantity=1, price=150.0, timestamp_ns=400)
+        self.ledger.append('WITHDRAWAL', 50.0, 0.0, timestamp_ns=500)
+
+    def test_symbols_are_interned(self):
+        """Test each symbol is stored once and rows refer to it by id"""
+        self.assertEqual(self.ledger.symbols, ['AAPL', 'TSLA'])
+        self.assertEqual(list(self.ledger.symbol_ids), [-1, 0, 1, 0, -1])
+
+    def test_record_matches_history_format(self):
+        """Test rows materialize as the same dictionaries the account used to store"""
+        self.assertEqual(set(self.ledger.record(0)), {'type', 'amount', 'timestamp', 'balance_after'})
+        trade = self.ledger.record(1)
+        self.assertEqual(trade['symbol'], 'AAPL')
+        self.assertEqual(trade['quantity'], 2)
+        self.assertEqual(trade['total'], 300.0)
+        self.assertIsInstance(trade['timestamp'], datetime)
+
+    def test_out_of_order_timestamp_rejected(self):
+        """Test a row timestamped before the last one is rejected and the ledger left as it was"""
+        with self.assertRaisesRegex(ValueError, "before the last"):
+            self.ledger.append('DEPOSIT', 10.0, 10.0, timestamp_ns=50)
+        with self.assertRaisesRegex(ValueError, "before the last"):
+            self.ledger.extend(['DEPOSIT'], [10.0], [10.0], [None], [0], [0.0], timestamp_ns=499)
+        self.assertEqual((len(self.ledger), self.ledger.state_at(5)[1]), (5, 1000.0))
+        self.ledger.append('DEPOSIT', 10.0, 10.0, timestamp_ns=500)
+        self.assertEqual(list(self.ledger.timestamps[-2:]), [500, 500])
+
+    def test_clock_stepping_back_is_held(self):
+        """Test a default timestamp is held at the last row's if the clock steps back"""
+        with patch.object(accounts.time, 'time_ns', return_value=50):
+            self.ledger.append('DEPOSIT', 10.0, 10.0)
+        self.assertEqual(self.ledger.timestamps[-1], 500)
+
+    def test_out_of_order_deposit_leaves_account_alone(self):
+        """Test a deposit rejected for its timestamp doesn't change the balance"""
+        account = Account("test_user")
+        account.deposit_funds(100.0, timestamp=20.0)
+        with self.assertRaises(ValueError):
+            account.deposit_funds(50.0, timestamp=10.0)
+        self.assertEqual((account.balance, account.initial_deposit, len(account.transactions)), (100.0, 100.0, 1))
+
+    def test_select_filters(self):
+        """Test filtering by type, symbol and time range"""
+        self.assertEqual(list(self.ledger.select(type_='BUY')), [1, 2])
+        self.assertEqual(list(self.ledger.select(symbol='AAPL')), [1, 3])
+        self.assertEqual(list(self.ledger.select(symbol='AAPL', type_='SELL')), [3])
+        self.assertEqual(list(self.ledger.select(start=200e-9, end=300e-9)), [1, 2])
+        self.assertEqual(list(self.ledger.select(symbol='AAPL', start=250e-9)), [3])
+        self.assertEqual(list(self.ledger.select(symbol='MSFT')), [])
+
+    def test_from_records_round_trip(self):
+        """Test a ledger rebuilt from its own records is equal"""
+        view = accounts.TransactionView(self.ledger)
+        rebuilt = accounts.TransactionView(accounts.TransactionLedger.from_records(view))
+        self.assertEqual(rebuilt, view)
+
+    def test_fractional_quantity_is_rejected(self):
+        """Test the ledger refuses a fractional quantity instead of truncating it"""
+        with self.assertRaises(ValueError):
+            self.ledger.append('BUY', 375.0, -375.0, symbol='AAPL', quantity=2.5, price=150.0)
+        self.assertEqual(len(self.ledger), 5)
+
+    def test_fractional_shares_are_not_traded(self):
+        """Test buying or selling 2.5 shares fails and leaves the account untouched"""
+        account = Account("test_user")
+        account.deposit_funds(1000.0)
+        self.assertFalse(account.buy_shares('AAPL', 2.5))
+        self.assertEqual(account.balance, 1000.0)
+        self.assertEqual(account.portfolio, {})
+        self.assertTrue(account.buy_shares('AAPL', 2.0))
+        self.assertFalse(account.sell_shares('AAPL', 1.5))
+        self.assertEqual(account.portfolio, {'AAPL': 2})
+        self.assertIsInstance(account.portfolio['AAPL'], int)
+        self.assertEqual(account.transactions[-1]['quantity'], 2)
+
+    def test_history_view_is_lazy_and_read_only(self):
+        """Test the account history is a view that tracks new transactions"""
+        account = Account("test_user")
+        history = account.get_transaction_history()
+        account.deposit_funds(100.0)
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history[-1]['type'], 'DEPOSIT')
+        self.assertFalse(hasattr(history, 'append'))
+
+class TestPointInTime(unittest.TestCase):
+    def setUp(self):
+        """Set up an account whose transactions happen at seconds 1 to 5"""
+        self.account = Account("test_user")
+        with patch('accounts.time.time_ns', side_effect=[s * 1_000_000_000 for s in range(1, 6)]):
+            self.account.deposit_funds(10000.0)
+            self.account.buy_shares('AAPL', 10)
+            self.account.buy_shares('TSLA', 5)
+            self.account.sell_shares('AAPL', 4)
+            self.account.withdraw_funds(1000.0)
+
+    def test_holdings_at(self):
+        """Test holdings reflect only the trades up to the given time"""
+        self.assertEqual(self.account.holdings_at(0), {})
+        self.assertEqual(self.account.holdings_at(1), {})
+        self.assertEqual(self.account.holdings_at(2), {'AAPL': 10})
+        self.assertEqual(self.account.holdings_at(3.5), {'AAPL': 10, 'TSLA': 5})
+        self.assertEqual(self.account.holdings_at(datetime.now()), {'AAPL': 6, 'TSLA': 5})
+
+    def test_profit_loss_at(self):
+        """Test profit/loss uses the balance and holdings at the given time"""
+        self.assertEqual(self.account.profit_loss_at(0, {}), 0.0)
+        self.assertEqual(self.account.profit_loss_at(2, {'AAPL': 150.0}), 0.0)
+        self.assertEqual(self.account.profit_loss_at(2, prices={'AAPL': 200.0}), 500.0)
+        self.assertEqual(self.account.profit_loss_at(5, self.account.get_prices()),
+                         self.account.calculate_profit_loss())
+
+    def test_profit_loss_at_replays_prices_of_the_time(self):
+        """Test holdings are valued at the quotes as of the given time, not the latest ones"""
+        feed = accounts.ReplayPriceProvider([(1, 'AAPL', 150.0), (2.5, 'AAPL', 170.0), (6, 'AAPL', 300.0),
+                                             (1, 'TSLA', 800.0), (6, 'TSLA', 100.0)])
+        self.assertEqual(self.account.profit_loss_at(2, feed), 0.0)
+        self.assertEqual(self.account.profit_loss_at(3, feed), 200.0)
+        self.assertEqual(self.account.profit_loss_at(3.5, feed), 200.0)
+        self.assertIsNone(feed.now)
+
+    def test_profit_loss_at_needs_every_price(self):
+        """Test a holding without a price is an error rather than a silent zero"""
+        with self.assertRaisesRegex(ValueError, "TSLA"):
+            self.account.profit_loss_at(3.5, {'AAPL': 150.0})
+        with self.assertRaises(TypeError):
+            self.account.profit_loss_at(3.5)
+
+    def test_snapshots_match_full_replay(self):
+        """Test snapshot-plus-tail state equals replaying the whole history"""
+        ledger = accounts.TransactionLedger(snapshot_interval=3)
+        quantities = {}
+        expected = []
+        for i in range(20):
+            symbol = ['AAPL', 'TSLA'][i % 2]
+            side = 'SELL' if i % 5 == 4 else 'BUY'
+            ledger.append(side, 1.0, 1.0, symbol=symbol, quantity=i + 1)
+            quantities[symbol] = quantities.get(symbol, 0) + (i + 1 if side == 'BUY' else -(i + 1))
+            expected.append({s: q for s, q in quantities.items() if q})
+        for rows in range(1, 21):
+            self.assertEqual(ledger.state_at(rows)[0], expected[rows - 1])
+
+class TestExecuteBatch(unittest.TestCase):
+    def setUp(self):
+        """Set up a funded account"""
+        self.account = Account("test_user")
+        self.account.deposit_funds(10000.0)
+
+    def test_batch_executes_in_order(self):
+        """Test later orders see the balance and holdings left by earlier ones"""
+        result = self.account.execute_batch([('BUY', 'AAPL', 10), ('SELL', 'AAPL', 4), {'side': 'BUY', 'symbol': 'TSLA', 'quantity': 5}])
+        self.assertTrue(result['committed'])
+        self.assertEqual(result['executed'], [0, 1, 2])
+        self.assertEqual(result['rejected'], [])
+        self.assertEqual(self.account.portfolio, {'AAPL': 6, 'TSLA': 5})
+        self.assertEqual(self.account.balance, 10000.0 - 1500.0 + 600.0 - 4000.0)
+        self.assertEqual([tx['type'] for tx in self.account.transactions], ['DEPOSIT', 'BUY', 'SELL', 'BUY'])
+
+    def test_atomic_batch_commits_nothing_on_rejection(self):
+        """Test an atomic batch with a bad order leaves the account untouched"""
+        result = self.account.execute_batch([('BUY', 'AAPL', 10), ('SELL', 'TSLA', 1), ('BUY', 'GOOGL', 100)])
+        self.assertFalse(result['committed'])
+        self.assertEqual(result['rejected'], [(1, "Insufficient shares"), (2, "Insufficient funds")])
+        self.assertEqual(self.account.balance, 10000.0)
+        self.assertEqual(self.account.portfolio, {})
+        self.assertEqual(len(self.account.transactions), 1)
+
+    def test_non_atomic_batch_skips_rejected_orders(self):
+        """Test a non-atomic batch executes the valid orders only"""
+        result = self.account.execute_batch([('BUY', 'INVALID', 1), ('BUY', 'AAPL', 10), ('SELL', 'AAPL', 0)], atomic=False)
+        self.assertTrue(result['committed'])
+        self.assertEqual(result['executed'], [1])
+        self.assertEqual([index for index, _ in result['rejected']], [0, 2])
+        self.assertEqual(self.account.portfolio, {'AAPL': 10})
+
+    def test_batch_rejects_fractional_quantity(self):
+        """Test a fractional order in a batch is rejected rather than truncated"""
+        result = self.account.execute_batch([('BUY', 'AAPL', 2.5), ('BUY', 'AAPL', 2.0)], atomic=False)
+        self.assertEqual(result['rejected'], [(0, "Quantity must be a whole number of shares")])
+        self.assertEqual(self.account.portfolio, {'AAPL': 2})
+
+    def test_batch_prices_each_symbol_once(self):
+        """Test the batch looks up each distinct symbol's price once"""
+        with patch('accounts.get_share_price', return_value=100.0) as price:
+            self.account.execute_batch([('BUY', 'AAPL', 1)] * 20 + [('BUY', 'TSLA', 1)] * 20)
+        self.assertEqual(price.call_count, 2)
+
+    def test_batch_matches_single_orders(self):
+        """Test a batch leaves the same state and history as the equivalent single orders"""
+        orders = [('BUY', ['AAPL', 'TSLA'][i % 2], i % 3 + 1) for i in range(30)] + [('SELL', 'AAPL', 5)]
+        batched = Account("batched")
+        single = Account("single")
+        for account in (batched, single):
+            account.ledger = accounts.TransactionLedger(snapshot_interval=4)
+            account.deposit_funds(10000.0)
+        for side, symbol, quantity in orders:
+            (single.buy_shares if side == 'BUY' else single.sell_shares)(symbol, quantity)
+        batched.execute_batch(orders, atomic=False)
+        self.assertEqual(batched.balance, single.balance)
+        self.assertEqual(batched.portfolio, single.portfolio)
+        strip = lambda txs: [{k: v for k, v in tx.items() if k != 'timestamp'} for tx in txs]
+        self.assertEqual(strip(batched.transactions), strip(single.transactions))
+        for rows in range(1, len(single.ledger) + 1):
+            self.assertEqual(batched.ledger.state_at(rows), single.ledger.state_at(rows))
+
+class TestPriceProviders(unittest.TestCase):
+    def test_report_looks_up_prices_once(self):
+        """Test the profit/loss report makes a single batched price lookup"""
+        provider = accounts.DictPriceProvider({'AAPL': 150.0, 'TSLA': 800.0, 'GOOGL': 2800.0})
+        account = Account("test_user", price_provider=provider)
+        account.deposit_funds(10000.0)
+        account.buy_shares('AAPL', 10)
+        account.buy_shares('TSLA', 5)
+        with patch.object(provider, 'get_prices', wraps=provider.get_prices) as get_prices:
+            report = account.get_profit_loss_report()
+        self.assertEqual(get_prices.call_count, 1)
+        self.assertEqual(report['portfolio_value'], 5500.0)
+        self.assertEqual(report['holdings']['TSLA']['value'], 4000.0)
+
+    def test_cached_provider_expires_after_ttl(self):
+        """Test cached prices are reused within the TTL and refetched after it"""
+        now = [0.0]
+        feed = accounts.DictPriceProvider({'AAPL': 150.0})
+        cached = accounts.CachedPriceProvider(feed, ttl=1.0, clock=lambda: now[0])
+        self.assertEqual(cached.get_price('AAPL'), 150.0)
+        feed.prices['AAPL'] = 160.0
+        self.assertEqual(cached.get_price('AAPL'), 150.0)
+        now[0] = 1.5
+        self.assertEqual(cached.get_price('AAPL'), 160.0)
+        self.assertEqual((cached.hits, cached.misses), (1, 2))
+
+    def test_cached_provider_batches_misses(self):
+        """Test only uncached symbols are passed to the underlying provider"""
+        feed = accounts.DictPriceProvider({'AAPL': 150.0, 'TSLA': 800.0})
+        cached = accounts.CachedPriceProvider(feed, ttl=60.0)
+        cached.get_price('AAPL')
+        with patch.object(feed, 'get_prices', wraps=feed.get_prices) as get_prices:
+            self.assertEqual(cached.get_prices(['AAPL', 'TSLA']), {'AAPL': 150.0, 'TSLA': 800.0})
+        get_prices.assert_called_once_with(['TSLA'])
+
+    def test_replay_provider_follows_clock(self):
+        """Test replayed prices are the last quote at or before the replay time"""
+        feed = accounts.ReplayPriceProvider([(1, 'AAPL', 100.0), (3, 'AAPL', 110.0), (2, 'TSLA', 700.0)])
+        account = Account("test_user", price_provider=feed)
+        feed.advance(1)
+        self.assertEqual(feed.get_prices(['AAPL', 'TSLA']), {'AAPL': 100.0, 'TSLA': 0.0})
+        account.deposit_funds(1000.0)
+        self.assertTrue(account.buy_shares('AAPL', 5))
+        self.assertEqual(list(feed.ticks()), [1.0, 2.0, 3.0])
+        self.assertEqual(account.calculate_profit_loss(), 50.0)
+
+    def test_replay_provider_from_csv(self):
+        """Test quotes can be loaded from a CSV file"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write("timestamp,symbol,price\n2024-01-02T00:00:00,AAPL,101.5\n1704067200,AAPL,100.0\n")
+        try:
+            feed = accounts.ReplayPriceProvider.from_csv(f.name)
+        finally:
+            os.remove(f.name)
+        feed.advance(datetime(2024, 1, 1, 12))
+        self.assertEqual(feed.get_price('AAPL'), 100.0)
+        feed.advance(datetime(2024, 1, 3))
+        self.assertEqual(feed.get_price('AAPL'), 101.5)
+
+class TestIncrementalValuation(unittest.TestCase):
+    SYMBOLS = ['AAPL', 'TSLA', 'GOOGL', 'MSFT']
+
+    def recompute(self, account, marks):
+        """Full recomputation of the aggregates by replaying the ledger at average cost"""
+        shares, costs, realized = {}, {}, 0.0
+        for tx in account.transactions:
+            symbol, quantity = tx.get('symbol'), tx.get('quantity')
+            if tx['type'] == 'BUY':
+                shares[symbol] = shares.get(symbol, 0) + quantity
+                costs[symbol] = costs.get(symbol, 0.0) + tx['total']
+            elif tx['type'] == 'SELL':
+                sold_cost = costs[symbol] * quantity / shares[symbol]
+                realized += tx['total'] - sold_cost
+                shares[symbol] -= quantity
+                costs[symbol] -= sold_cost
+        market_value = sum(quantity * marks[symbol] for symbol, quantity in shares.items())
+        cost_basis = sum(costs[symbol] for symbol, quantity in shares.items() if quantity)
+        return market_value, cost_basis, realized
+
+    def check(self, account, marks):
+        market_value, cost_basis, realized = self.recompute(account, marks)
+        self.assertAlmostEqual(account.market_value, market_value, places=4)
+        self.assertAlmostEqual(account.cost_basis, cost_basis, places=4)
+        self.assertAlmostEqual(account.realized_pl, realized, places=4)
+        self.assertAlmostEqual(account.unrealized_pl, market_value - cost_basis, places=4)
+        self.assertAlmostEqual(account.calculate_profit_loss(),
+                               account.balance + market_value - account.initial_deposit, places=4)
+
+    def test_assigned_portfolio_value_matches_holdings(self):
+        """Test value and holdings agree when the portfolio is assigned outright"""
+        for live_prices in (True, False):
+            account = Account("test_user", live_prices=live_prices)
+            account.portfolio = {'AAPL': 10, 'TSLA': 0}
+            holdings = account.get_holdings()
+            self.assertEqual(account.portfolio, {'AAPL': 10})
+            self.assertEqual(holdings['AAPL']['value'], 1500.0)
+            self.assertEqual(account.calculate_portfolio_value(), 1500.0)
+            self.assertEqual(account.get_profit_loss_report()['portfolio_value'], 1500.0)
+            self.assertTrue(account.sell_shares('AAPL', 10))
+            self.assertEqual(account.calculate_portfolio_value(), 0.0)
+
+    def test_portfolio_is_read_only(self):
+        """Test the portfolio can't be changed behind the valuation's back"""
+        account = Account("test_user")
+        with self.assertRaises(TypeError):
+            account.portfolio['AAPL'] = 10
+
+    def test_aggregates_match_recomputation(self):
+        """Test running aggregates match a full recomputation over random trades and ticks"""
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                prices = {symbol: rng.uniform(1, 500) for symbol in self.SYMBOLS}
+                feed = accounts.DictPriceProvider(prices)
+                account = Account("test_user", price_provider=feed, live_prices=False)
+                account.deposit_funds(100000.0)
+                marks = {}
+                for _ in range(150):
+                    symbol = rng.choice(self.SYMBOLS)
+                    action = rng.random()
+                    if action < 0.4:
+                        if account.buy_shares(symbol, rng.randint(1, 20)):
+                            marks[symbol] = feed.prices[symbol]
+                    elif action < 0.7:
+                        held = account.portfolio.get(symbol, 0)
+                        if held and account.sell_shares(symbol, rng.randint(1, held)):
+                            marks[symbol] = feed.prices[symbol]
+                    elif action < 0.8:
+                        orders = [(rng.choice(['BUY', 'SELL']), rng.choice(self.SYMBOLS), rng.randint(1, 5))
+                                  for _ in range(rng.randint(1, 10))]
+                        executed = account.execute_batch(orders, atomic=False)['executed']
+                        marks.update({orders[i][1]: feed.prices[orders[i][1]] for i in executed})
+                    else:
+                        feed.prices[symbol] = rng.uniform(1, 500)
+                        account.update_price(symbol, feed.prices[symbol])
+                        marks[symbol] = feed.prices[symbol]
+                    self.check(account, marks)
+
+    def test_live_prices_mark_holdings_on_valuation(self):
+        """Test live valuations mark holdings to the provider's current prices"""
+        feed = accounts.DictPriceProvider({'AAPL': 100.0})
+        account = Account("test_user", price_provider=feed)
+        account.deposit_funds(1000.0)
+        account.buy_shares('AAPL', 5)
+        feed.prices['AAPL'] = 120.0
+        self.assertEqual(account.calculate_portfolio_value(), 600.0)
+        self.assertEqual(account.unrealized_pl, 100.0)
+
+    def test_static_prices_use_last_known_price(self):
+        """Test valuations without live prices only move on trades and ticks"""
+        feed = accounts.DictPriceProvider({'AAPL': 100.0})
+        account = Account("test_user", price_provider=feed, live_prices=False)
+        account.deposit_funds(1000.0)
+        account.buy_shares('AAPL', 5)
+        feed.prices['AAPL'] = 120.0
+        self.assertEqual(account.calculate_portfolio_value(), 500.0)
+        account.update_price('AAPL', 110.0)
+        report = account.get_profit_loss_report()
+        self.assertEqual(report['portfolio_value'], 550.0)
+        self.assertEqual(report['holdings']['AAPL']['price'], 110.0)
+        self.assertEqual(report['unrealized_profit_loss'], 50.0)
+
+    def test_selling_everything_clears_aggregates(self):
+        """Test realized P&L is kept and the position aggregates reset once nothing is held"""
+        feed = accounts.DictPriceProvider({'AAPL': 100.0})
+        account = Account("test_user", price_provider=feed)
+        account.deposit_funds(1000.0)
+        account.buy_shares('AAPL', 3)
+        feed.prices['AAPL'] = 110.0
+        account.sell_shares('AAPL', 3)
+        self.assertEqual((account.market_value, account.cost_basis), (0.0, 0.0))
+        self.assertEqual(account.realized_pl, 30.0)
+
+class TestAccountManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = accounts.AccountManager(shards=4)
+
+    def test_open_account_is_idempotent(self):
+        """Test opening an account twice returns the same account"""
+        account = self.manager.open_account("alice")
+        self.assertIs(self.manager.open_account("alice"), account)
+        self.assertIs(self.manager.get("alice"), account)
+        self.assertIsNone(self.manager.get("bob"))
+        self.assertIn("alice", self.manager)
+        self.assertEqual(len(self.manager), 1)
+
+    def test_close_account(self):
+        """Test a closed account is removed from the registry"""
+        self.manager.open_account("alice")
+        self.assertTrue(self.manager.close_account("alice"))
+        self.assertFalse(self.manager.close_account("alice"))
+        self.assertEqual(self.manager.user_ids(), [])
+
+    def test_execute_calls_account_method(self):
+        """Test execute runs an Account method for the user"""
+        self.assertTrue(self.manager.execute("alice", "deposit_funds", 1000.0))
+        self.assertTrue(self.manager.execute("alice", "buy_shares", "AAPL", 2))
+        self.assertEqual(self.manager.get("alice").portfolio, {'AAPL': 2})
+
+    def test_concurrent_trades_are_serialized(self):
+        """Test concurrent trades on shared accounts keep balances and holdings consistent"""
+        users = [f"user{i}" for i in range(8)]
+        for user in users:
+            self.manager.execute(user, "deposit_funds", 10000.0)
+
+        def trade(seed):
+            rng = random.Random(seed)
+            for _ in range(300):
+                user = rng.choice(users)
+                with self.manager.locked(user) as account:
+                    if rng.random() < 0.6:
+                        account.buy_shares('AAPL', 1)
+                    else:
+                        account.sell_shares('AAPL', 1)
+
+        threads = [threading.Thread(target=trade, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for user in users:
+            account = self.manager.get(user)
+            bought = sum(tx['quantity'] for tx in account.transactions if tx['type'] == 'BUY')
+            sold = sum(tx['quantity'] for tx in account.transactions if tx['type'] == 'SELL')
+            self.assertEqual(account.portfolio.get('AAPL', 0), bought - sold)
+            self.assertEqual(account.balance, 10000.0 - (bought - sold) * 150.0)
+            self.assertEqual(account.balance, account.transactions[-1]['balance_after'])
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def open_manager(self, **kwargs):
+        log = journal.Journal(self.directory.name, flush_interval=0, **kwargs)
+        self.addCleanup(log.close)
+        return accounts.AccountManager(journal=log), log
+
+    def trade(self, manager):
+        manager.execute("alice", "deposit_funds", 10000.0)
+        manager.execute("alice", "buy_shares", "AAPL", 10)
+        manager.execute("alice", "sell_shares", "AAPL", 4)
+        manager.execute("bob", "deposit_funds", 500.0)
+        manager.execute("bob", "execute_batch", [('BUY', 'AAPL', 1), ('BUY', 'AAPL', 2)])
+
+    def assertSameAccount(self, recovered, original):
+        self.assertEqual(recovered.balance, original.balance)
+        self.assertEqual(recovered.initial_deposit, original.initial_deposit)
+        self.assertEqual(recovered.portfolio, original.portfolio)
+        self.assertEqual(list(recovered.transactions), list(original.transactions))
+        self.assertEqual((recovered.market_value, recovered.cost_basis, recovered.realized_pl),
+                         (original.market_value, original.cost_basis, original.realized_pl))
+
+    def test_recover_from_log(self):
+        """Test accounts are rebuilt by replaying the log"""
+        manager, log = self.open_manager()
+        self.trade(manager)
+        log.close()
+        recovered, _ = self.open_manager()
+        self.assertEqual(sorted(recovered.user_ids()), ["alice", "bob"])
+        for user in ("alice", "bob"):
+            self.assertSameAccount(recovered.get(user), manager.get(user))
+
+    def test_recover_from_snapshot_and_tail(self):
+        """Test recovery loads the snapshot and replays only later events"""
+        manager, log = self.open_manager()
+        self.trade(manager)
+        manager.checkpoint()
+        manager.execute("alice", "withdraw_funds", 100.0)
+        manager.execute("carol", "deposit_funds", 50.0)
+        log.close()
+        self.assertEqual(len(log._segments()), 1)
+        recovered, recovered_log = self.open_manager()
+        for user in ("alice", "bob", "carol"):
+            self.assertSameAccount(recovered.get(user), manager.get(user))
+        recovered.execute("alice", "deposit_funds", 1.0)
+        recovered_log.close()
+        again, _ = self.open_manager()
+        self.assertEqual(again.get("alice").balance, manager.get("alice").balance + 1.0)
+
+    def test_reset_and_close_are_replayed(self):
+        """Test create_account and close_account survive recovery"""
+        manager, log = self.open_manager()
+        self.trade(manager)
+        manager.execute("alice", "create_account")
+        manager.close_account("bob")
+        log.close()
+        recovered, _ = self.open_manager()
+        self.assertEqual(recovered.user_ids(), ["alice"])
+        self.assertEqual(recovered.get("alice").balance, 0.0)
+        self.assertEqual(len(recovered.get("alice").transactions), 0)
+
+    def test_assignment_rejected_on_journaled_account(self):
+        """Test holdings or history can't be assigned where the journal couldn't replay them"""
+        manager, log = self.open_manager()
+        self.trade(manager)
+        alice = manager.get("alice")
+        portfolio, rows = dict(alice.portfolio), len(alice.transactions)
+        with self.assertRaisesRegex(ValueError, "journaled"):
+            alice.portfolio = {'TSLA': 5}
+        with self.assertRaisesRegex(ValueError, "journaled"):
+            alice.transactions = []
+        self.assertEqual((alice.portfolio, len(alice.transactions)), (portfolio, rows))
+
+    def test_assigned_portfolio_survives_snapshot(self):
+        """Test holdings assigned before journaling are kept by a snapshot"""
+        manager, log = self.open_manager()
+        dave = manager.open_account("dave")
+        dave.journal = None
+        dave.portfolio = {'AAPL': 3}
+        log.attach(dave)
+        manager.checkpoint()
+        log.close()
+        recovered, _ = self.open_manager()
+        self.assertSameAccount(recovered.get("dave"), dave)
+
+    def test_torn_tail_is_truncated(self):
+        """Test a partially written last record is dropped on recovery"""
+        manager, log = self.open_manager()
+        self.trade(manager)
+        log.close()
+        segment = log._segments()[-1]
+        with open(segment, 'ab') as f:
+            f.write(b'\x40\x00\x00\x00garbage')
+        size = os.path.getsize(segment)
+        recovered, _ = self.open_manager()
+        self.assertSameAccount(recovered.get("alice"), manager.get("alice"))
+        self.assertEqual(os.path.getsize(segment), size - 11)
+
+    def test_group_commit(self):
+        """Test events are committed in groups of group_size"""
+        manager, log = self.open_manager(group_size=4, sync=False)
+        for _ in range(10):
+            manager.execute("alice", "deposit_funds", 1.0)
+        self.assertEqual((log.stats['events'], log.stats['commits']), (8, 2))
+        log.flush()
+        self.assertEqual((log.stats['events'], log.stats['commits']), (10, 3))
+
+class TestLotBook(unittest.TestCase):
+    def naive_sell(self, method, lots, quantity):
+        """Reference matching over a plain list of [quantity, price] lots in buy order"""
+        sold_cost = 0.0
+        while quantity:
+            if method == 'fifo':
+                index = 0
+            elif method == 'lifo':
+                index = len(lots) - 1
+            else:
+                index = max(range(len(lots)), key=lambda i: (lots[i][1], -i))
+            taken = min(quantity, lots[index][0])
+            sold_cost += taken * lots[index][1]
+            lots[index][0] -= taken
+            quantity -= taken
+            if not lots[index][0]:
+                del lots[index]
+        return sold_cost
+
+    def test_matching_matches_reference(self):
+        """Test FIFO, LIFO and HIFO matching agree with a naive implementation"""
+        for method in ('fifo', 'lifo', 'hifo'):
+            for seed in range(10):
+                with self.subTest(method=method, seed=seed):
+                    rng = random.Random(seed)
+                    book = accounts.LotBook(method)
+                    reference = []
+                    realized = 0.0
+                    for _ in range(200):
+                        price = float(rng.randint(1, 20))
+                        held = sum(lot[0] for lot in reference)
+                        if held and rng.random() < 0.4:
+                            quantity = rng.randint(1, held)
+                            sold_cost = self.naive_sell(method, reference, quantity)
+                            self.assertAlmostEqual(book.sell('AAPL', quantity, price), sold_cost)
+                            realized += quantity * price - sold_cost
+                        else:
+                            quantity = rng.randint(1, 10)
+                            book.buy('AAPL', quantity, price)
+                            reference.append([quantity, price])
+                        self.assertEqual(book.lots('AAPL'), [tuple(lot) for lot in reference])
+                    self.assertAlmostEqual(book.realized.get('AAPL', 0.0), realized)
+
+    def test_cost_methods_realize_different_profit(self):
+        """Test the cost method decides which lots a sell realizes against"""
+        results = {}
+        for method in accounts.COST_METHODS:
+            feed = accounts.DictPriceProvider({'AAPL': 100.0})
+            account = Account("test_user", price_provider=feed, cost_method=method)
+            account.deposit_funds(10000.0)
+            for price in (100.0, 120.0, 110.0):
+                feed.prices['AAPL'] = price
+                account.buy_shares('AAPL', 10)
+            feed.prices['AAPL'] = 130.0
+            account.sell_shares('AAPL', 10)
+            results[method] = account.realized_pl
+            self.assertEqual(account.cost_basis, 3300.0 - (1300.0 - results[method]))
+        self.assertEqual(results, {'average': 200.0, 'fifo': 300.0, 'lifo': 200.0, 'hifo': 100.0})
+
+    def test_symbol_profit_loss(self):
+        """Test realized and unrealized profit/loss are reported per symbol"""
+        feed = accounts.DictPriceProvider({'AAPL': 100.0, 'TSLA': 200.0})
+        account = Account("test_user", price_provider=feed, cost_method='fifo')
+        account.deposit_funds(10000.0)
+        account.buy_shares('AAPL', 10)
+        account.buy_shares('TSLA', 5)
+        feed.prices.update({'AAPL': 110.0, 'TSLA': 190.0})
+        account.sell_shares('TSLA', 5)
+        report = account.get_symbol_profit_loss()
+        self.assertEqual(report['AAPL']['unrealized'], 100.0)
+        self.assertEqual(report['AAPL']['realized'], 0.0)
+        self.assertEqual(report['TSLA']['realized'], -50.0)
+        self.assertEqual(report['TSLA']['quantity'], 0)
+        self.assertEqual(account.get_profit_loss_report()['by_symbol'], report)
+
+    def test_unknown_cost_method(self):
+        """Test an unknown cost method is rejected"""
+        with self.assertRaises(ValueError):
+            Account("test_user", cost_method='random')
+
+    def test_lots_survive_snapshot(self):
+        """Test open lots are restored from a journal snapshot"""
+        with tempfile.TemporaryDirectory() as directory:
+            log = journal.Journal(directory, flush_interval=0)
+            manager = accounts.AccountManager(journal=log, cost_method='hifo')
+            manager.execute("alice", "deposit_funds", 10000.0)
+            manager.execute("alice", "buy_shares", "AAPL", 3)
+            with patch('accounts.get_share_price', return_value=160.0):
+                manager.execute("alice", "buy_shares", "AAPL", 2)
+            manager.execute("alice", "sell_shares", "AAPL", 1)
+            manager.checkpoint()
+            log.close()
+            recovered = accounts.AccountManager(journal=journal.Journal(directory, flush_interval=0))
+            original, restored = manager.get("alice"), recovered.get("alice")
+            self.assertEqual(restored.cost_method, 'hifo')
+            self.assertEqual(restored.lots.lots('AAPL'), [(3, 150.0), (1, 160.0)])
+            self.assertEqual(restored.get_symbol_profit_loss(), original.get_symbol_profit_loss())
+            recovered.journal.close()
+
+class TestTransactionPages(unittest.TestCase):
+    def setUp(self):
+        self.account = Account("test_user")
+        with patch('accounts.time.time_ns', side_effect=[s * 1_000_000_000 for s in range(1, 100)]):
+            self.account.deposit_funds(100000.0)
+            for i in range(20):
+                self.account.buy_shares(['AAPL', 'TSLA'][i % 2], 1)
+            self.account.sell_shares('AAPL', 3)
+            self.account.withdraw_funds(10.0)
+
+    def pages(self, **filters):
+        pages, cursor = [], None
+        while True:
+            page = self.account.get_transactions_page(cursor=cursor, **filters)
+            pages.append(page['transactions'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_history_newest_first(self):
+        """Test cursor pages walk the whole history from the newest transaction"""
+        pages = self.pages(limit=7)
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 2])
+        self.assertEqual([tx for page in pages for tx in page], list(reversed(self.account.transactions)))
+
+    def test_pages_oldest_first(self):
+        """Test pages can run from the oldest transaction"""
+        pages = self.pages(limit=10, newest_first=False)
+        self.assertEqual([tx for page in pages for tx in page], list(self.account.transactions))
+
+    def test_filtered_pages(self):
+        """Test pages only contain transactions matching the filters"""
+        pages = self.pages(limit=4, type_='BUY', symbol='AAPL')
+        transactions = [tx for page in pages for tx in page]
+        self.assertEqual(len(transactions), 10)
+        self.assertTrue(all(tx['type'] == 'BUY' and tx['symbol'] == 'AAPL' for tx in transactions))
+        self.assertEqual(self.account.get_transactions_page(type_='SELL', symbol='MSFT'),
+                         {'transactions': [], 'next_cursor': None})
+
+    def test_iter_transactions_time_range(self):
+        """Test streaming transactions within a time range"""
+        transactions = list(self.account.iter_transactions(symbol='TSLA', start=5, end=10))
+        self.assertEqual([tx['timestamp'] for tx in transactions],
+                         [datetime.fromtimestamp(s) for s in (5, 7, 9)])
+        newest = next(self.account.iter_transactions(newest_first=True))
+        self.assertEqual(newest['type'], 'WITHDRAWAL')
+
+    def test_page_limit_must_be_positive(self):
+        """Test a page needs room for at least one transaction"""
+        with self.assertRaises(ValueError):
+            self.account.get_transactions_page(limit=0)
+
+def buy_first_bar(bar, account, state, quantity=1):
+    """Strategy for the backtest tests: buy once, on the first bar"""
+    if state:
+        return []
+    state['bought'] = True
+    return [('BUY', bar.symbol, quantity)]
+
+class TestBacktest(unittest.TestCase):
+    def bars(self, closes, symbol='AAPL'):
+        return [backtest.Bar(60.0 * i, symbol, close, close, close, close) for i, close in enumerate(closes)]
+
+    def test_equity_curve_follows_closes(self):
+        """Test orders fill at the close and equity is recorded per bar time"""
+        result = backtest.run_backtest(self.bars([100.0, 110.0, 90.0, 120.0]), buy_first_bar, {'quantity': 10},
+                                       initial_cash=1000.0)
+        self.assertEqual(list(result.equity), [1000.0, 1100.0, 900.0, 1200.0])
+        self.assertEqual(list(result.timestamps), [0.0, 60.0, 120.0, 180.0])
+        self.assertEqual((result.bars, result.trades), (4, 1))
+        self.assertAlmostEqual(result.total_return, 0.2)
+        self.assertAlmostEqual(result.max_drawdown, 1 - 900.0 / 1100.0)
+
+    def test_trades_are_recorded_at_bar_time(self):
+        """Test backtest transactions carry the bar timestamps"""
+        bars = self.bars([100.0, 101.0])
+        recorded = {}
+
+        def strategy(bar, account, state):
+            recorded['account'] = account
+            return [('BUY', bar.symbol, 1)]
+
+        backtest.run_backtest(bars, strategy)
+        history = list(recorded['account'].transactions)
+        self.assertEqual([tx['timestamp'] for tx in history], [datetime.fromtimestamp(t) for t in (0, 0, 60)])
+
+    def test_read_csv_bars(self):
+        """Test bars are parsed from CSV with epoch or ISO timestamps"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write("timestamp,symbol,open,high,low,close\n60,AAPL,1,2,0.5,1.5\n"
+                    "2024-01-01T00:00:00,TSLA,3,4,2.5,3.5\n")
+        self.addCleanup(os.remove, f.name)
+        bars = list(backtest.read_bars(f.name))
+        self.assertEqual(bars[0], backtest.Bar(60.0, 'AAPL', 1.0, 2.0, 0.5, 1.5, 0.0))
+        self.assertEqual(bars[1].timestamp, datetime(2024, 1, 1).timestamp())
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "needs pyarrow")
+    def test_read_parquet_bars_round_trip(self):
+        """Test bars written to Parquet read back the same as from the CSV they came from"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bars.csv')
+            backtest.generate_bars(path, 500)
+            bars = list(backtest.read_bars(path))
+            table = pa.Table.from_pylist([bar._asdict() for bar in bars])
+            pq.write_table(table, os.path.join(directory, 'bars.parquet'), row_group_size=128)
+            self.assertEqual(list(backtest.read_parquet_bars(os.path.join(directory, 'bars.parquet'),
+                                                             batch_size=100)), bars)
+            self.assertEqual(list(backtest.read_bars(os.path.join(directory, 'bars.parquet'))), bars)
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "needs pyarrow")
+    def test_read_parquet_bars_with_datetimes(self):
+        """Test Parquet timestamp columns are read as epoch seconds and volume defaults to 0"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table({'timestamp': pa.array([datetime(2024, 1, 1), datetime(2024, 1, 2)], pa.timestamp('s')),
+                          'symbol': ['AAPL', 'TSLA'], 'open': [1.0, 3.0], 'high': [2.0, 4.0],
+                          'low': [0.5, 2.5], 'close': [1.5, 3.5]})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bars.parquet')
+            pq.write_table(table, path)
+            bars = list(backtest.read_bars(path))
+        self.assertEqual(bars, [backtest.Bar(datetime(2024, 1, 1).timestamp(), 'AAPL', 1.0, 2.0, 0.5, 1.5, 0.0),
+                                backtest.Bar(datetime(2024, 1, 2).timestamp(), 'TSLA', 3.0, 4.0, 2.5, 3.5, 0.0)])
+
+    def test_sweep_runs_every_parameter_set(self):
+        """Test a sweep backtests each combination from a generated file"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bars.csv')
+            backtest.generate_bars(path, 2000)
+            params = backtest.grid(fast=[5, 10], slow=[20])
+            results = backtest.sweep(path, backtest.moving_average_crossover, params, processes=1)
+            self.assertEqual([result.params for result in results], params)
+            self.assertTrue(all(result.bars == 2000 for result in results))
+            serial = backtest.run_backtest(backtest.read_bars(path), backtest.moving_average_crossover, params[0])
+            self.assertEqual(results[0].final_equity, serial.final_equity)
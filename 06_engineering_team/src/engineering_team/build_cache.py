@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from crewai import Task
+from crewai.tasks.output_format import OutputFormat
+from crewai.tasks.task_output import TaskOutput
+
+
+class BuildCache:
+    """
+    Make-style cache of task outputs.
+
+    A task's key hashes everything that goes into it: its description, expected output
+    and artifact, its agent's role, goal, backstory and model, the crew inputs, and
+    the outputs of the tasks it depends on. When the key matches the one recorded for
+    the last run and the task's artifact still exists, the file is reused as the
+    task's output instead of running the task. Since keys include upstream outputs, a
+    task reruns exactly when something it depends on has changed.
+
+    A task's artifact is its output_file, or for a task that writes its own file, the
+    path given for it in artifacts.
+    """
+
+    def __init__(self, path: str = "output/.build_cache.json", artifacts: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            path: Where the cache keys are kept between runs.
+            artifacts: Files written by tasks without an output_file, by task name.
+        """
+        self.path = path
+        self.artifacts = artifacts or {}
+        self.entries: Dict[str, Dict[str, str]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def key(self, task: Task, inputs: Dict[str, Any], depends_on: List[Task]) -> str:
+        agent = task.agent
+        llm = getattr(agent.llm, "model", agent.llm) if agent else None
+        parts = {
+            "description": task.description,
+            "expected_output": task.expected_output,
+            "output_file": self.artifact(task, inputs),
+            "agent": [agent.role, agent.goal, agent.backstory, str(llm)] if agent else None,
+            "inputs": inputs,
+            "context": [self._output(dependency, inputs) for dependency in depends_on],
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _output(self, task: Task, inputs: Dict[str, Any]) -> Optional[str]:
+        # the saved file, as that is what a cached run reads back
+        path = self.artifact(task, inputs)
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        return task.output.raw if task.output else None
+
+    def artifact(self, task: Task, inputs: Dict[str, Any]) -> Optional[str]:
+        """ The task's output_file with the inputs filled in, or the file it writes itself """
+        return task.output_file.format(**inputs) if task.output_file else self.artifacts.get(task.name)
+
+    def load(self, name: str, task: Task, key: str, inputs: Dict[str, Any]) -> Optional[TaskOutput]:
+        """ The cached output for the task, or None if it has to run """
+        path = self.artifact(task, inputs)
+        entry = self.entries.get(name)
+        if not path or not entry or entry["key"] != key or not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            raw = f.read()
+        return TaskOutput(name=task.name, description=task.description, expected_output=task.expected_output,
+                          raw=raw, agent=task.agent.role if task.agent else "", output_format=OutputFormat.RAW)
+
+    def store(self, name: str, task: Task, key: str, inputs: Dict[str, Any]) -> None:
+        if self.artifact(task, inputs):
+            self.entries[name] = {"key": key}
+            self.save()
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
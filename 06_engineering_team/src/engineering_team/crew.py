@@ -1,11 +1,18 @@
 from crewai import Agent, Crew, Process, Task
-from crewai.project import CrewBase, agent, crew, task
+from crewai.project import CrewBase, agent, before_kickoff, crew, task
+
+from engineering_team.build_cache import BuildCache
+from engineering_team.dag import DagRun, run_dag
+from engineering_team.validation import CodeValidator
 
 
 @CrewBase
 class EngineeringTeam:
     """EngineeringTeam crew"""
 
+    def __init__(self):
+        # checks the generated module and tests locally before the agents' Docker sandbox
+        self.validator = CodeValidator()
 
     @agent
     def engineering_lead(self) -> Agent:
@@ -42,7 +49,7 @@ class EngineeringTeam:
 
     @task
     def code_task(self) -> Task:
-        return Task(config=self.tasks_config['code_task'], verbose=True)
+        return Task(config=self.tasks_config['code_task'], verbose=True, guardrail=self.validator.check_module)
 
     @task
     def frontend_task(self) -> Task:
@@ -50,7 +57,12 @@ class EngineeringTeam:
 
     @task
     def test_task(self) -> Task:
-        return Task(config=self.tasks_config['test_task'], verbose=True)
+        return Task(config=self.tasks_config['test_task'], verbose=True, guardrail=self.validator.check_tests)
+
+    @before_kickoff
+    def prepare_validation(self, inputs):
+        self.validator.prepare(inputs['module_name'])
+        return inputs
 
 
     @crew
@@ -62,4 +74,21 @@ class EngineeringTeam:
             verbose=True
         )
 
+    def kickoff_dag(self, inputs: dict, rebuild: bool = False) -> DagRun:
+        """
+        Runs the tasks as a dependency graph built from their context, so tasks that only
+        need the same earlier output (frontend_task and test_task) run at the same time.
+        Tasks whose inputs haven't changed since the last run reuse their files in output/,
+        unless rebuild is set.
+        """
+        self.validator.prepare(inputs['module_name'])
+        # the validator writes the module and its tests itself, stripped of markdown fences
+        cache = BuildCache(artifacts={'code_task': self.validator.module_path, 'test_task': self.validator.test_path})
+        if rebuild:
+            cache.entries.clear()
+        try:
+            return run_dag(self.crew().tasks, inputs=inputs, cache=cache)
+        finally:
+            self.validator.close()
+
 
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from crewai import Crew, Process, Task
+from crewai.tasks.task_output import TaskOutput
+
+from engineering_team.build_cache import BuildCache
+
+
+def dependencies(tasks: List[Task]) -> Dict[int, List[Task]]:
+    """
+    The tasks each task depends on, by id: its `context:` tasks, or every earlier task
+    when it has no context (which is what a sequential crew would give it). Raises
+    ValueError if a task's context names a task that isn't in tasks.
+    """
+    members = {id(task) for task in tasks}
+    for task in tasks:
+        context = task.context if isinstance(task.context, list) else []
+        outside = [_name(dependency) for dependency in context if id(dependency) not in members]
+        if outside:
+            raise ValueError(f"Task {_name(task)} has context outside the crew: {', '.join(outside)}")
+    return {id(task): task.context if isinstance(task.context, list) else tasks[:index]
+            for index, task in enumerate(tasks)}
+
+
+def task_levels(tasks: List[Task]) -> List[List[Task]]:
+    """
+    Groups tasks into levels: every task runs after all the tasks it depends on, and
+    tasks in the same level are independent of each other. Tasks keep their declared
+    order, and two tasks for the same agent never share a level, since an agent runs
+    one task at a time.
+    """
+    depends_on = dependencies(tasks)
+    remaining = list(tasks)
+    done: set = set()
+    levels = []
+    while remaining:
+        level, agents = [], set()
+        for task in remaining:
+            if id(task.agent) not in agents and all(id(dependency) in done for dependency in depends_on[id(task)]):
+                level.append(task)
+                agents.add(id(task.agent))
+        if not level:
+            names = ", ".join(_name(task) for task in remaining)
+            raise ValueError(f"Task context has a cycle: {names}")
+        levels.append(level)
+        done.update(id(task) for task in level)
+        remaining = [task for task in remaining if id(task) not in done]
+    return levels
+
+
+class DagRun:
+    """ Outputs and timings of a DAG run; raw is the last declared task's output """
+
+    def __init__(self, tasks: List[Task], outputs: Dict[str, TaskOutput], durations: Dict[str, float],
+                 levels: List[List[str]], wall_time: float, cached: Optional[List[str]] = None):
+        self.tasks = tasks
+        self.outputs = outputs
+        self.durations = durations
+        self.levels = levels
+        self.wall_time = wall_time
+        self.cached = cached or []
+
+    @property
+    def raw(self) -> str:
+        return self.outputs[_name(self.tasks[-1])].raw
+
+    @property
+    def sequential_time(self) -> float:
+        """ Wall time the same task durations would have taken one after another """
+        return sum(self.durations.values())
+
+    def report(self) -> str:
+        lines = []
+        for number, level in enumerate(self.levels, 1):
+            timings = ", ".join(f"{name} cached" if name in self.cached else f"{name} {self.durations[name]:.1f}s"
+                                for name in level)
+            lines.append(f"Level {number}: {timings}")
+        saved = self.sequential_time - self.wall_time
+        lines.append(f"Wall time {self.wall_time:.1f}s versus {self.sequential_time:.1f}s sequential "
+                     f"({saved:.1f}s saved, {saved / self.sequential_time:.0%})" if self.sequential_time else
+                     f"Wall time {self.wall_time:.1f}s")
+        if self.cached:
+            lines.append(f"Served from cache: {', '.join(self.cached)}")
+        return "\n".join(lines)
+
+
+def _name(task: Task) -> str:
+    return task.name or task.description[:40]
+
+
+async def _run_level(level: List[Task], inputs: Dict[str, Any], verbose: bool, durations: Dict[str, float],
+                     cache: Optional[BuildCache], cached: List[str]) -> None:
+    async def run(task: Task) -> None:
+        name = _name(task)
+        if cache is not None:
+            key = cache.key(task, inputs, task.context)
+            output = cache.load(name, task, key, inputs)
+            if output is not None:
+                task.output = output
+                durations[name] = 0.0
+                cached.append(name)
+                return
+        # a one-task crew per task; context outputs are read from the earlier levels' tasks
+        crew = Crew(agents=[task.agent], tasks=[task], process=Process.sequential, verbose=verbose)
+        start = time.perf_counter()
+        await crew.kickoff_async(inputs=inputs)
+        durations[name] = time.perf_counter() - start
+        if cache is not None:
+            cache.store(name, task, key, inputs)
+
+    await asyncio.gather(*(run(task) for task in level))
+
+
+def run_dag(tasks: List[Task], inputs: Optional[Dict[str, Any]] = None, verbose: bool = True,
+            cache: Optional[BuildCache] = None) -> DagRun:
+    """
+    Runs tasks level by level, with the tasks of a level running concurrently.
+
+    Each task writes its own file, so files are the same whatever order the tasks of
+    a level finish in. With a cache, a task whose inputs and upstream outputs are
+    unchanged since its last run reuses its file instead of running.
+    """
+    inputs = inputs or {}
+    for task, depends_on in zip(tasks, dependencies(tasks).values()):
+        # a one-task crew has no earlier tasks, so spell out the implicit context
+        task.context = depends_on
+    levels = task_levels(tasks)
+    durations: Dict[str, float] = {}
+    cached: List[str] = []
+    start = time.perf_counter()
+    for level in levels:
+        asyncio.run(_run_level(level, inputs, verbose, durations, cache, cached))
+    wall_time = time.perf_counter() - start
+    outputs = {_name(task): task.output for task in tasks}
+    return DagRun(tasks, outputs, durations, [[_name(task) for task in level] for level in levels], wall_time,
+                  cached)
@@ -29,9 +29,12 @@ def run():
         'class_name': class_name
     }
 
-    # Create and run the crew
-    result = EngineeringTeam().crew().kickoff(inputs=inputs)
+    # Create and run the crew, with independent tasks running in parallel
+    team = EngineeringTeam()
+    result = team.kickoff_dag(inputs=inputs)
     print(result.raw)
+    print(result.report())
+    print(team.validator.report())
 
 if __name__ == "__main__":
     run()
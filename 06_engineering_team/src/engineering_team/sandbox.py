@@ -0,0 +1,261 @@
+"""
+A pool of warm, resource-limited Python worker processes for checking generated code.
+
+Each worker is started once, with its CPU time, memory and open files capped, and
+with unittest already imported, then serves jobs over a pipe: importing a module or
+running its unit tests from a directory. Modules a job imports are dropped from the
+worker afterwards, so jobs don't see each other's code. A job that runs past its
+timeout, or crashes its worker, costs that worker, which is replaced.
+
+Workers get none of the parent's environment beyond SAFE_ENVIRONMENT, so API keys
+don't reach generated code, start in a scratch directory, and can only import the
+standard library. On Linux each worker drops its network access, where unprivileged
+user namespaces allow it. They are not containers: the code runs as the same user
+and can read whatever that user can read on the host.
+
+This module only uses the standard library, so it also runs as the worker itself:
+    python sandbox.py --worker
+"""
+
+import io
+import json
+import logging
+import os
+import queue
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any, Dict, Sequence
+
+try:
+    import resource
+except ImportError:  # not available on Windows; the wall-clock timeout still applies
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# the only environment variables passed on to the workers
+SAFE_ENVIRONMENT = ('PATH', 'LANG', 'LANGUAGE', 'LC_ALL', 'LC_CTYPE', 'TZ', 'SYSTEMROOT')
+
+DEFAULT_PRELOAD = ('unittest', 'decimal', 'datetime', 'json', 'collections', 'typing')
+
+
+class SandboxPool:
+    """
+    Warm worker processes that import or test generated modules.
+
+    Checking a module this way takes milliseconds, against seconds for starting a
+    Docker sandbox, so it is a cheap first pass before the agents' code execution.
+    """
+
+    def __init__(self, size: int = 2, timeout: float = 30.0, cpu_seconds: int = 30,
+                 memory_mb: int = 512, preload: Sequence[str] = DEFAULT_PRELOAD):
+        """
+        Args:
+            size: Number of worker processes.
+            timeout: Wall-clock seconds a job may take before its worker is killed.
+            cpu_seconds: CPU time limit of each worker process.
+            memory_mb: Address space limit of each worker process.
+            preload: Modules every worker imports when it starts.
+        """
+        self.size = size
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.preload = list(preload)
+        self.stats = {'jobs': 0, 'timeouts': 0, 'restarts': 0, 'seconds': 0.0}
+        self.network_isolated = True  # whether every worker so far dropped its network access
+        self._workdir = tempfile.mkdtemp(prefix='engineering-sandbox-')
+        self._lock = threading.Lock()
+        self._idle: "queue.Queue[subprocess.Popen]" = queue.Queue()
+        self._workers = []
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> subprocess.Popen:
+        env = {name: os.environ[name] for name in SAFE_ENVIRONMENT if name in os.environ}
+        env.update(HOME=self._workdir, TMPDIR=self._workdir, TEMP=self._workdir, TMP=self._workdir)
+        # -I ignores PYTHON* variables and the user's site-packages, -S the installed packages
+        command = [sys.executable, '-I', '-S', os.path.abspath(__file__), '--worker',
+                   '--cpu', str(self.cpu_seconds), '--memory', str(self.memory_mb),
+                   '--preload', ','.join(self.preload)]
+        worker = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                  stderr=subprocess.DEVNULL, bufsize=0, cwd=self._workdir, env=env)
+        # the worker says when it is ready, and whether it dropped its network access
+        ready = json.loads(worker.stdout.readline() or '{}')
+        with self._lock:
+            self._workers.append(worker)
+            if not ready.get('network_isolated', False) and self.network_isolated:
+                self.network_isolated = False
+                logger.warning("Sandbox worker could not drop network access; generated code can reach the network")
+        return worker
+
+    def _replace(self, worker: subprocess.Popen) -> subprocess.Popen:
+        _stop(worker)
+        with self._lock:
+            self._workers.remove(worker)
+            self.stats['restarts'] += 1
+        return self._spawn()
+
+    def run(self, action: str, directory: str, module: str) -> Dict[str, Any]:
+        """
+        Runs one job on an idle worker, waiting for one if all are busy.
+
+        Args:
+            action: 'import' to import the module, or 'test' to run its unit tests.
+            directory: Directory the module is imported from; also the job's working directory.
+            module: Module name, without .py.
+
+        Returns:
+            The worker's result: always 'ok', 'seconds' and, on failure, 'error';
+            test jobs add 'tests', 'failures', 'errors' and the runner 'output'.
+        """
+        worker = self._idle.get()
+        start = time.perf_counter()
+        try:
+            request = json.dumps({'action': action, 'directory': os.path.abspath(directory), 'module': module})
+            ready = True
+            try:
+                worker.stdin.write(request.encode() + b'\n')
+                ready = bool(select.select([worker.stdout], [], [], self.timeout)[0])
+                line = worker.stdout.readline() if ready else b''
+            except (BrokenPipeError, OSError):
+                line = b''
+            if line:
+                result = json.loads(line)
+            else:
+                # a worker that answers with end of file has died, e.g. at its CPU limit
+                timed_out = not ready
+                if timed_out:
+                    with self._lock:
+                        self.stats['timeouts'] += 1
+                worker = self._replace(worker)
+                result = {'ok': False, 'error': f"Timed out after {self.timeout:.0f}s" if timed_out else
+                          "The worker process died (resource limit exceeded or the code exited)"}
+        finally:
+            self._idle.put(worker)
+        result['seconds'] = time.perf_counter() - start
+        with self._lock:
+            self.stats['jobs'] += 1
+            self.stats['seconds'] += result['seconds']
+        return result
+
+    def check_import(self, directory: str, module: str) -> Dict[str, Any]:
+        return self.run('import', directory, module)
+
+    def run_tests(self, directory: str, module: str) -> Dict[str, Any]:
+        return self.run('test', directory, module)
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            _stop(worker)
+        shutil.rmtree(self._workdir, ignore_errors=True)
+
+    def __enter__(self) -> "SandboxPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _stop(worker: subprocess.Popen) -> None:
+    worker.kill()
+    worker.wait()
+    worker.stdin.close()
+    worker.stdout.close()
+
+
+# -- worker -------------------------------------------------------------------
+
+def _isolate_network() -> bool:
+    """ Moves this process into new user and network namespaces, which have no interfaces up """
+    if not hasattr(os, 'unshare'):
+        return False
+    try:
+        os.unshare(os.CLONE_NEWUSER | os.CLONE_NEWNET)
+        return True
+    except OSError:  # user namespaces disabled, or not permitted here
+        return False
+
+
+def _limit_resources(memory_mb: int) -> None:
+    if resource is None:
+        return
+    for limit, value in ((resource.RLIMIT_AS, memory_mb * 1024 * 1024), (resource.RLIMIT_NOFILE, 256)):
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass
+
+
+def _limit_cpu(cpu_seconds: int) -> None:
+    """ The CPU limit counts the worker's whole life, so each job gets cpu_seconds more """
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+    try:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _run_job(request: Dict[str, Any]) -> Dict[str, Any]:
+    import importlib
+    import unittest
+
+    directory, module = request['directory'], request['module']
+    modules_before = set(sys.modules)
+    path_before = list(sys.path)
+    cwd_before = os.getcwd()
+    output = io.StringIO()
+    try:
+        os.chdir(directory)
+        sys.path.insert(0, directory)
+        importlib.invalidate_caches()
+        with redirect_stdout(output), redirect_stderr(output):
+            if request['action'] == 'import':
+                importlib.import_module(module)
+                return {'ok': True}
+            suite = unittest.defaultTestLoader.loadTestsFromName(module)
+            result = unittest.TextTestRunner(stream=output, verbosity=1).run(suite)
+        return {'ok': result.wasSuccessful(), 'tests': result.testsRun, 'failures': len(result.failures),
+                'errors': len(result.errors), 'output': output.getvalue()[-4000:]}
+    except BaseException:
+        return {'ok': False, 'error': traceback.format_exc(limit=-3), 'output': output.getvalue()[-4000:]}
+    finally:
+        os.chdir(cwd_before)
+        sys.path[:] = path_before
+        for name in set(sys.modules) - modules_before:
+            del sys.modules[name]
+
+
+def _worker(cpu_seconds: int, memory_mb: int, preload: Sequence[str]) -> None:
+    # the protocol gets its own copy of stdout, so generated code that prints can't corrupt it
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    sys.stdout = open(os.devnull, 'w')
+    network_isolated = _isolate_network()
+    for name in preload:
+        __import__(name)
+    _limit_resources(memory_mb)
+    replies.write(json.dumps({'network_isolated': network_isolated}) + '\n')  # ready
+    replies.flush()
+    for line in sys.stdin:
+        _limit_cpu(cpu_seconds)
+        replies.write(json.dumps(_run_job(json.loads(line))) + '\n')
+        replies.flush()
+
+
+if __name__ == '__main__' and '--worker' in sys.argv:
+    arguments = dict(zip(sys.argv[2::2], sys.argv[3::2]))
+    _worker(int(arguments.get('--cpu', 30)), int(arguments.get('--memory', 512)),
+            [name for name in arguments.get('--preload', '').split(',') if name])
@@ -0,0 +1,194 @@
+import ast
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from crewai.tasks.task_output import TaskOutput
+from crewai.utilities.events import ToolUsageErrorEvent, ToolUsageFinishedEvent
+from crewai.utilities.events.base_event_listener import BaseEventListener
+
+from engineering_team.sandbox import SandboxPool
+
+CODE_INTERPRETER = "Code Interpreter"
+FENCE = re.compile(r"```[ \t]*(?:python|py)?[ \t]*\n(.*?)(?:\n[ \t]*```|\Z)", re.DOTALL | re.IGNORECASE)
+
+
+def strip_fences(text: str) -> str:
+    """
+    The Python code in an LLM answer: the largest ``` fenced block if there is one,
+    otherwise the whole text.
+    """
+    blocks = FENCE.findall(text)
+    code = max(blocks, key=len) if blocks else text
+    return code.strip() + "\n"
+
+
+def syntax_error(source: str, filename: str) -> Optional[str]:
+    try:
+        ast.parse(source, filename)
+    except SyntaxError as e:
+        return f"SyntaxError in {filename} line {e.lineno}: {e.msg}\n{(e.text or '').rstrip()}"
+    return None
+
+
+class SandboxTimer(BaseEventListener):
+    """ Time spent in the agents' code interpreter, which runs in a Docker sandbox in safe mode """
+
+    def __init__(self):
+        self.runs = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.by_agent: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        super().__init__()
+
+    def setup_listeners(self, crewai_event_bus):
+        @crewai_event_bus.on(ToolUsageFinishedEvent)
+        def on_finished(source, event: ToolUsageFinishedEvent):
+            if event.tool_name == CODE_INTERPRETER:
+                seconds = (event.finished_at - event.started_at).total_seconds()
+                with self._lock:
+                    self.runs += 1
+                    self.seconds += seconds
+                    agent = (event.agent_role or "").strip()[:40]
+                    self.by_agent[agent] = self.by_agent.get(agent, 0.0) + seconds
+
+        @crewai_event_bus.on(ToolUsageErrorEvent)
+        def on_error(source, event: ToolUsageErrorEvent):
+            if event.tool_name == CODE_INTERPRETER:
+                with self._lock:
+                    self.errors += 1
+
+
+class CodeValidator:
+    """
+    Guardrails that check generated code locally before it is accepted: markdown fences
+    are stripped, the module must parse and import, and the generated tests must load
+    and run without errors, in a warm SandboxPool. A failed check sends the task back
+    to its agent with the error as feedback, within milliseconds rather than after a
+    Docker sandbox round trip.
+
+    A passing check writes the stripped code to module_path or test_path itself. The
+    two tasks have no output_file, since crewAI would save the agent's answer as it
+    was, fences included, rather than the code the guardrail checked.
+
+    Failing assertions in the generated tests are reported but don't fail the check,
+    since they can be the module's fault rather than the tests'.
+    """
+
+    def __init__(self, output_dir: str = "output", pool_size: int = 2, timeout: float = 30.0):
+        self.output_dir = output_dir
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.module_name: Optional[str] = None
+        self.checks: List[Tuple[str, bool, float]] = []  # (check, passed, seconds)
+        self.sandbox = SandboxTimer()
+        self._pool: Optional[SandboxPool] = None
+        self._lock = threading.Lock()
+
+    def prepare(self, module_name: str) -> None:
+        """ Sets the module under test and warms the worker pool while earlier tasks run """
+        self.module_name = module_name
+        self.pool
+
+    @property
+    def pool(self) -> SandboxPool:
+        with self._lock:
+            if self._pool is None:
+                self._pool = SandboxPool(size=self.pool_size, timeout=self.timeout)
+            return self._pool
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
+    @property
+    def module_path(self) -> str:
+        return os.path.join(self.output_dir, self.module_name)
+
+    @property
+    def test_path(self) -> str:
+        return os.path.join(self.output_dir, f"test_{self.module_name}")
+
+    def _record(self, check: str, start: float, passed: bool) -> None:
+        self.checks.append((check, passed, time.perf_counter() - start))
+
+    def check_module(self, output: TaskOutput) -> Tuple[bool, Any]:
+        """ Guardrail for code_task: the module must parse and import """
+        start = time.perf_counter()
+        code = strip_fences(output.raw)
+        error = syntax_error(code, self.module_name)
+        if error is None:
+            with tempfile.TemporaryDirectory() as directory:
+                with open(os.path.join(directory, self.module_name), "w") as f:
+                    f.write(code)
+                result = self.pool.check_import(directory, _module(self.module_name))
+            if not result["ok"]:
+                error = f"Importing {self.module_name} failed:\n{result['error']}"
+        self._record("module", start, error is None)
+        if error:
+            return False, f"{error}\nReturn the complete corrected module as raw Python code."
+        _write(self.module_path, code)
+        return True, code
+
+    def check_tests(self, output: TaskOutput) -> Tuple[bool, Any]:
+        """ Guardrail for test_task: the tests must parse, import the module and run without errors """
+        start = time.perf_counter()
+        test_name = f"test_{self.module_name}"
+        code = strip_fences(output.raw)
+        error = syntax_error(code, test_name)
+        if error is None:
+            with tempfile.TemporaryDirectory() as directory:
+                with open(os.path.join(directory, test_name), "w") as f:
+                    f.write(code)
+                # the module and anything next to it that the tests may import
+                for name in os.listdir(self.output_dir) if os.path.isdir(self.output_dir) else []:
+                    if name.endswith(".py") and name != test_name:
+                        shutil.copy(os.path.join(self.output_dir, name), directory)
+                result = self.pool.run_tests(directory, _module(test_name))
+            if "error" in result:
+                error = f"Loading {test_name} failed:\n{result['error']}"
+            elif result["errors"] or not result["tests"]:
+                error = (f"{test_name} ran {result['tests']} tests with {result['errors']} errors:\n"
+                         f"{result['output']}")
+        self._record("tests", start, error is None)
+        if error:
+            return False, f"{error}\nReturn the complete corrected test module as raw Python code."
+        _write(self.test_path, code)
+        return True, code
+
+    def report(self) -> str:
+        lines = []
+        for check in ("module", "tests"):
+            runs = [(passed, seconds) for name, passed, seconds in self.checks if name == check]
+            if runs:
+                failed = sum(1 for passed, _ in runs if not passed)
+                average = sum(seconds for _, seconds in runs) / len(runs)
+                lines.append(f"Pre-validation of {check}: {len(runs)} checks, {failed} failures caught, "
+                             f"{average * 1000:.0f}ms per check")
+        sandbox = self.sandbox
+        lines.append(f"Code interpreter sandbox: {sandbox.runs} runs, {sandbox.errors} errors, "
+                     f"{sandbox.seconds:.1f}s in total")
+        for agent, seconds in sorted(sandbox.by_agent.items()):
+            lines.append(f"  {agent}: {seconds:.1f}s")
+        return "\n".join(lines)
+
+
+def _write(path: str, text: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _module(filename: str) -> str:
+    return filename[:-3] if filename.endswith(".py") else filename
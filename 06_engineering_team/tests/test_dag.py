@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from crewai import Agent, Task
+
+from engineering_team.dag import dependencies, run_dag, task_levels
+
+
+def agent(role):
+    return Agent(role=role, goal="Build the module", backstory="An engineer", llm="gpt-4o-mini")
+
+
+def task(name, owner, context=None):
+    kwargs = {} if context is None else {"context": context}
+    return Task(name=name, description=f"Do the {name}", expected_output="Done", agent=owner, **kwargs)
+
+
+class TestTaskLevels(unittest.TestCase):
+    def setUp(self):
+        self.lead, self.backend, self.frontend, self.tester = (
+            agent(role) for role in ("lead", "backend", "frontend", "tester"))
+
+    def test_engineering_team_levels(self):
+        """Test the frontend and the tests are written together once the module is"""
+        design = task("design", self.lead)
+        code = task("code", self.backend, [design])
+        frontend = task("frontend", self.frontend, [code])
+        tests = task("tests", self.tester, [code])
+        levels = task_levels([design, code, frontend, tests])
+        self.assertEqual(levels, [[design], [code], [frontend, tests]])
+
+    def test_task_without_context_depends_on_earlier_tasks(self):
+        """Test a task with no context runs after every earlier task, as in a sequential crew"""
+        first, second = task("first", self.lead), task("second", self.backend, [])
+        third = task("third", self.frontend)
+        self.assertEqual(dependencies([first, second, third])[id(third)], [first, second])
+        self.assertEqual(task_levels([first, second, third]), [[first, second], [third]])
+
+    def test_same_agent_never_shares_a_level(self):
+        """Test two independent tasks for one agent run one after the other"""
+        first, second = task("first", self.backend, []), task("second", self.backend, [])
+        self.assertEqual(task_levels([first, second]), [[first], [second]])
+
+    def test_rejects_context_outside_the_crew(self):
+        """Test a context task that isn't part of the run is rejected before anything runs"""
+        stray = task("stray", self.lead)
+        code = task("code", self.backend, [stray])
+        with self.assertRaisesRegex(ValueError, "code has context outside the crew: stray"):
+            dependencies([code])
+        with self.assertRaisesRegex(ValueError, "outside the crew"):
+            run_dag([code], verbose=False)
+        self.assertEqual(code.context, [stray])
+
+    def test_rejects_cycles(self):
+        """Test tasks whose contexts form a cycle are rejected"""
+        first = task("first", self.lead, [])
+        second = task("second", self.backend, [first])
+        first.context = [second]
+        with self.assertRaisesRegex(ValueError, "cycle"):
+            task_levels([first, second])
+
+
+if __name__ == '__main__':
+    unittest.main()
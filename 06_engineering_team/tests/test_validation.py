@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+import yaml
+from crewai import Agent, Task
+from crewai.llms.base_llm import BaseLLM
+
+from engineering_team import crew
+from engineering_team.build_cache import BuildCache
+from engineering_team.dag import run_dag
+from engineering_team.validation import CodeValidator
+
+MODULE = '''Here is the module:
+
+```python
+class Account:
+    def __init__(self, balance=0.0):
+        self.balance = balance
+```
+'''
+
+TESTS = '''```python
+import unittest
+from accounts import Account
+
+
+class TestAccount(unittest.TestCase):
+    def test_balance(self):
+        self.assertEqual(Account(5.0).balance, 5.0)
+```'''
+
+
+class StubLLM(BaseLLM):
+    """Stands in for a model, answering every call with a fixed final answer"""
+
+    def __init__(self, answer):
+        super().__init__(model="stub")
+        self.answer = answer
+        self.calls = 0
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        self.calls += 1
+        return f"Thought: I now know the final answer\nFinal Answer: {self.answer}"
+
+    def supports_function_calling(self):
+        return False
+
+    def get_context_window_size(self):
+        return 128000
+
+
+class TestFencedOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.validator = CodeValidator(output_dir=os.path.join(self.tmp.name, "output"), pool_size=1)
+        self.addCleanup(self.validator.close)
+        self.validator.prepare("accounts.py")
+        with open(os.path.join(os.path.dirname(crew.__file__), "config", "tasks.yaml")) as f:
+            self.config = yaml.safe_load(f)
+        self.inputs = {"requirements": "An account with a balance", "module_name": "accounts.py"}
+
+    def tasks(self):
+        self.coder, self.tester = StubLLM(MODULE), StubLLM(TESTS)
+        code_task = self.task("code_task", self.coder, self.validator.check_module, [])
+        test_task = self.task("test_task", self.tester, self.validator.check_tests, [code_task])
+        return [code_task, test_task]
+
+    def task(self, name, llm, guardrail, context):
+        config = {key: value for key, value in self.config[name].items() if key not in ("agent", "context")}
+        agent = Agent(role=name, goal="Write code", backstory="An engineer", llm=llm)
+        return Task(name=name, agent=agent, guardrail=guardrail, context=context, **config)
+
+    def cache(self):
+        return BuildCache(os.path.join(self.tmp.name, "output", ".build_cache.json"),
+                          artifacts={"code_task": self.validator.module_path, "test_task": self.validator.test_path})
+
+    def read(self, path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_files_on_disk_have_no_fences(self):
+        """Test fenced agent answers are saved as the plain code the guardrails checked"""
+        run = run_dag(self.tasks(), inputs=self.inputs, verbose=False, cache=self.cache())
+        module, tests = self.read(self.validator.module_path), self.read(self.validator.test_path)
+        self.assertNotIn("```", module)
+        self.assertNotIn("```", tests)
+        self.assertTrue(module.startswith("class Account:"))
+        self.assertEqual(run.outputs["test_task"].raw, tests)
+        self.assertEqual([passed for _, passed, _ in self.validator.checks], [True, True])
+
+    def test_cached_run_reads_the_stripped_files(self):
+        """Test a second run reuses the stripped files instead of calling the agents"""
+        run_dag(self.tasks(), inputs=self.inputs, verbose=False, cache=self.cache())
+        run = run_dag(self.tasks(), inputs=self.inputs, verbose=False, cache=self.cache())
+        self.assertEqual(run.cached, ["code_task", "test_task"])
+        self.assertEqual(self.coder.calls + self.tester.calls, 0)
+        self.assertNotIn("```", run.outputs["code_task"].raw)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import asyncio
+import importlib.util
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs
+
+from agent_common import push_dispatcher
+
+DEPENDENCIES = ("langchain", "langchain_community", "langchain_experimental", "playwright")
+MISSING = [name for name in DEPENDENCIES if importlib.util.find_spec(name) is None]
+
+
+class PushoverStub(ThreadingHTTPServer):
+    """A local stand-in for the Pushover API that records the messages posted to it"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.messages = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/1/messages.json"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        self.server.messages.append(parse_qs(body)["message"][0])
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'{"status": 1}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@unittest.skipIf(MISSING, f"needs {', '.join(MISSING)}")
+class TestPushTool(unittest.TestCase):
+    def setUp(self):
+        # The Serper wrapper wants a key at import; no search is made here
+        with patch.dict(os.environ, {"SERPER_API_KEY": os.environ.get("SERPER_API_KEY", "test")}):
+            import sidekick_tools
+        self.sidekick_tools = sidekick_tools
+        self.stub = PushoverStub()
+        self.addCleanup(self.stub.stop)
+        dispatcher = push_dispatcher.PushDispatcher(url=self.stub.url, user="user", token="token",
+                                                    coalesce_window=0.05)
+        patcher = patch.object(push_dispatcher, "_dispatcher", dispatcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dispatcher = dispatcher
+
+    def test_push_goes_through_shared_dispatcher(self):
+        """Test the sidekick's push tool queues on the shared dispatcher instead of posting inline"""
+        tools = asyncio.run(self.sidekick_tools.other_tools())
+        push_tool = next(tool for tool in tools if tool.name == "send_push_notification")
+        self.assertEqual(push_tool.run("Research done"), "queued")
+        self.assertTrue(self.dispatcher.flush(5))
+        self.assertEqual(self.stub.messages, ["Research done"])
+        self.assertEqual(self.dispatcher.stats["sent"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
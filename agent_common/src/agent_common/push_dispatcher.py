@@ -0,0 +1,131 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PUSHOVER_URL = "https://api.pushover.net/1/messages.json"
+
+# Pushover caps a message at 1024 characters
+MAX_MESSAGE_LENGTH = 1024
+
+
+class PushDispatcher:
+    """
+    Sends push notifications from a background thread so callers never wait on the network.
+
+    Messages are posted over a pooled session with timeouts and retried with exponential
+    backoff. Messages that arrive within coalesce_window of each other are sent as one digest.
+    """
+
+    def __init__(self, url: str = PUSHOVER_URL, user: Optional[str] = None, token: Optional[str] = None,
+                 timeout: float = 5.0, max_retries: int = 3, backoff: float = 0.5,
+                 coalesce_window: float = 1.0, max_batch: int = 10):
+        self.url = url
+        self.user = user if user is not None else os.getenv("PUSHOVER_USER")
+        self.token = token if token is not None else os.getenv("PUSHOVER_TOKEN")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.coalesce_window = coalesce_window
+        self.max_batch = max_batch
+        self.stats: Dict[str, int] = {"queued": 0, "sent": 0, "digests": 0, "retries": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="push-dispatcher", daemon=True)
+        self._worker.start()
+
+    def _count(self, stat: str) -> None:
+        # updated from both the callers' threads and the worker
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def enqueue(self, message: str) -> None:
+        """ Queues a message and returns immediately """
+        self._count("queued")
+        self._queue.put(message)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """ Waits until every queued message has been delivered or given up on """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.coalesce_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._send(self._digest(batch))
+                if len(batch) > 1:
+                    self._count("digests")
+            except Exception as e:
+                # the worker must outlive any one message, or flush() would wait on it forever
+                print(f"Push failed: {type(e).__name__}: {e}")
+                self._count("failed")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _digest(batch: List[str]) -> str:
+        if len(batch) == 1:
+            return batch[0][:MAX_MESSAGE_LENGTH]
+        digest = f"{len(batch)} updates:\n" + "\n".join(f"- {message}" for message in batch)
+        return digest[:MAX_MESSAGE_LENGTH]
+
+    def _send(self, message: str) -> bool:
+        payload = {"user": self.user, "token": self.token, "message": message}
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * 2 ** attempt
+            try:
+                response = self._session.post(self.url, data=payload, timeout=self.timeout)
+                if response.status_code < 400:
+                    self._count("sent")
+                    return True
+                # client errors other than rate limiting won't succeed on a retry
+                if response.status_code < 500 and response.status_code != 429:
+                    print(f"Push failed with status {response.status_code}: {response.text[:200]}")
+                    break
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+            except requests.RequestException as e:
+                print(f"Push attempt {attempt + 1} failed: {e}")
+            if attempt < self.max_retries:
+                self._count("retries")
+                time.sleep(delay)
+        self._count("failed")
+        return False
+
+
+_dispatcher: Optional[PushDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> PushDispatcher:
+    """ The process-wide dispatcher, created on first use and flushed at exit """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = PushDispatcher()
+            atexit.register(_dispatcher.flush, 30)
+        return _dispatcher
@@ -0,0 +1,203 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# One store for every crew on this machine, so a search made by one project serves the others
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "crew_search", "serper.sqlite3")
+
+
+def normalize(query: str) -> str:
+    """ Folds case, width, whitespace and surrounding quotes and punctuation, which don't change the results """
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = " ".join(query.split())
+    return re.sub(r"^[\s\"'`.,;:!?]+|[\s\"'`.,;:!?]+$", "", query)
+
+
+class _Flight:
+    """ A search being made, which identical searches wait for instead of making their own """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class SearchCache:
+    """
+    Search results kept on disk and shared by every crew and process that uses the same path.
+
+    Queries are normalized before lookup. Entries expire after ttl seconds, and the least
+    recently used are evicted beyond max_entries. An identical search made while the same
+    one is in flight waits for its result rather than calling the API again. Hits and
+    misses are counted per crew.
+
+    The cache never fails a search: if the database can't be read or written, or the
+    cache has been closed, the search is made without it.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 6 * 3600, max_entries: int = 5000,
+                 busy_timeout_ms: int = 5000, clock: Callable[[], float] = time.time):
+        self.path = path or os.getenv("SEARCH_CACHE_PATH") or DEFAULT_PATH
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.busy_timeout_ms = busy_timeout_ms
+        self.clock = clock
+        self.stats: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn: Optional[sqlite3.Connection] = sqlite3.connect(
+            self.path, timeout=busy_timeout_ms / 1000, check_same_thread=False, isolation_level=None)
+        self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS searches (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                result TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_searches_last_used ON searches (last_used)")
+
+    @staticmethod
+    def key(query: str, settings: Optional[Dict[str, Any]] = None) -> str:
+        """ Identical for queries that normalize the same under the same search settings """
+        payload = json.dumps([normalize(query), settings or {}], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, crew: str, outcome: str) -> None:
+        self.stats.setdefault(crew, Counter())[outcome] += 1
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Search cache is closed")
+        return self._conn
+
+    def _load(self, key: str) -> Optional[str]:
+        now = self.clock()
+        conn = self._connection()
+        row = conn.execute("SELECT result, expires_at FROM searches WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            conn.execute("DELETE FROM searches WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE searches SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def _store(self, key: str, query: str, result: str) -> None:
+        now = self.clock()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?)",
+                         (key, normalize(query), result, now + self.ttl, now))
+            conn.execute("DELETE FROM searches WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM searches WHERE key IN "
+                "(SELECT key FROM searches ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def search(self, crew: str, query: str, fetch: Callable[[], str],
+               settings: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Returns the cached result for query, or calls fetch once for it and caches the result.
+        A failed fetch isn't cached; its error is raised to every search waiting on it.
+        """
+        key = self.key(query, settings)
+        with self._lock:
+            try:
+                cached = self._load(key)
+            except sqlite3.Error as e:
+                logger.warning("Search cache lookup failed, searching without it: %s", e)
+                cached = None
+            if cached is not None:
+                self._count(crew, "hits")
+                return cached
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._count(crew, "misses")
+            else:
+                self._count(crew, "coalesced")
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._count(crew, "errors")
+            raise
+        else:
+            with self._lock:
+                try:
+                    self._store(key, query, flight.result)
+                except sqlite3.Error as e:
+                    logger.warning("Search cache write failed: %s", e)
+            return flight.result
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def report(self) -> str:
+        """ One line per crew of searches served from the cache, shared with another search, or made """
+        with self._lock:
+            lines = []
+            for crew, counts in sorted(self.stats.items()):
+                total = counts["hits"] + counts["coalesced"] + counts["misses"]
+                saved = counts["hits"] + counts["coalesced"]
+                lines.append(f"{crew}: {total} searches, {counts['hits']} from cache, {counts['coalesced']} shared "
+                             f"with an identical search in flight, {counts['misses']} made "
+                             f"({saved / total:.0%} saved), {counts['errors']} failed")
+            return "\n".join(lines) or "no searches"
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """ The process-wide search cache, opened on first use and closed at exit """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache()
+            atexit.register(_cache.close)
+        return _cache
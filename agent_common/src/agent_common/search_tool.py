@@ -0,0 +1,54 @@
+import json
+from crewai.tools import BaseTool
+from crewai_tools import SerperDevTool
+from typing import Callable, Type
+from pydantic import BaseModel, Field, PrivateAttr
+
+from agent_common.search_cache import SearchCache, get_search_cache
+
+# SerperDevTool settings that change what a query returns
+SEARCH_SETTINGS = ("search_type", "n_results", "country", "location", "locale")
+
+
+class CachedSearchInput(BaseModel):
+    """Input schema for CachedSerperDevTool."""
+    search_query: str = Field(..., description="Mandatory search query you want to use to search the internet")
+
+
+class CachedSerperDevTool(BaseTool):
+    """ SerperDevTool whose results are shared through a SearchCache, counted under the crew's name """
+    name: str = "Search the internet with Serper"
+    description: str = (
+        "A tool that can be used to search the internet with a search_query. "
+        "Supports different search types: 'search' (default), 'news'"
+    )
+    args_schema: Type[BaseModel] = CachedSearchInput
+    crew: str = "default"
+    # results are cached by the SearchCache, across crews and runs
+    cache_function: Callable = lambda _args=None, _result=None: False
+    _search: SerperDevTool = PrivateAttr(default_factory=SerperDevTool)
+    _cache: SearchCache = PrivateAttr(default_factory=get_search_cache)
+
+    def __init__(self, search: SerperDevTool = None, cache: SearchCache = None, **kwargs):
+        """
+        Args:
+            search: The SerperDevTool to call on a miss, with its own search settings.
+            cache: Cache to use instead of the process-wide one.
+        """
+        super().__init__(**kwargs)
+        if search is not None:
+            self._search = search
+        if cache is not None:
+            self._cache = cache
+
+    @property
+    def search_cache(self) -> SearchCache:
+        return self._cache
+
+    def _fetch(self, search_query: str) -> str:
+        result = self._search._run(search_query=search_query)
+        return result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)
+
+    def _run(self, search_query: str) -> str:
+        settings = {setting: getattr(self._search, setting, None) for setting in SEARCH_SETTINGS}
+        return self._cache.search(self.crew, search_query, lambda: self._fetch(search_query), settings)
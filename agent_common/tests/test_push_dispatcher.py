@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs
+
+from agent_common.push_dispatcher import PushDispatcher
+
+
+class PushoverStub(ThreadingHTTPServer):
+    """A local stand-in for the Pushover API that answers with scripted status codes"""
+
+    def __init__(self, statuses=()):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.statuses = list(statuses)
+        self.messages = []
+        self.requests = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/1/messages.json"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        with self.server.lock:
+            self.server.requests += 1
+            status = self.server.statuses.pop(0) if self.server.statuses else 200
+            if status < 400:
+                self.server.messages.append(parse_qs(body)["message"][0])
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b'{"status": 1}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPushDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.stub = PushoverStub()
+
+    def tearDown(self):
+        self.stub.stop()
+
+    def dispatcher(self, **kwargs):
+        kwargs.setdefault("coalesce_window", 0.05)
+        return PushDispatcher(url=self.stub.url, user="user", token="token", backoff=0.01, **kwargs)
+
+    def test_sends_message(self):
+        """Test a single message is posted as it is"""
+        dispatcher = self.dispatcher()
+        dispatcher.enqueue("Picked LMT")
+        self.assertTrue(dispatcher.flush(5))
+        self.assertEqual(self.stub.messages, ["Picked LMT"])
+        self.assertEqual(dispatcher.stats["sent"], 1)
+
+    def test_batches_messages_into_digest(self):
+        """Test messages arriving within the coalesce window go out as one digest"""
+        dispatcher = self.dispatcher(coalesce_window=0.5)
+        for ticker in ("LMT", "RTX", "NOC"):
+            dispatcher.enqueue(f"Found {ticker}")
+        self.assertTrue(dispatcher.flush(5))
+        self.assertEqual(self.stub.messages, ["3 updates:\n- Found LMT\n- Found RTX\n- Found NOC"])
+        self.assertEqual(dispatcher.stats["digests"], 1)
+
+    def test_retries_server_errors(self):
+        """Test 5xx and 429 responses are retried until the message is delivered"""
+        self.stub.statuses = [503, 429]
+        dispatcher = self.dispatcher()
+        dispatcher.enqueue("Picked LMT")
+        self.assertTrue(dispatcher.flush(5))
+        self.assertEqual(self.stub.requests, 3)
+        self.assertEqual(self.stub.messages, ["Picked LMT"])
+        self.assertEqual(dispatcher.stats["retries"], 2)
+        self.assertEqual(dispatcher.stats["failed"], 0)
+
+    def test_gives_up_on_client_errors(self):
+        """Test a 4xx response other than 429 isn't retried"""
+        self.stub.statuses = [400]
+        dispatcher = self.dispatcher()
+        dispatcher.enqueue("Picked LMT")
+        self.assertTrue(dispatcher.flush(5))
+        self.assertEqual(self.stub.requests, 1)
+        self.assertEqual(dispatcher.stats["failed"], 1)
+        self.assertEqual(dispatcher.stats["retries"], 0)
+
+    def test_worker_survives_unexpected_errors(self):
+        """Test an unexpected exception is counted as a failure and later messages still go out"""
+        dispatcher = self.dispatcher()
+        with patch.object(dispatcher, "_digest", side_effect=[ValueError("bad message"), "Picked RTX"]):
+            dispatcher.enqueue("Picked LMT")
+            self.assertTrue(dispatcher.flush(5))
+            dispatcher.enqueue("Picked RTX")
+            self.assertTrue(dispatcher.flush(5))
+        self.assertEqual(dispatcher.stats["failed"], 1)
+        self.assertEqual(self.stub.messages, ["Picked RTX"])
+
+    def test_flushes_at_exit(self):
+        """Test messages queued just before the interpreter exits are still delivered"""
+        script = textwrap.dedent(f"""
+            from agent_common import push_dispatcher
+            dispatcher = push_dispatcher.get_dispatcher()
+            dispatcher.url = {self.stub.url!r}
+            dispatcher.coalesce_window = 0.2
+            dispatcher.enqueue("Picked LMT")
+        """)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        subprocess.run([sys.executable, "-c", script], env=env, check=True, timeout=30)
+        self.assertEqual(self.stub.messages, ["Picked LMT"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import threading
+import unittest
+
+from agent_common.search_cache import SearchCache, normalize
+
+
+class TestKeys(unittest.TestCase):
+    def test_normalize_folds_what_doesnt_change_results(self):
+        """Test case, width, whitespace and surrounding quotes and punctuation are folded"""
+        self.assertEqual(normalize('  "Apple   STOCK news?" '), "apple stock news")
+        self.assertEqual(normalize("ＡＰＰＬＥ\tearnings"), "apple earnings")
+        self.assertEqual(normalize("what's up?"), "what's up")
+
+    def test_key_depends_on_normalized_query_and_settings(self):
+        """Test queries that normalize the same share a key, unless their search settings differ"""
+        self.assertEqual(SearchCache.key("Apple stock"), SearchCache.key(" apple  STOCK. "))
+        self.assertNotEqual(SearchCache.key("Apple stock"), SearchCache.key("Apple stocks"))
+        self.assertNotEqual(SearchCache.key("Apple stock", {"search_type": "news"}),
+                            SearchCache.key("Apple stock", {"search_type": "search"}))
+
+
+class TestSearchCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.now = 1000.0
+        self.fetches = []
+
+    def cache(self, **kwargs):
+        cache = SearchCache(os.path.join(self.tmp.name, "searches.sqlite3"), clock=lambda: self.now, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def fetch(self, result):
+        def fetch():
+            self.fetches.append(result)
+            return result
+        return fetch
+
+    def test_hit_across_crews_and_instances(self):
+        """Test a search made by one crew is served to another from the same file"""
+        self.cache().search("financial_researcher", "Apple stock", self.fetch("results"))
+        cache = self.cache()
+        self.assertEqual(cache.search("stock_picker", "apple stock", self.fetch("other")), "results")
+        self.assertEqual(self.fetches, ["results"])
+        self.assertEqual(cache.stats["stock_picker"]["hits"], 1)
+
+    def test_entries_expire_after_ttl(self):
+        """Test an entry older than ttl is fetched again"""
+        cache = self.cache(ttl=60)
+        cache.search("crew", "query", self.fetch("old"))
+        self.now += 59
+        self.assertEqual(cache.search("crew", "query", self.fetch("new")), "old")
+        self.now += 2
+        self.assertEqual(cache.search("crew", "query", self.fetch("new")), "new")
+        self.assertEqual(self.fetches, ["old", "new"])
+
+    def test_least_recently_used_is_evicted(self):
+        """Test the least recently used entry goes once there are more than max_entries"""
+        cache = self.cache(max_entries=2)
+        for query in ("a", "b"):
+            cache.search("crew", query, self.fetch(query))
+            self.now += 1
+        cache.search("crew", "a", self.fetch("a again"))  # a is now more recent than b
+        self.now += 1
+        cache.search("crew", "c", self.fetch("c"))
+        self.now += 1
+        self.assertEqual(cache.search("crew", "a", self.fetch("a again")), "a")
+        self.assertEqual(cache.search("crew", "b", self.fetch("b again")), "b again")
+        self.assertEqual(self.fetches, ["a", "b", "c", "b again"])
+
+    def run_concurrently(self, cache, fetch, threads=8):
+        results, errors = [], []
+
+        def search():
+            try:
+                results.append(cache.search("crew", "query", fetch))
+            except Exception as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=search) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        return workers, results, errors
+
+    def test_identical_searches_in_flight_share_one_fetch(self):
+        """Test searches made while the same one is in flight wait for it instead of fetching"""
+        cache = self.cache()
+        release, calls = threading.Event(), []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return "results"
+
+        workers, results, errors = self.run_concurrently(cache, fetch)
+        while sum(cache.stats["crew"].values()) < 8:
+            threading.Event().wait(0.01)
+        release.set()
+        for worker in workers:
+            worker.join()
+        self.assertEqual((len(calls), results, errors), (1, ["results"] * 8, []))
+        self.assertEqual((cache.stats["crew"]["misses"], cache.stats["crew"]["coalesced"]), (1, 7))
+
+    def test_failed_fetch_is_raised_to_every_waiter_and_not_cached(self):
+        """Test a failed search raises for every search sharing it, and the next search tries again"""
+        cache = self.cache()
+        release = threading.Event()
+
+        def fetch():
+            release.wait(5)
+            raise ConnectionError("Serper is down")
+
+        workers, results, errors = self.run_concurrently(cache, fetch)
+        while sum(cache.stats["crew"].values()) < 8:
+            threading.Event().wait(0.01)
+        release.set()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(results, [])
+        self.assertEqual([str(error) for error in errors], ["Serper is down"] * 8)
+        self.assertEqual(cache.search("crew", "query", self.fetch("results")), "results")
+        self.assertEqual(cache.stats["crew"]["errors"], 1)
+
+    def test_closed_cache_searches_without_caching(self):
+        """Test a search after close is made directly instead of crashing"""
+        cache = self.cache()
+        cache.close()
+        with self.assertLogs("agent_common.search_cache", "WARNING"):
+            self.assertEqual(cache.search("crew", "query", self.fetch("results")), "results")
+        self.assertEqual(self.fetches, ["results"])
+
+
+if __name__ == '__main__':
+    unittest.main()